@@ -16,7 +16,7 @@ from apps.backport.datasync.data_metadata import (
     variable_data,
     variable_data_df_from_s3,
 )
-from apps.backport.datasync.datasync import upload_gzip_dict
+from apps.backport.datasync.datasync import delete_object, upload_gzip_dict
 from etl import config, paths
 from etl import grapher_model as gm
 from etl.backport_helpers import GrapherConfig
@@ -280,6 +280,9 @@ def _upload_data_metadata(lg: Any, backport_short_name: str, dry_run: bool) -> N
         upload_variable_data = variable_data(var_data)
         if not dry_run:
             upload_gzip_dict(upload_variable_data, db_var.s3_data_path())
+            # backport only writes JSON, Arrow from an earlier upload would be stale
+            if config.VARIABLE_DATA_ARROW_CLEANUP:
+                delete_object(db_var.s3_data_arrow_path())
 
         upload_variable_metadata = _variable_metadata(
             db_variable_row=db_variable_row,
@@ -1,69 +1,184 @@
 import concurrent.futures
+import hashlib
+import io
+import itertools
 import json
+import os
+import tempfile
 from copy import deepcopy
-from http.client import RemoteDisconnected
-from typing import Any, Dict, List, Union, cast
-from urllib.error import HTTPError, URLError
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union, cast
 
 import numpy as np
 import pandas as pd
-import requests
+import pyarrow as pa
+from owid.catalog import http_utils
 from sqlalchemy import text
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
 from structlog import get_logger
-from tenacity import Retrying
-from tenacity.retry import retry_if_exception_type
-from tenacity.stop import stop_after_attempt
-from tenacity.wait import wait_fixed
 
-from etl import config, files
+from etl import config, files, paths
 from etl.config import OWIDEnv
 from etl.db import read_sql
 
 log = get_logger()
 
+T = TypeVar("T")
 
-def _fetch_data_df_from_s3(variable_id: int):
-    try:
-        # Cloudflare limits us to 600 requests per minute, retry in case we hit the limit
-        # NOTE: increase wait time or attempts if we hit the limit too often
-        for attempt in Retrying(
-            wait=wait_fixed(2),
-            stop=stop_after_attempt(3),
-            retry=retry_if_exception_type((URLError, RemoteDisconnected)),
-        ):
-            with attempt:
-                return (
-                    pd.read_json(config.variable_data_url(variable_id))
-                    .rename(
-                        columns={
-                            "entities": "entityId",
-                            "values": "value",
-                            "years": "year",
-                        }
-                    )
-                    .assign(variableId=variable_id)
-                )
+
+# Local cache of indicator data and metadata from the data API, files are keyed by variable ID and checksum from
+# the database, so they never have to be invalidated.
+VARIABLES_CACHE_DIR = paths.CACHE_DIR / "variables"
+
+# Number of concurrent requests of bulk fetches by default.
+DEFAULT_WORKERS = http_utils.MAX_CONNECTIONS_PER_HOST
+
+
+def _cache_file(variable_id: int, checksum: Optional[str], suffix: str) -> Optional[Path]:
+    if checksum is None:
+        return None
+    return VARIABLES_CACHE_DIR / f"{variable_id}-{checksum}{suffix}"
+
+
+def _get_content(url: str, cache_file: Optional[Path] = None) -> Optional[bytes]:
+    """Return content of the URL (from the cache if possible) or None if it doesn't exist."""
+    if cache_file is not None and cache_file.exists():
+        return cache_file.read_bytes()
+
+    # Cloudflare limits us to 600 requests per minute, http_utils rate limits and retries requests to the data API
+    r = http_utils.get(url)
+    if r.status_code == 404:
+        return None
+    r.raise_for_status()
+
+    if cache_file is not None:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_filename = tempfile.mkstemp(dir=cache_file.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(r.content)
+        os.replace(tmp_filename, cache_file)
+    return r.content
+
+
+def _fetch_data_df_from_s3(variable_id: int, checksum: Optional[str] = None) -> pd.DataFrame:
+    json_cache = _cache_file(variable_id, checksum, ".data.json")
+    if config.VARIABLE_DATA_ARROW and not (json_cache and json_cache.exists()):
+        df = _fetch_data_df_from_s3_arrow(variable_id, _cache_file(variable_id, checksum, ".data.arrow"))
+        if df is not None:
+            return df
+
+    return _fetch_data_df_from_s3_json(variable_id, json_cache)
+
+
+def _fetch_data_df_from_s3_json(variable_id: int, cache_file: Optional[Path] = None) -> pd.DataFrame:
+    content = _get_content(config.variable_data_url(variable_id), cache_file)
     # no data on S3
-    except HTTPError:
+    if content is None:
         return pd.DataFrame(columns=["variableId", "entityId", "year", "value"])
+    return (
+        pd.read_json(io.BytesIO(content))
+        .rename(
+            columns={
+                "entities": "entityId",
+                "values": "value",
+                "years": "year",
+            }
+        )
+        .assign(variableId=variable_id)
+    )
+
+
+def _fetch_data_df_from_s3_arrow(variable_id: int, cache_file: Optional[Path] = None) -> Optional[pd.DataFrame]:
+    """Fetch data in Arrow format, return None if the variable has no Arrow data."""
+    content = _get_content(config.variable_data_arrow_url(variable_id), cache_file)
+    # not uploaded in Arrow format, fall back to JSON
+    if content is None:
+        return None
+    return variable_data_df_from_arrow(content).assign(variableId=variable_id)
+
+
+def _fetch_concurrently(
+    fetch: Callable[..., T], args: Iterable[Tuple[Any, ...]], workers: int
+) -> Iterator[Tuple[int, T]]:
+    """Call `fetch` with each of `args` from a thread pool and yield tuples (position of args, result) as soon as
+    they are ready. At most `workers` calls run at once and only a few more are queued, so that results are
+    streamed no matter how many there are."""
+    args_iter = enumerate(args)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(fetch, *a): i for i, a in itertools.islice(args_iter, 2 * workers)}
+        try:
+            while pending:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+                for i, a in itertools.islice(args_iter, len(done)):
+                    pending[executor.submit(fetch, *a)] = i
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def iter_variable_data_from_s3(
+    variable_ids: List[int],
+    workers: int = DEFAULT_WORKERS,
+    checksums: Optional[Dict[int, str]] = None,
+) -> Iterator[Tuple[int, pd.DataFrame]]:
+    """Fetch data of variables from S3 and yield tuples (variable ID, dataframe) in the order they arrive. Pass
+    `checksums` with dataChecksum of variables to cache their data locally."""
+    checksums = checksums or {}
+    args = [(variable_id, checksums.get(variable_id)) for variable_id in variable_ids]
+    for i, df in _fetch_concurrently(_fetch_data_df_from_s3, args, workers):
+        yield variable_ids[i], df
+
+
+class _VariableDataBuilder:
+    """Assemble data of many variables into a single dataframe one variable at a time. Only arrays of columns
+    are kept, in the order of variables."""
+
+    def __init__(self) -> None:
+        self._chunks: Dict[int, Tuple[int, np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    def add(self, position: int, variable_id: int, df: pd.DataFrame) -> None:
+        if not df.empty:
+            self._chunks[position] = (
+                variable_id,
+                df["entityId"].to_numpy(),
+                df["value"].to_numpy(),
+                df["year"].to_numpy(),
+            )
+
+    def build(self) -> pd.DataFrame:
+        chunks = [self._chunks[position] for position in sorted(self._chunks)]
+        if not chunks:
+            return pd.DataFrame(columns=["entityId", "value", "year", "variableId"])
+        return pd.DataFrame(
+            {
+                "entityId": np.concatenate([c[1] for c in chunks]).astype("int64"),
+                "value": np.concatenate([c[2] for c in chunks]),
+                "year": np.concatenate([c[3] for c in chunks]).astype("int64"),
+                "variableId": np.concatenate([np.full(len(c[1]), c[0], dtype="int64") for c in chunks]),
+            }
+        )
 
 
 def variable_data_df_from_s3(
     engine: Engine,
     variable_ids: List[int] = [],
-    workers: int = 1,
+    workers: int = DEFAULT_WORKERS,
     value_as_str: bool = True,
+    cache: bool = False,
 ) -> pd.DataFrame:
-    """Fetch data from S3 and add entity code and name from DB."""
-    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-        results = list(executor.map(_fetch_data_df_from_s3, variable_ids))
+    """Fetch data from S3 and add entity code and name from DB. Data is fetched concurrently by `workers` threads
+    and cached locally by dataChecksum of variables if `cache` is set."""
+    checksums = _fetch_checksums(engine, variable_ids, "dataChecksum") if cache and variable_ids else {}
+    args = [(variable_id, checksums.get(variable_id)) for variable_id in variable_ids]
 
-    if isinstance(results, list) and all(isinstance(df, pd.DataFrame) for df in results):
-        df = pd.concat(cast(List[pd.DataFrame], results))
-    else:
-        raise TypeError(f"results must be a list of pd.DataFrame, got {type(results)}")
+    builder = _VariableDataBuilder()
+    for i, df in _fetch_concurrently(_fetch_data_df_from_s3, args, workers):
+        builder.add(i, variable_ids[i], df)
+    log.debug("variable_data_df_from_s3.http", stats=http_utils.stats())
+    df = builder.build()
 
     # we work with strings and convert to specific types later
     if value_as_str:
@@ -74,43 +189,62 @@ def variable_data_df_from_s3(
         return res
 
 
-def _fetch_metadata_from_s3(variable_id: int, env: OWIDEnv | None = None) -> Dict[str, Any] | None:
-    try:
-        # Cloudflare limits us to 600 requests per minute, retry in case we hit the limit
-        # NOTE: increase wait time or attempts if we hit the limit too often
-        for attempt in Retrying(
-            wait=wait_fixed(2),
-            stop=stop_after_attempt(3),
-            retry=retry_if_exception_type((URLError, RemoteDisconnected)),
-        ):
-            with attempt:
-                if env is not None:
-                    url = env.indicator_metadata_url(variable_id)
-                else:
-                    url = config.variable_metadata_url(variable_id)
-                return requests.get(url).json()
+def _fetch_metadata_from_s3(
+    variable_id: int, env: OWIDEnv | None = None, checksum: Optional[str] = None
+) -> Dict[str, Any] | None:
+    if env is not None:
+        url = env.indicator_metadata_url(variable_id)
+    else:
+        url = config.variable_metadata_url(variable_id)
+    content = _get_content(url, _cache_file(variable_id, checksum, ".metadata.json"))
     # no data on S3
-    except HTTPError:
+    if content is None:
         return {}
+    return json.loads(content)
+
+
+def iter_variable_metadata_from_s3(
+    variable_ids: List[int],
+    workers: int = DEFAULT_WORKERS,
+    env: OWIDEnv | None = None,
+    checksums: Optional[Dict[int, str]] = None,
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Fetch metadata of variables from S3 and yield tuples (variable ID, metadata) in the order they arrive.
+    Pass `checksums` with metadataChecksum of variables to cache their metadata locally."""
+    checksums = checksums or {}
+    args = [(variable_id, env, checksums.get(variable_id)) for variable_id in variable_ids]
+    for i, meta in _fetch_concurrently(_fetch_metadata_from_s3, args, workers):
+        yield variable_ids[i], cast(Dict[str, Any], meta)
 
 
 def variable_metadata_df_from_s3(
     variable_ids: List[int] = [],
-    workers: int = 1,
+    workers: int = DEFAULT_WORKERS,
     env: OWIDEnv | None = None,
+    checksums: Optional[Dict[int, str]] = None,
 ) -> List[Dict[str, Any]]:
-    """Fetch data from S3 and add entity code and name from DB."""
-    args = [variable_ids]
-    if env:
-        args += [[env for _ in range(len(variable_ids))]]
+    """Fetch metadata of variables from S3, in the same order as `variable_ids`."""
+    checksums = checksums or {}
+    args = [(variable_id, env, checksums.get(variable_id)) for variable_id in variable_ids]
+    results: List[Dict[str, Any]] = [{}] * len(variable_ids)
+    for i, meta in _fetch_concurrently(_fetch_metadata_from_s3, args, workers):
+        results[i] = cast(Dict[str, Any], meta)
+    log.debug("variable_metadata_df_from_s3.http", stats=http_utils.stats())
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-        results = list(executor.map(_fetch_metadata_from_s3, *args))
+    return results
 
-    if not (isinstance(results, list) and all(isinstance(res, dict) for res in results)):
-        raise TypeError(f"results must be a list of dictionaries, got {type(results)}")
 
-    return results  # type: ignore
+def _fetch_checksums(engine: Engine, variable_ids: List[int], column: str) -> Dict[int, str]:
+    """Return dataChecksum or metadataChecksum of variables that have it."""
+    q = f"""
+    SELECT
+        id AS variableId,
+        {column} AS checksum
+    FROM variables
+    WHERE id in %(variable_ids)s AND {column} IS NOT NULL
+    """
+    df = read_sql(q, engine, params={"variable_ids": variable_ids})
+    return dict(zip(df["variableId"], df["checksum"]))
 
 
 def _fetch_entities(session: Session, entity_ids: List[int]) -> pd.DataFrame:
@@ -126,7 +260,11 @@ def _fetch_entities(session: Session, entity_ids: List[int]) -> pd.DataFrame:
     return read_sql(q, session, params={"entity_ids": entity_ids})
 
 
-def add_entity_code_and_name(session: Session, df: pd.DataFrame) -> pd.DataFrame:
+def add_entity_code_and_name(
+    session: Session, df: pd.DataFrame, entities: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
+    """Add entity name and code to `df`. Pass `entities` from `_fetch_entities` to avoid
+    querying the database when adding entities to many dataframes."""
     if df.empty:
         df["entityName"] = []
         df["entityCode"] = []
@@ -134,7 +272,10 @@ def add_entity_code_and_name(session: Session, df: pd.DataFrame) -> pd.DataFrame
 
     unique_entities = df["entityId"].unique()
 
-    entities = _fetch_entities(session, list(unique_entities))
+    if entities is None:
+        entities = _fetch_entities(session, list(unique_entities))
+    else:
+        entities = entities[entities.entityId.isin(unique_entities)]
 
     if set(unique_entities) - set(entities.entityId):
         missing_entities = set(unique_entities) - set(entities.entityId)
@@ -156,6 +297,60 @@ def variable_data(data_df: pd.DataFrame) -> Dict[str, Any]:
     return data  # type: ignore
 
 
+def variable_data_arrow(data_df: pd.DataFrame) -> bytes:
+    """Encode the same payload as `variable_data` as Arrow IPC stream with typed columns. Entities
+    are dictionary-encoded and buffers are compressed with zstd. Values are stored as int64 or
+    float64 if all of them are numeric, otherwise they're stored as dictionary-encoded strings."""
+    table = pa.table(
+        {
+            "values": _arrow_values(data_df["value"]),
+            "years": pa.array(data_df["year"], type=pa.int32()),
+            "entities": pa.array(data_df["entityId"], type=pa.int32()).dictionary_encode(),
+        }
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(
+        sink, table.schema, options=pa.ipc.IpcWriteOptions(compression=pa.Codec("zstd", compression_level=3))
+    ) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def variable_data_df_from_arrow(b: bytes) -> pd.DataFrame:
+    """Decode output of `variable_data_arrow` into a dataframe with the same columns as we get from JSON."""
+    table = pa.ipc.open_stream(b).read_all()
+    values = table.column("values")
+    if pa.types.is_dictionary(values.type):
+        values = values.cast(values.type.value_type)
+    return pd.DataFrame(
+        {
+            "value": values.to_pandas(),
+            "year": table.column("years").to_numpy().astype("int64"),
+            "entityId": table.column("entities").cast(pa.int32()).to_numpy().astype("int64"),
+        }
+    )
+
+
+def _arrow_values(values: pd.Series) -> pa.Array:
+    """Convert string values to typed Arrow array, this is a vectorized version of `_convert_strings_to_numeric`."""
+    try:
+        num = pd.to_numeric(values)
+    except ValueError:
+        # non-numeric values
+        num = None
+    if num is not None and len(num) and num.notnull().all() and np.isfinite(num).all():
+        num = num.to_numpy(dtype="float64")
+        # keep integers as integers unless they don't fit into float64 without loss of precision
+        if (num == np.round(num)).all() and (np.abs(num) < 2**53).all():
+            return pa.array(num.astype("int64"))
+        return pa.array(num)
+    return pa.array(values.astype(str), type=pa.string()).dictionary_encode()
+
+
+def checksum_data_bytes(b: bytes) -> str:
+    return hashlib.md5(b).hexdigest()
+
+
 def _load_variable(session: Session, variable_id: int) -> Dict[str, Any]:
     sql = """
     SELECT
@@ -378,6 +573,107 @@ def variable_metadata(session: Session, variable_id: int, variable_data: pd.Data
     )
 
 
+def variables_metadata(session: Session, variables_data: Dict[int, pd.DataFrame]) -> Dict[int, Dict[str, Any]]:
+    """Batch version of `variable_metadata` that loads metadata of all variables with a single query
+    per table. `variables_data` maps variable id to its data."""
+    variable_ids = list(variables_data.keys())
+    if not variable_ids:
+        return {}
+
+    db_variable_rows = _load_variables(session, variable_ids)
+    db_origins_dfs = _load_origins_dfs(session, variable_ids)
+    db_topic_tags = _load_topic_tags_by_variable(session, variable_ids)
+    db_faqs = _load_faqs_by_variable(session, variable_ids)
+
+    return {
+        variable_id: _variable_metadata(
+            db_variable_row=db_variable_rows[variable_id],
+            variable_data=variable_data,
+            db_origins_df=db_origins_dfs[variable_id],
+            db_topic_tags=db_topic_tags.get(variable_id, []),
+            db_faqs=db_faqs.get(variable_id, []),
+        )
+        for variable_id, variable_data in variables_data.items()
+    }
+
+
+def _load_variables(session: Session, variable_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    sql = """
+    SELECT
+        variables.*,
+        datasets.name AS datasetName,
+        datasets.nonRedistributable AS nonRedistributable,
+        datasets.updatePeriodDays,
+        datasets.version as datasetVersion,
+        sources.name AS sourceName,
+        sources.description AS sourceDescription
+    FROM variables
+    JOIN datasets ON variables.datasetId = datasets.id
+    LEFT JOIN sources ON variables.sourceId = sources.id
+    WHERE variables.id IN :variable_ids
+    """
+    rows = {row.id: dict(row._mapping) for row in session.execute(text(sql), {"variable_ids": variable_ids})}
+
+    missing = set(variable_ids) - set(rows)
+    assert not missing, f"variableIds `{missing}` not found"
+    return rows
+
+
+def _load_topic_tags_by_variable(session: Session, variable_ids: List[int]) -> Dict[int, List[str]]:
+    sql = """
+    SELECT
+        variableId,
+        tags.name
+    FROM tags_variables_topic_tags
+    JOIN tags ON tags_variables_topic_tags.tagId = tags.id
+    WHERE variableId IN :variable_ids
+    ORDER BY variableId, displayOrder
+    """
+    out: Dict[int, List[str]] = {}
+    for row in session.execute(text(sql), {"variable_ids": variable_ids}):
+        out.setdefault(row[0], []).append(row[1])
+    return out
+
+
+def _load_faqs_by_variable(session: Session, variable_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    sql = """
+    SELECT
+        variableId,
+        gdocId,
+        fragmentId
+    FROM posts_gdocs_variables_faqs
+    WHERE variableId IN :variable_ids
+    ORDER BY variableId, displayOrder
+    """
+    out: Dict[int, List[Dict[str, Any]]] = {}
+    for row in session.execute(text(sql), {"variable_ids": variable_ids}):
+        out.setdefault(row[0], []).append({"gdocId": row[1], "fragmentId": row[2]})
+    return out
+
+
+def _load_origins_dfs(session: Session, variable_ids: List[int]) -> Dict[int, pd.DataFrame]:
+    sql = """
+    SELECT
+        origins_variables.variableId AS _variableId,
+        origins.*
+    FROM origins
+    JOIN origins_variables ON origins.id = origins_variables.originId
+    WHERE origins_variables.variableId IN :variable_ids
+    ORDER BY origins_variables.variableId, displayOrder
+    """
+    result_proxy = session.execute(text(sql), {"variable_ids": variable_ids})
+    df = pd.DataFrame(result_proxy.fetchall(), columns=result_proxy.keys())
+    df["license"] = df["license"].map(lambda x: json.loads(x) if x else None)
+
+    # split into the same dataframes as `_load_origins_df` would return
+    groups = {
+        variable_id: g.drop(columns="_variableId").reset_index(drop=True)
+        for variable_id, g in df.groupby("_variableId")
+    }
+    empty = df.drop(columns="_variableId").iloc[:0]
+    return {variable_id: groups.get(variable_id, empty) for variable_id in variable_ids}
+
+
 def _convert_strings_to_numeric(lst: List[str]) -> List[Union[int, float, str]]:
     """Convert strings to numeric values. String `nan` remains as string."""
     result = []
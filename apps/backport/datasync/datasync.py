@@ -25,24 +25,45 @@ def upload_gzip_string(s: str, s3_path: str, private: bool = False) -> None:
     """Upload compressed dictionary to S3 and return its URL."""
     body_gzip = gzip.compress(s.encode())
 
+    assert not private, "r2 does not support private files yet"
+
+    _put_object(body_gzip, s3_path, ContentEncoding="gzip", ContentType="application/json")
+
+
+def upload_arrow_bytes(b: bytes, s3_path: str) -> None:
+    """Upload Arrow IPC stream to S3. It is compressed internally, so we don't gzip it."""
+    _put_object(b, s3_path, ContentType="application/vnd.apache.arrow.stream")
+
+
+def delete_object(s3_path: str) -> None:
+    """Delete object from S3, do nothing if it doesn't exist."""
     bucket, key = s3_utils.s3_bucket_key(s3_path)
 
     client = s3_utils.connect_r2_cached()
 
-    assert not private, "r2 does not support private files yet"
-    extra_args = {}
+    for attempt in _retrying():
+        with attempt:
+            client.delete_object(Bucket=bucket, Key=key)
 
-    for attempt in Retrying(
+
+def _retrying() -> Retrying:
+    return Retrying(
         wait=wait_exponential(min=5, max=100),
         stop=stop_after_attempt(7),
         retry=retry_if_exception_type((EndpointConnectionError, SSLError)),
-    ):
+    )
+
+
+def _put_object(body: bytes, s3_path: str, **extra_args: Any) -> None:
+    bucket, key = s3_utils.s3_bucket_key(s3_path)
+
+    client = s3_utils.connect_r2_cached()
+
+    for attempt in _retrying():
         with attempt:
             client.put_object(
                 Bucket=bucket,
-                Body=body_gzip,
+                Body=body,
                 Key=key,
-                ContentEncoding="gzip",
-                ContentType="application/json",
                 **extra_args,
             )
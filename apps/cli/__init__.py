@@ -164,6 +164,7 @@ GROUPS = (
             "commands": {
                 "harmonize": "etl.harmonize.harmonize",
                 "diff": "etl.datadiff.cli",
+                "snapshot": "etl.command.snapshot_cli",
                 "graphviz": "etl.to_graphviz.to_graphviz",
                 "compare": "etl.compare.cli",
                 "update": "apps.step_update.cli.cli",
@@ -1,6 +1,6 @@
 """Concerns the second stage of wizard charts, when the indicator mapping is constructed."""
 
-from typing import Dict, List, cast
+from typing import Dict, List
 
 import pandas as pd
 import streamlit as st
@@ -153,8 +153,8 @@ def _get_params_cached(
         iu_man = [
             IndicatorUpgrade.from_manual(
                 id_old=suggestion["old"]["id_old"],
-                suggestions=suggestion["new"],
-                # ids_new=list(suggestion["new"]["id_new"]),
+                ids_new=suggestion["ids_new"],
+                scores=suggestion["scores"],
             )
             for suggestion in suggestions
         ]
@@ -291,18 +291,15 @@ class IndicatorUpgrade:
         )
 
     @classmethod
-    def from_manual(cls, id_old: int, suggestions: pd.DataFrame):
+    def from_manual(cls, id_old: int, ids_new: List[int], scores: List[float]):
         """Create instance from manual mapping.
 
-        Different than from_auto because it has to handle multiple suggestions.
+        Different than from_auto because it has to handle multiple suggestions (sorted from the most similar).
         """
-        ids_new = list(suggestions["id_new"])
-        scores = suggestions.set_index("id_new")["similarity"].to_dict()
-        scores = cast(Dict[int, float], scores)
         return cls(
             id_old=id_old,
             ids_new=ids_new,
-            scores=scores,
+            scores=dict(zip(ids_new, scores)),
             auto=False,
         )
 
@@ -497,8 +494,8 @@ def get_indicator_data_cached(indicator_ids: List[int]):
         df = variable_data_df_from_s3(
             get_engine(),
             variable_ids=[int(v) for v in indicator_ids],
-            workers=10,
             value_as_str=False,
+            cache=True,
         )
     return df
 
@@ -1,6 +1,7 @@
 """Utils for chart revision tool."""
 from typing import Any, Dict, List, Tuple, cast
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 from pymysql import OperationalError
@@ -11,7 +12,7 @@ from apps.utils.map_datasets import get_grapher_changes
 from etl.db import config, get_all_datasets, get_connection, get_dataset_charts, get_variables_in_dataset
 from etl.git_helpers import get_changed_files
 from etl.indicator_upgrade.schema import get_schema_chart_config
-from etl.match_variables import find_mapping_suggestions, preliminary_mapping
+from etl.match_variables import preliminary_mapping, rank_mapping_suggestions
 from etl.version_tracker import VersionTracker
 
 # Logger
@@ -236,17 +237,29 @@ def preliminary_mapping_cached(
 
 
 @st.cache_data(show_spinner=False)
-def find_mapping_suggestions_cached(missing_old, missing_new, similarity_name):
+def find_mapping_suggestions_cached(missing_old, missing_new, similarity_name) -> List[Dict[str, Any]]:
     """Get mappings for manual mapping.
 
     Most indicators can't be mapped automatically. This method finds suggestions for each indicator. The user will have to review these and manually choose the best option.
+
+    Each suggestion has the old indicator (`old`), IDs of all new indicators sorted by similarity (`ids_new`) and their similarity scores (`scores`). All of them are kept, they're the options the user can choose from.
     """
     with st.spinner():
-        suggestions = find_mapping_suggestions(
-            missing_old=missing_old,
-            missing_new=missing_new,
+        indices, scores = rank_mapping_suggestions(
+            old_names=missing_old["name_old"].tolist(),
+            new_names=missing_new["name_new"].tolist(),
             similarity_name=similarity_name,
-        )  # type: ignore
+        )
+    if indices.shape[1] == 0:
+        return []
+    ids_new = missing_new["id_new"].to_numpy()[indices]
     # Sort by max similarity: First suggestion is that one that has the highest similarity score with any of its suggested new vars.
-    suggestions = sorted(suggestions, key=lambda x: x["new"]["similarity"].max(), reverse=True)
-    return suggestions
+    order = np.argsort(-scores[:, 0], kind="stable")
+    return [
+        {
+            "old": missing_old.iloc[i].to_dict(),
+            "ids_new": ids_new[i].tolist(),
+            "scores": scores[i].tolist(),
+        }
+        for i in order
+    ]
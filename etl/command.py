@@ -4,13 +4,16 @@
 #
 
 import difflib
+import heapq
 import itertools
 import json
 import os
 import re
 import resource
+import statistics
 import sys
 import time
+from collections import defaultdict
 from collections.abc import MutableMapping
 from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from contextlib import contextmanager
@@ -19,22 +22,25 @@ from graphlib import TopologicalSorter
 from multiprocessing import Manager
 from os import environ
 from pathlib import Path
-from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
 
 import rich_click as click
 import structlog
 from ipdb import launch_ipdb_on_exception
 
-from etl import config, files, paths
-from etl.snapshot import snapshot_catalog
+from etl import config, files, paths, step_workers
+from etl.snapshot import PREFETCH_WORKERS, Snapshot, prefetch_snapshots, snapshot_catalog
 from etl.steps import (
     DAG,
     DataStep,
     GrapherStep,
+    SnapshotStep,
     Step,
     compile_steps,
+    graph_nodes,
     load_dag,
     parse_step,
+    reverse_graph,
     select_dirty_steps,
 )
 
@@ -275,6 +281,84 @@ def main(
     )
 
 
+@click.group(name="snapshot")
+def snapshot_cli() -> None:
+    """Work with snapshots of ETL steps."""
+
+
+@snapshot_cli.command(name="prefetch")
+@click.option(
+    "--private",
+    "-p",
+    is_flag=True,
+    help="Include private snapshots.",
+)
+@click.option(
+    "--downstream",
+    "-d",
+    is_flag=True,
+    help="Include downstream dependencies (steps that depend on the included steps).",
+)
+@click.option(
+    "--exclude",
+    "-e",
+    help="Comma-separated patterns to exclude",
+)
+@click.option(
+    "--dag-path",
+    type=click.Path(exists=True),
+    help="Path to DAG yaml file",
+    default=paths.DEFAULT_DAG_FILE,
+)
+@click.option(
+    "--workers",
+    "-w",
+    type=int,
+    help="Number of concurrent downloads.",
+    default=PREFETCH_WORKERS,
+)
+@click.argument(
+    "steps",
+    nargs=-1,
+    type=str,
+)
+def snapshot_prefetch_cli(
+    steps: List[str],
+    private: bool = False,
+    downstream: bool = False,
+    exclude: Optional[str] = None,
+    dag_path: Path = paths.DEFAULT_DAG_FILE,
+    workers: int = PREFETCH_WORKERS,
+) -> None:
+    """Download all snapshots needed by the selected steps concurrently.
+
+    Steps are selected the same way as in `etl run`. Interrupted downloads are resumed the next time. `etl run`
+    prefetches snapshots of the steps it runs as well, this is useful to download them in advance (e.g. on a new
+    server).
+
+    **Example**: Download snapshots of all steps matching "un_wpp":
+
+    ```
+    $ etl snapshot prefetch un_wpp
+    ```
+    """
+    dag = construct_dag(dag_path, backport=False, private=private, grapher=False)
+
+    excludes = exclude.split(",") if exclude else []
+    if not private:
+        excludes.append("-private://")
+
+    snapshots = [
+        Snapshot(step.path)
+        for step in compile_steps(dag, list(steps), excludes, downstream=downstream)
+        if isinstance(step, SnapshotStep)
+    ]
+    print(f"--- Prefetching {len(snapshots)} snapshots...")
+    prefetch_snapshots(snapshots, workers=workers)
+    for snap in snapshots:
+        snap.pull(force=False)
+
+
 def sanity_check_db_settings() -> None:
     """
     Give a nice error if the DB has not been configured.
@@ -371,42 +455,69 @@ def run_dag(
 
     if dry_run:
         print(
-            f"--- Would run {len(steps)} steps{_create_expected_time_message(total_expected_time_seconds, prepend_message=' (at least ')}:"
+            f"--- Would run {len(steps)} steps{_create_expected_time_message(total_expected_time_seconds, prepend_message=' (at least ')}{_create_makespan_message(steps, workers)}:"
         )
         return enumerate_steps(steps)
-    elif workers == 1:
+
+    _prefetch_snapshots(steps)
+
+    if workers == 1:
         print(
             f"--- Running {len(steps)} steps{_create_expected_time_message(total_expected_time_seconds, prepend_message=' (at least ')}:"
         )
         return exec_steps(steps, strict=strict)
     else:
         print(
-            f"--- Running {len(steps)} steps with {workers} processes ({config.GRAPHER_INSERT_WORKERS} threads each):"
+            f"--- Running {len(steps)} steps with {workers} processes ({config.GRAPHER_INSERT_WORKERS} threads each){_create_expected_time_message(total_expected_time_seconds, prepend_message=' (at least ')}{_create_makespan_message(steps, workers)}:"
         )
         return exec_steps_parallel(steps, workers, dag=dag, strict=strict)
 
 
+def _prefetch_snapshots(steps: List[Step], workers: int = PREFETCH_WORKERS) -> None:
+    """Download snapshots of the steps concurrently, instead of one by one when their steps run."""
+    snapshots = [Snapshot(step.path) for step in steps if isinstance(step, SnapshotStep)]
+    if len(snapshots) > 1:
+        print(f"--- Prefetching {len(snapshots)} snapshots...")
+        start_time = time.time()
+        prefetch_snapshots(snapshots, workers=workers)
+        click.echo(f"{click.style('OK', fg='blue')} ({time.time() - start_time:.1f}s)")
+
+
 def exec_steps(steps: List[Step], strict: Optional[bool] = None) -> None:
+    # warm up a worker for data steps while we're running the first steps
+    if _uses_step_workers(steps):
+        step_workers.start_worker()
+
     execution_times = {}
-    for i, step in enumerate(steps, 1):
-        print(f"--- {i}. {step}{_create_expected_time_message(_get_execution_time(step_name=str(step)))}")
+    peak_memory = {}
+    try:
+        for i, step in enumerate(steps, 1):
+            print(f"--- {i}. {step}{_create_expected_time_message(_get_execution_time(step_name=str(step)))}")
 
-        # Determine strictness level for the current step
-        strict = _detect_strictness_level(step, strict)
+            # Determine strictness level for the current step
+            strict = _detect_strictness_level(step, strict)
 
-        with strictness_level(strict):
-            # Execute the step and measure the time taken
-            time_taken = timed_run(lambda: step.run())
-            execution_times[str(step)] = time_taken
+            with strictness_level(strict), _track_peak_memory(str(step), peak_memory):
+                # Execute the step and measure the time taken
+                time_taken = timed_run(lambda: step.run())
+                execution_times[str(step)] = time_taken
 
-            click.echo(f"{click.style('OK', fg='blue')}{_create_expected_time_message(time_taken)}")
-            print()
+                click.echo(f"{click.style('OK', fg='blue')}{_create_expected_time_message(time_taken)}")
+                print()
 
-        # Write the recorded execution times to the file after all steps have been executed
-        _write_execution_times(execution_times)
+            # Write the recorded execution times to the file after all steps have been executed
+            _write_execution_times(execution_times)
+            _write_peak_memory(peak_memory)
+    finally:
+        step_workers.shutdown_worker()
 
 
-def _steps_sort_key(step: Step) -> int:
+def _uses_step_workers(steps: List[Step]) -> bool:
+    """Return True if any of the steps would be run in a step worker."""
+    return config.STEP_WORKERS and not config.IPDB_ENABLED and any(isinstance(s, DataStep) for s in steps)
+
+
+def _steps_sort_key(step: Step | str) -> int:
     """Sort steps by channel, so that grapher steps are executed first, then garden, then meadow, then snapshots."""
     str_step = str(step)
     if "grapher://" in str_step:
@@ -421,36 +532,58 @@ def _steps_sort_key(step: Step) -> int:
         return 4
 
 
-def exec_steps_parallel(steps: List[Step], workers: int, dag: DAG, strict: Optional[bool] = None) -> None:
-    # put grapher steps in front of the queue to process them as soon as possible and lessen
-    # the load on MySQL
-    steps = sorted(steps, key=_steps_sort_key)
+def _create_exec_graph(steps: List[Step]) -> Dict[str, Set[str]]:
+    """Create execution graph from steps."""
+    exec_graph = {}
+    steps_str = {str(step) for step in steps}
+    for step in steps:
+        # only add dependencies that are in the list of steps (i.e. are dirty)
+        # NOTE: we have to compare their string versions, the actual objects might have
+        # different attributes
+        exec_graph[str(step)] = {str(dep) for dep in step.dependencies if str(dep) in steps_str}
+    return exec_graph
 
+
+def exec_steps_parallel(steps: List[Step], workers: int, dag: DAG, strict: Optional[bool] = None) -> None:
     # Use a Manager dict to collect execution times in parallel execution
     with Manager() as manager:
         execution_times = manager.dict()
+        peak_memory = manager.dict()
 
-        # Create execution graph from steps
-        exec_graph = {}
-        steps_str = {str(step) for step in steps}
-        for step in steps:
-            # only add dependencies that are in the list of steps (i.e. are dirty)
-            # NOTE: we have to compare their string versions, the actual objects might have
-            # different attributes
-            exec_graph[str(step)] = {str(dep) for dep in step.dependencies if str(dep) in steps_str}
+        exec_graph = _create_exec_graph(steps)
 
         # Prepare a function for execution that includes the necessary arguments
-        exec_func = partial(_exec_step_job, execution_times=execution_times, dag=dag, strict=strict)
+        exec_func = partial(
+            _exec_step_job, execution_times=execution_times, peak_memory=peak_memory, dag=dag, strict=strict
+        )
 
-        # Execute the graph of tasks in parallel
-        exec_graph_parallel(exec_graph, exec_func, workers)
+        # Execute the graph of tasks in parallel, every process gets its own warm step worker
+        initializer = step_workers.start_worker if _uses_step_workers(steps) else None
+        exec_graph_parallel(
+            exec_graph,
+            exec_func,
+            workers,
+            initializer=initializer,
+            sort_key=critical_path_sort_key(exec_graph),
+            resources=step_resources(steps),
+            budgets={"memory": config.MEMORY_BUDGET, "db_connections": config.DB_CONNECTIONS_BUDGET},
+        )
 
         # After all tasks have completed, write the execution times to the file
         _write_execution_times(dict(execution_times))
+        _write_peak_memory(dict(peak_memory))
 
 
 def exec_graph_parallel(
-    exec_graph: Dict[str, Any], func: Callable[[str], None], workers: int, use_threads=False, **kwargs
+    exec_graph: Dict[str, Any],
+    func: Callable[[str], None],
+    workers: int,
+    use_threads=False,
+    initializer: Optional[Callable[[], None]] = None,
+    sort_key: Optional[Callable[[str], Any]] = None,
+    resources: Optional[Dict[str, Dict[str, float]]] = None,
+    budgets: Optional[Dict[str, float]] = None,
+    **kwargs,
 ) -> None:
     """
     Execute a graph of tasks in parallel using multiple workers. TopologicalSorter orders nodes in the
@@ -460,13 +593,29 @@ def exec_graph_parallel(
     :param func: The function to be executed for each task.
     :param workers: The number of workers to use for parallel execution.
     :param use_threads: Flag indicating whether to use threads instead of processes for parallel execution.
+    :param initializer: Function called at the start of each worker.
+    :param sort_key: Key for ordering ready tasks, tasks with the lowest key are submitted first.
+    :param resources: Resources each task needs, e.g. {"task1": {"memory": 2**30, "db_connections": 10}}.
+    :param budgets: Total amount of each resource available to all running tasks. A task is only submitted if
+        its resources fit into what is left, unless no other task is running.
     :param kwargs: Additional keyword arguments to be passed to the function.
     """
+    resources = resources or {}
+    budgets = budgets or {}
+    resources_in_use: Dict[str, float] = defaultdict(float)
+
+    def fits(task: str) -> bool:
+        return all(
+            resources_in_use[name] + amount <= budgets[name]
+            for name, amount in resources.get(task, {}).items()
+            if name in budgets
+        )
+
     topological_sorter = TopologicalSorter(exec_graph)
     topological_sorter.prepare()
 
     pool_factory = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
-    with pool_factory(max_workers=workers) as executor:
+    with pool_factory(max_workers=workers, initializer=initializer) as executor:
         # Dictionary to keep track of future tasks
         future_to_task: Dict[Future, str] = {}
 
@@ -475,16 +624,27 @@ def exec_graph_parallel(
         while topological_sorter.is_active():
             # add new tasks
             ready_tasks += topological_sorter.get_ready()
+            if sort_key:
+                ready_tasks.sort(key=sort_key)
 
             # Submit tasks that are ready to the executor
-            # NOTE: limit it to `workers`, otherwise it might accept tasks that are not CPU bound
-            # and overload our DB
-            for task in ready_tasks[:workers]:
+            # NOTE: only fill idle workers, tasks queued in the executor could not be overtaken by
+            # more important tasks that become ready later. It could also accept tasks that are not
+            # CPU bound and overload our DB
+            for task in list(ready_tasks):
+                if len(future_to_task) >= workers:
+                    break
+
+                # skip tasks that don't fit into the budgets and try less important ones, but always
+                # run at least one task so that tasks exceeding the budget on their own don't get stuck
+                if future_to_task and not fits(task):
+                    continue
+
                 future = executor.submit(func, task, **kwargs)
                 future_to_task[future] = task
-
-            # remove ready tasks
-            ready_tasks = ready_tasks[workers:]
+                ready_tasks.remove(task)
+                for name, amount in resources.get(task, {}).items():
+                    resources_in_use[name] += amount
 
             # Wait for at least one future to complete
             done, _ = wait(future_to_task.keys(), return_when=FIRST_COMPLETED)
@@ -494,6 +654,134 @@ def exec_graph_parallel(
                 task = future_to_task.pop(future)
                 future.result()
                 topological_sorter.done(task)
+                for name, amount in resources.get(task, {}).items():
+                    resources_in_use[name] -= amount
+
+
+def critical_path_sort_key(
+    exec_graph: Dict[str, Set[str]], execution_times: Optional[Dict[str, float]] = None
+) -> Callable[[str], Any]:
+    """Return sort key that puts the most critical tasks first.
+
+    A task is as critical as the longest chain of tasks that depends on it (its "bottom level"),
+    including its own duration. Running tasks with the longest chains first keeps workers busy
+    towards the end of the run. Ties are broken by channel, so that grapher steps run as soon as
+    possible.
+    """
+    bottom_levels = _bottom_levels(exec_graph, _estimate_durations(exec_graph, execution_times))
+    return lambda task: (-bottom_levels.get(task, 0), _steps_sort_key(task))
+
+
+def predict_makespan(
+    exec_graph: Dict[str, Set[str]], workers: int, execution_times: Optional[Dict[str, float]] = None
+) -> float:
+    """Simulate running the graph with critical path scheduling and return the predicted wall-clock time."""
+    durations = _estimate_durations(exec_graph, execution_times)
+    sort_key = critical_path_sort_key(exec_graph, execution_times)
+
+    topological_sorter = TopologicalSorter(exec_graph)
+    topological_sorter.prepare()
+
+    now = 0.0
+    ready_tasks = []
+    # heap of (finish time, task)
+    running = []
+    while topological_sorter.is_active():
+        ready_tasks += topological_sorter.get_ready()
+        ready_tasks.sort(key=sort_key)
+        while ready_tasks and len(running) < workers:
+            task = ready_tasks.pop(0)
+            heapq.heappush(running, (now + durations[task], task))
+
+        now, task = heapq.heappop(running)
+        topological_sorter.done(task)
+
+    return now
+
+
+def _estimate_durations(
+    exec_graph: Dict[str, Set[str]], execution_times: Optional[Dict[str, float]] = None
+) -> Dict[str, float]:
+    """Estimate duration of every task from recorded execution times."""
+    if execution_times is None:
+        execution_times = _load_execution_times()
+    return _estimate_from_records(graph_nodes(exec_graph), execution_times, default=1.0)
+
+
+def _estimate_from_records(steps: Iterable[str], records: Dict[str, float], default: float) -> Dict[str, float]:
+    """Estimate value of every step from values recorded in past runs. Steps without records use
+    a previous version of the same step, or the median of their channel."""
+    # records of all versions of a step, see `_get_execution_time`
+    step_identifiers = {_get_step_identifier(step): value for step, value in records.items()}
+
+    channel_records = defaultdict(list)
+    for step, value in records.items():
+        channel_records[_channel_key(step)].append(value)
+    channel_medians = {channel: statistics.median(values) for channel, values in channel_records.items()}
+    if records:
+        default = statistics.median(records.values())
+
+    estimates = {}
+    for step in steps:
+        value = records.get(step) or step_identifiers.get(_get_step_identifier(step))
+        if value is None:
+            value = channel_medians.get(_channel_key(step), default)
+        estimates[step] = value
+    return estimates
+
+
+def step_resources(steps: List[Step], peak_memory: Optional[Dict[str, float]] = None) -> Dict[str, Dict[str, float]]:
+    """Return resources each step needs: its peak memory in bytes and the number of DB connections.
+
+    Peak memory is declared by the step code (see `DataStep.declared_peak_memory`) or learned from past runs.
+    """
+    if peak_memory is None:
+        peak_memory = _load_peak_memory()
+    learned_memory = _estimate_from_records([str(step) for step in steps], peak_memory, default=0)
+
+    resources = {}
+    for step in steps:
+        memory = step.declared_peak_memory() if isinstance(step, DataStep) else None
+        resources[str(step)] = {
+            "memory": memory if memory is not None else learned_memory[str(step)],
+            "db_connections": _grapher_db_connections() if isinstance(step, GrapherStep) else 0,
+        }
+    return resources
+
+
+def _grapher_db_connections() -> int:
+    # batched upserts use a single session, otherwise every grapher step upserts with its own pool of threads
+    return 1 if config.GRAPHER_UPSERT_BATCH_SIZE else config.GRAPHER_INSERT_WORKERS
+
+
+def _bottom_levels(exec_graph: Dict[str, Set[str]], durations: Dict[str, float]) -> Dict[str, float]:
+    """Return length of the longest path from each task to the end of the graph, including the task itself."""
+    dependents = reverse_graph(exec_graph)
+    bottom_levels: Dict[str, float] = {}
+    # walk dependents before their dependencies
+    for task in reversed(list(TopologicalSorter(exec_graph).static_order())):
+        bottom_levels[task] = durations[task] + max((bottom_levels[d] for d in dependents.get(task, ())), default=0)
+    return bottom_levels
+
+
+def _channel_key(step_name: str) -> str:
+    """Return channel of a step, e.g. `data://garden` or `snapshot`."""
+    prefix, path = step_name.split("://", 1) if "://" in step_name else ("", step_name)
+    prefix = prefix.removesuffix("-private")
+    if prefix in ("data", "grapher", "backport"):
+        return f"{prefix}://{path.split('/')[0]}"
+    return prefix
+
+
+def _create_makespan_message(steps: List[Step], workers: int) -> str:
+    """Return message with predicted wall-clock time of running steps in parallel."""
+    # don't make up predictions without any recorded execution times
+    if workers == 1 or not _load_execution_times():
+        return ""
+    makespan = predict_makespan(_create_exec_graph(steps), workers)
+    return _create_expected_time_message(
+        makespan, prepend_message=" (predicted ", append_message=f" with {workers} workers)"
+    )
 
 
 def _create_expected_time_message(
@@ -512,7 +800,11 @@ def _create_expected_time_message(
 
 
 def _exec_step_job(
-    step_name: str, execution_times: MutableMapping, dag: Optional[DAG] = None, strict: Optional[bool] = None
+    step_name: str,
+    execution_times: MutableMapping,
+    peak_memory: Optional[MutableMapping] = None,
+    dag: Optional[DAG] = None,
+    strict: Optional[bool] = None,
 ) -> None:
     """
     Executes a step.
@@ -525,37 +817,69 @@ def _exec_step_job(
     assert dag
     step = parse_step(step_name, dag)
     strict = _detect_strictness_level(step, strict)
-    with strictness_level(strict):
+    with strictness_level(strict), _track_peak_memory(step_name, peak_memory if peak_memory is not None else {}):
         execution_times[step_name] = timed_run(lambda: step.run())
     print(f"--- Finished {step_name} ({execution_times[step_name]:.1f}s)")
 
 
+@contextmanager
+def _track_peak_memory(step_name: str, peak_memory: MutableMapping) -> Iterator[None]:
+    """Record peak memory of a step, either of the current process or of the step worker that ran it."""
+    step_workers.reset_peak_rss()
+    step_workers.pop_last_step_peak_rss()
+    yield
+    # data steps run in a step worker, the rest in the current process
+    peak_memory[step_name] = step_workers.pop_last_step_peak_rss() or step_workers.peak_rss()
+
+
 def _write_execution_times(execution_times: Dict) -> None:
     # Write the recorded execution times to a hidden json file that contains the time it took to execute each step
-    execution_time_file = paths.EXECUTION_TIME_FILE
-    if execution_time_file.exists():
-        with open(execution_time_file, "r") as file:
-            stored_times = json.load(file)
+    _update_records_file(paths.EXECUTION_TIME_FILE, execution_times)
+
+
+def _write_peak_memory(peak_memory: Dict) -> None:
+    # Write the recorded peak memory to a hidden json file, it is used to avoid running out of memory in parallel runs
+    _update_records_file(paths.PEAK_MEMORY_FILE, peak_memory)
+
+
+def _update_records_file(records_file: Path, records: Dict) -> None:
+    if records_file.exists():
+        with open(records_file, "r") as file:
+            stored_records = json.load(file)
     else:
-        stored_times = {}
+        stored_records = {}
 
-    stored_times.update(execution_times)
-    with open(execution_time_file, "w") as file:
-        json.dump(stored_times, file, indent=4, sort_keys=True)
+    stored_records.update(records)
+    with open(records_file, "w") as file:
+        json.dump(stored_records, file, indent=4, sort_keys=True)
 
 
 def _get_step_identifier(step_name: str) -> str:
     return step_name.replace(step_name.split("/")[-2] + "/", "")
 
 
+def _load_execution_times() -> Dict[str, float]:
+    return _load_records_file(paths.EXECUTION_TIME_FILE)
+
+
+def _load_peak_memory() -> Dict[str, float]:
+    return _load_records_file(paths.PEAK_MEMORY_FILE)
+
+
+def _load_records_file(records_file: Path) -> Dict[str, float]:
+    if not records_file.exists():
+        return {}
+    with open(records_file, "r") as file:
+        return json.load(file)
+
+
 def _get_execution_time(step_name: str) -> Optional[float]:
     # Read execution time of a given step from the hidden json file
     # If it doesn't exist, try to read another version of the same step, and if no other version exists, return None
     if not paths.EXECUTION_TIME_FILE.exists():
         return None
     else:
-        with open(paths.EXECUTION_TIME_FILE, "r") as file:
-            execution_times = json.load(file)
+        execution_times = _load_execution_times()
         execution_time = execution_times.get(step_name)
         if not execution_time:
             # If the step has not been timed yet, try to find a previous version
@@ -368,7 +368,7 @@ def read_values_from_s3(env_path: str, namespace: str, version: str, dataset: st
     )
 
     # read them from S3
-    df = variable_data_df_from_s3(engine, variable_ids=vf.variableId.tolist(), workers=10)
+    df = variable_data_df_from_s3(engine, variable_ids=vf.variableId.tolist(), cache=True)
 
     # add variable name
     df = df.merge(vf[["variableId", "variable"]], on="variableId")
@@ -77,6 +77,13 @@ R2_SNAPSHOTS_PUBLIC = "owid-snapshots"
 R2_SNAPSHOTS_PRIVATE = "owid-snapshots-private"
 R2_SNAPSHOTS_PUBLIC_READ = "https://snapshots.owid.io"
 
+# maximum size of the local store of downloaded snapshot files (in bytes), least recently used files are
+# deleted when it grows bigger
+SNAPSHOT_BLOBS_MAX_SIZE = int(env.get("SNAPSHOT_BLOBS_MAX_SIZE", 20 * 2**30))
+
+# number of files uploaded in parallel when publishing a dataset to R2
+PUBLISH_WORKERS = int(env.get("PUBLISH_WORKERS", 10))
+
 # publishing to grapher's MySQL db
 GRAPHER_USER_ID = env.get("GRAPHER_USER_ID")
 DB_NAME = env.get("DB_NAME", "grapher")
@@ -154,6 +161,19 @@ def variable_metadata_url(variable_id):
     return f"{DATA_API_URL}/{variable_id}.metadata.json"
 
 
+def variable_data_arrow_url(variable_id):
+    return f"{DATA_API_URL}/{variable_id}.data.arrow"
+
+
+# upload indicator data also as compressed Arrow IPC stream next to JSON and prefer it when reading
+# indicator data back, data checksum is then calculated from the Arrow stream instead of JSON
+VARIABLE_DATA_ARROW = env.get("VARIABLE_DATA_ARROW") in ("True", "true", "1")
+
+# delete Arrow stream of indicators when only JSON is uploaded, set it after turning off VARIABLE_DATA_ARROW
+# so that readers preferring Arrow don't get stale data from earlier uploads
+VARIABLE_DATA_ARROW_CLEANUP = env.get("VARIABLE_DATA_ARROW_CLEANUP") in ("True", "true", "1")
+
+
 # run ETL steps with debugger on exception
 IPDB_ENABLED = False
 
@@ -161,10 +181,26 @@ IPDB_ENABLED = False
 # because we're making a lot of HTTP requests
 DIRTY_STEPS_WORKERS = int(env.get("DIRTY_STEPS_WORKERS", 5))
 
+# skip checking steps whose files (and files of their upstream steps) haven't changed since the last run
+DIRTY_INDEX = env.get("DIRTY_INDEX", "1") in ("True", "true", "1")
+
 # number of workers for grapher inserts to DB, this is for all processes, so if
 # --workers is higher than 1, this will be divided among them
 GRAPHER_INSERT_WORKERS = int(env.get("GRAPHER_WORKERS", 40))
 
+# upsert indicators of a grapher dataset in batches of this size with a few multi-row statements
+# per batch, set to 0 to upsert every indicator in its own session
+GRAPHER_UPSERT_BATCH_SIZE = int(env.get("GRAPHER_UPSERT_BATCH_SIZE", 1000))
+
+# when running steps in parallel, only start a step if the expected peak memory of all running steps
+# fits into this budget (in bytes), defaults to 80% of physical memory
+MEMORY_BUDGET = int(env.get("MEMORY_BUDGET", 0)) or int(0.8 * os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES"))
+
+# when running steps in parallel, only start a grapher step if the number of DB connections of all
+# running grapher steps fits into this budget, defaults to GRAPHER_INSERT_WORKERS before it's divided
+# among workers (i.e. the same total number of connections as without the budget)
+DB_CONNECTIONS_BUDGET = int(env.get("DB_CONNECTIONS_BUDGET", GRAPHER_INSERT_WORKERS))
+
 # only upsert indicators matching this filter, this is useful for fast development
 # of data pages for a single indicator
 GRAPHER_FILTER = env.get("GRAPHER_FILTER", None)
@@ -178,6 +214,16 @@ SUBSET = env.get("SUBSET", None)
 # (only enforced on Linux)
 MAX_VIRTUAL_MEMORY_LINUX = 32 * 2**30  # 32 GB
 
+# run data steps in long-lived worker processes that have heavy packages already imported,
+# instead of starting a new `etl d run-python-step` subprocess for every step
+STEP_WORKERS = env.get("STEP_WORKERS", "1") in ("True", "true", "1")
+
+# recycle a step worker after it ran this many steps...
+STEP_WORKER_MAX_STEPS = int(env.get("STEP_WORKER_MAX_STEPS", 50))
+
+# ...or once its resident memory grows over this
+STEP_WORKER_MAX_RSS = int(env.get("STEP_WORKER_MAX_RSS", 8 * 2**30))  # 8 GB
+
 # increment this to force a full rebuild of all datasets
 ETL_EPOCH = 5
 
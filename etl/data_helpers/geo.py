@@ -5,7 +5,7 @@ import json
 import warnings
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Literal, Optional, Set, TypeVar, Union, cast
+from typing import Any, Dict, List, Literal, Optional, Set, Tuple, TypeVar, Union, cast
 
 import numpy as np
 import owid.catalog.processing as pr
@@ -14,6 +14,7 @@ from owid.catalog import Dataset, Table, Variable
 from owid.datautils.common import ExceptionFromDocstring, warn_on_list_of_entities
 from owid.datautils.dataframes import groupby_agg, map_series
 from owid.datautils.io.json import load_json
+from scipy import sparse
 from structlog import get_logger
 
 from etl.paths import DATA_DIR, LATEST_REGIONS_DATASET_PATH
@@ -845,32 +846,206 @@ def add_gdp_to_table(
     return tb_with_gdp
 
 
-def create_table_of_regions_and_subregions(ds_regions: Dataset, subregion_type: str = "members") -> Table:
-    # Subregion type can be "members" or "successors" (or in principle also "related").
-    # Get the main table from the regions dataset.
-    tb_regions = ds_regions["regions"][["name", subregion_type]]
+# Types of subregions in the regions dataset.
+SUBREGION_TYPES = ["members", "successors", "related"]
+
+# Region resolvers by checksums of regions and income groups datasets.
+_REGION_RESOLVERS: Dict[Tuple[str, str], "RegionResolver"] = {}
+
+
+class RegionResolver:
+    """Members of regions (and income groups), and successors or related territories of regions.
+
+    They are resolved once from the regions and income groups datasets, instead of parsing JSON lists of members for
+    every region in every call. Use RegionResolver.from_datasets to share a resolver by all calls with the same
+    datasets. The resolver holds only numpy arrays and names, so it can be pickled and sent to worker processes.
+
+    Relations between regions and their subregions are stored in CSR format: names of subregions of the i-th region
+    of a relation are names[subregions[offsets[i] : offsets[i + 1]]].
+
+    """
+
+    def __init__(
+        self,
+        region_subregions: Dict[str, Dict[str, List[str]]],
+    ) -> None:
+        all_names = set()
+        for relation in region_subregions.values():
+            for region, subregions in relation.items():
+                all_names.add(region)
+                all_names.update(subregions)
+        self.names = np.array(sorted(all_names), dtype=object)
+        code_of_name = {name: code for code, name in enumerate(self.names)}
+
+        self.relations: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        for relation_name, relation in region_subregions.items():
+            regions = sorted(relation)
+            self.relations[relation_name] = (
+                np.array([code_of_name[region] for region in regions], dtype=np.int32),
+                np.cumsum([0] + [len(relation[region]) for region in regions]),
+                np.array([code_of_name[name] for region in regions for name in relation[region]], dtype=np.int32),
+            )
+
+    @classmethod
+    def from_datasets(cls, ds_regions: Dataset, ds_income_groups: Optional[Dataset] = None) -> "RegionResolver":
+        """Return resolver for given datasets, it is built only once for every version of the datasets (objects that
+        don't have a checksum, like mocks, are not cached)."""
+        key = (_dataset_checksum(ds_regions), _dataset_checksum(ds_income_groups) if ds_income_groups else "")
+        if None in key:
+            return cls._build(ds_regions, ds_income_groups)
+
+        if key not in _REGION_RESOLVERS:
+            _REGION_RESOLVERS[key] = cls._build(ds_regions, ds_income_groups)  # type: ignore
+        return _REGION_RESOLVERS[key]  # type: ignore
+
+    @classmethod
+    def _build(cls, ds_regions: Dataset, ds_income_groups: Optional[Dataset] = None) -> "RegionResolver":
+        # Get the main table from the regions dataset.
+        tb_regions = ds_regions["regions"]
+
+        # Get a mapping from code to region name.
+        mapping = tb_regions["name"].to_dict()
+
+        region_subregions = {}
+        unmapped = set()
+        for subregion_type in SUBREGION_TYPES:
+            if subregion_type not in tb_regions.columns:
+                continue
+            relation: Dict[str, List[str]] = {}
+            for region, codes in zip(tb_regions["name"], tb_regions[subregion_type]):
+                # Convert strings of lists of members into lists of names (codes without a name are kept).
+                codes = [code for code in json.loads(codes) if pd.notnull(code)] if pd.notnull(codes) else []
+                if pd.isnull(region) or not codes:
+                    continue
+                unmapped |= {code for code in codes if code not in mapping}
+                relation.setdefault(region, []).extend(mapping.get(code, code) for code in codes)
+            region_subregions[subregion_type] = relation
+
+        if unmapped:
+            warn_on_list_of_entities(unmapped, f"{len(unmapped)} missing values in mapping.", show_list=False)
+
+        if ds_income_groups is not None:
+            tb_income = _load_latest_income_groups(ds_income_groups)
+            region_subregions["income_groups"] = _countries_in_income_groups(tb_income)
+            if "income_groups" in ds_income_groups.table_names:
+                tb_income = _add_historical_regions_to_income_groups(tb_income, ds_income_groups["income_groups"])
+                region_subregions["income_groups_with_historical_regions"] = _countries_in_income_groups(tb_income)
+
+        return cls(region_subregions)
+
+    def subregions(self, subregion_type: str = "members") -> Dict[str, List[str]]:
+        """Return names of subregions (e.g. members or successors) of every region (that has any)."""
+        regions, offsets, subregions = self.relations[subregion_type]
+        names = self.names[subregions].tolist()
+        return {region: names[offsets[i] : offsets[i + 1]] for i, region in enumerate(self.names[regions].tolist())}
+
+    def subregion_pairs(self, subregion_type: str = "members") -> pd.DataFrame:
+        """Return a dataframe with columns "region" and "subregion", with a row for every subregion of every region."""
+        regions, offsets, subregions = self.relations[subregion_type]
+        return pd.DataFrame(
+            {
+                "region": self.names[np.repeat(regions, np.diff(offsets))],
+                "subregion": self.names[subregions],
+            }
+        )
+
+    def members_of_region(
+        self,
+        region: str,
+        additional_regions: Optional[List[str]] = None,
+        excluded_regions: Optional[List[str]] = None,
+        additional_members: Optional[List[str]] = None,
+        excluded_members: Optional[List[str]] = None,
+        include_historical_regions_in_income_groups: bool = False,
+    ) -> List[str]:
+        """Get countries in a region, both for known regions and custom ones, see list_members_of_region."""
+        members = self.subregions("members")
+        income_groups_relation = (
+            "income_groups_with_historical_regions" if include_historical_regions_in_income_groups else "income_groups"
+        )
+        if "income_groups" in self.relations:
+            # NOTE: This raises KeyError if historical regions were requested, but the dataset doesn't have them.
+            for income_group, countries in self.subregions(income_groups_relation).items():
+                members[income_group] = members.get(income_group, []) + countries
 
-    # Get a mapping from code to region name.
-    mapping = tb_regions["name"].to_dict()
+        # Get list of default members for the given region, if it's known.
+        countries_set = set(members.get(region, []))
 
-    # Convert strings of lists of members into lists of aliases.
-    tb_regions[subregion_type] = [
-        json.loads(member) if pd.notnull(member) else [] for member in tb_regions[subregion_type]
-    ]
+        # List countries from the list of regions included.
+        for region_included in additional_regions or []:
+            countries_set |= set(members[region_included])
 
-    # Explode list of members to have one row per member.
-    tb_regions = tb_regions.explode(subregion_type).dropna()
+        # Remove all countries from the list of regions excluded.
+        for region_excluded in excluded_regions or []:
+            countries_set -= set(members[region_excluded])
 
-    # Map member codes to names.
-    tb_regions[subregion_type] = map_series(
-        series=tb_regions[subregion_type], mapping=mapping, warn_on_missing_mappings=True
+        # Add the list of individual countries to be included.
+        countries_set |= set(additional_members or [])
+
+        # Remove the list of individual countries to be excluded.
+        countries_set -= set(excluded_members or [])
+
+        # Convert set of countries into a sorted list.
+        return sorted(countries_set)
+
+
+def _dataset_checksum(ds: Any) -> Optional[str]:
+    checksum = getattr(ds, "checksum", None)
+    return checksum() if callable(checksum) else None
+
+
+def _load_latest_income_groups(ds_income_groups: Dataset) -> pd.DataFrame:
+    if "wb_income_group" in ds_income_groups.table_names:
+        # TODO: Remove this block once the old income groups dataset has been archived.
+        # Get the main table from the income groups dataset.
+        return ds_income_groups["wb_income_group"].reset_index().rename(columns={"income_group": "classification"})
+    elif "income_groups_latest" in ds_income_groups.table_names:
+        # Get the table with the current definitions of income groups.
+        return ds_income_groups["income_groups_latest"].reset_index()
+    else:
+        raise KeyError(
+            "Table 'income_groups_latest' not found. "
+            "You may not be using the right version of the income groups dataset ds_income_groups."
+        )
+
+
+def _add_historical_regions_to_income_groups(tb_income: pd.DataFrame, tb_income_history: Table) -> pd.DataFrame:
+    # Since "income_groups_latest" does not include historical regions, optionally we take their latest
+    # classification from "income_groups" and add them to df_income.
+    historical_regions = tb_income_history.reset_index()
+    # Keep only countries that are not in "income_groups_latest".
+    # NOTE: This not only includes historical regions, but also countries that don't appear in
+    # "income_groups_latest", like Venezuela.
+    historical_regions = historical_regions[~historical_regions["country"].isin(tb_income["country"])]
+    # Keep only the latest income group classification of each historical region.
+    historical_regions = (
+        historical_regions.sort_values(["country", "year"], ascending=True)
+        .drop_duplicates(subset="country", keep="last")
+        .drop(columns="year")
+        .reset_index(drop=True)
     )
+    # Append historical regions to latest income group classifications.
+    return pd.concat([tb_income, historical_regions], ignore_index=True)
 
-    # Create a column with the list of members in each region
-    tb_countries_in_region = (
-        tb_regions.rename(columns={"name": "region"})
+
+def _countries_in_income_groups(tb_income: pd.DataFrame) -> Dict[str, List[str]]:
+    countries_in_income_groups = (
+        pd.DataFrame(tb_income)
+        .rename(columns={"classification": "region", "country": "members"})
         .groupby("region", as_index=True, observed=True)
-        .agg({subregion_type: list})
+        .agg({"members": list})
+    )
+    return countries_in_income_groups["members"].to_dict()
+
+
+def create_table_of_regions_and_subregions(ds_regions: Dataset, subregion_type: str = "members") -> Table:
+    # Subregion type can be "members" or "successors" (or in principle also "related").
+    regions_and_subregions = RegionResolver.from_datasets(ds_regions).subregions(subregion_type)
+
+    # Create a column with the list of members in each region
+    tb_countries_in_region = Table(
+        {subregion_type: list(regions_and_subregions.values())},
+        index=pd.Index(list(regions_and_subregions), name="region"),
     )
 
     return tb_countries_in_region
@@ -914,90 +1089,15 @@ def list_members_of_region(
         List of countries in the specified region.
 
     """
-    if additional_regions is None:
-        additional_regions = []
-    if excluded_regions is None:
-        excluded_regions = []
-    if additional_members is None:
-        additional_members = []
-    if excluded_members is None:
-        excluded_members = []
-
-    # Get the main table from the regions dataset and create a new table that has regions and members.
-    tb_countries_in_region = create_table_of_regions_and_subregions(ds_regions=ds_regions, subregion_type="members")
-
-    if ds_income_groups is not None:
-        if "wb_income_group" in ds_income_groups.table_names:
-            # TODO: Remove this block once the old income groups dataset has been archived.
-            # Get the main table from the income groups dataset.
-            tb_income = (
-                ds_income_groups["wb_income_group"].reset_index().rename(columns={"income_group": "classification"})
-            )
-        elif "income_groups_latest" in ds_income_groups.table_names:
-            # Get the table with the current definitions of income groups.
-            tb_income = ds_income_groups["income_groups_latest"].reset_index()
-        else:
-            raise KeyError(
-                "Table 'income_groups_latest' not found. "
-                "You may not be using the right version of the income groups dataset ds_income_groups."
-            )
-
-        if include_historical_regions_in_income_groups:
-            # Since "income_groups_latest" does not include historical regions, optionally we take their latest
-            # classification from "income_groups" and add them to df_income.
-            historical_regions = ds_income_groups["income_groups"].reset_index()
-            # Keep only countries that are not in "income_groups_latest".
-            # NOTE: This not only includes historical regions, but also countries that don't appear in
-            # "income_groups_latest", like Venezuela.
-            historical_regions = historical_regions[~historical_regions["country"].isin(tb_income["country"])]
-            # Keep only the latest income group classification of each historical region.
-            historical_regions = (
-                historical_regions.sort_values(["country", "year"], ascending=True)
-                .drop_duplicates(subset="country", keep="last")
-                .drop(columns="year")
-                .reset_index(drop=True)
-            )
-            # Append historical regions to latest income group classifications.
-            tb_income = pd.concat([tb_income, historical_regions], ignore_index=True)
-
-        # Create a dataframe of countries in each income group.
-        tb_countries_in_income_group = (
-            tb_income.rename(columns={"classification": "region", "country": "members"})  # type: ignore
-            .groupby("region", as_index=True, observed=True)
-            .agg({"members": list})
-        )
-
-        # Create a dataframe of members in regions, including income groups.
-        tb_countries_in_region = pd.concat([tb_countries_in_region, tb_countries_in_income_group], ignore_index=False)
-
-    # Get list of default members for the given region, if it's known.
-    if region in tb_countries_in_region.index.tolist():
-        countries_set = set(tb_countries_in_region.loc[region]["members"])
-    else:
-        # Initialise an empty set of members.
-        countries_set = set()
-
-    # List countries from the list of regions included.
-    countries_set |= set(
-        sum([tb_countries_in_region.loc[region_included]["members"] for region_included in additional_regions], [])
+    return RegionResolver.from_datasets(ds_regions=ds_regions, ds_income_groups=ds_income_groups).members_of_region(
+        region=region,
+        additional_regions=additional_regions,
+        excluded_regions=excluded_regions,
+        additional_members=additional_members,
+        excluded_members=excluded_members,
+        include_historical_regions_in_income_groups=include_historical_regions_in_income_groups,
     )
 
-    # Remove all countries from the list of regions excluded.
-    countries_set -= set(
-        sum([tb_countries_in_region.loc[region_excluded]["members"] for region_excluded in excluded_regions], [])
-    )
-
-    # Add the list of individual countries to be included.
-    countries_set |= set(additional_members)
-
-    # Remove the list of individual countries to be excluded.
-    countries_set -= set(excluded_members)
-
-    # Convert set of countries into a sorted list.
-    countries = sorted(countries_set)
-
-    return countries
-
 
 def detect_overlapping_regions(
     df: TableOrDataFrame,
@@ -1031,61 +1131,318 @@ def detect_overlapping_regions(
         All overlaps found.
 
     """
+    # List all variables in data (ignoring index columns).
+    variables = [column for column in df.columns if column not in index_columns]
     # Sum over all columns to get the total sum of each column for each country-year.
     tb_total = (
-        df.groupby([country_col, year_col], observed=True)
-        .agg({column: "sum" for column in df.columns if column not in index_columns})
-        .reset_index()
+        df.groupby([country_col, year_col], observed=True).agg({column: "sum" for column in variables}).reset_index()
     )
-    # Create a list of values that will be ignored in overlaps (usually zero or nothing).
+    # Values that will be ignored in overlaps (usually zero or nothing) are treated as missing.
     if ignore_overlaps_of_zeros:
-        overlapping_values_to_ignore = [0]
-    else:
-        overlapping_values_to_ignore = []
-    # List all variables in data (ignoring index columns).
-    variables = [column for column in df.columns if column not in index_columns]
-    # List all country names found in data.
-    countries_in_data = df[country_col].unique().tolist()  # type: ignore
-    # List all regions found in data.
+        tb_total = tb_total.replace([0], np.nan)
+    tb_total = tb_total.dropna(subset=[year_col])
+    # Mask of country-years (rows) and variables (columns) that have data.
+    has_data = tb_total[variables].notna().to_numpy()
+
+    # Create a table of pairs of regions and members, both found in data.
     # TODO: Possible overlaps in custom regions are not considered here. I think it would be simple enough to include
     #   here custom regions and check for overlaps.
-    regions = [country for country in list(regions_and_members) if country in countries_in_data]
-    # Initialize a list that will store all overlaps found.
+    countries_in_data = set(df[country_col].unique().tolist())  # type: ignore
+    pairs = pd.DataFrame(
+        [
+            (region, member)
+            for region, members in regions_and_members.items()
+            if region in countries_in_data
+            for member in members
+            if member in countries_in_data
+        ],
+        columns=["region", "member"],
+        dtype=object,
+    ).drop_duplicates()
+    pairs["pair"] = np.arange(len(pairs))
+
+    # Join each pair with the country-years of the region and then with the same years of the member.
+    rows = pd.DataFrame(
+        {
+            "country": tb_total[country_col].astype(object).to_numpy(),
+            "year": tb_total[year_col].to_numpy(),
+            "row": np.arange(len(tb_total)),
+        }
+    )
+    joined = pairs.merge(
+        rows.rename(columns={"country": "region", "row": "region_row"}), on="region", how="inner"
+    ).merge(rows.rename(columns={"country": "member", "row": "member_row"}), on=["member", "year"], how="inner")
+    # There is an overlap on a year if both region and member have data for the same variable.
+    overlapping = has_data[joined["region_row"].to_numpy()] & has_data[joined["member_row"].to_numpy()]
+    joined = joined[overlapping.any(axis=1)].sort_values("pair", kind="stable")
+
+    # Gather overlaps in the order of regions and members.
     all_overlaps = []
-    for region in regions:
-        # List members of current region.
-        members = [member for member in regions_and_members[region] if member in countries_in_data]
-        for member in members:
-            # Select data for current region.
-            region_values = (
-                tb_total[tb_total[country_col] == region]
-                .replace(overlapping_values_to_ignore, np.nan)
-                .dropna(subset=variables, how="all")
-            )
-            # Select data for current member.
-            member_values = (
-                tb_total[tb_total[country_col] == member]
-                .replace(overlapping_values_to_ignore, np.nan)
-                .dropna(subset=variables, how="all")
-            )
-            # Concatenate both selections of data, and select duplicated rows.
-            combined = pd.concat([region_values, member_values])
-            # Option 1: Check if there is an overlap on the same year (even if not on the same variable).
-            # overlaps = combined[combined.duplicated(subset=[year_col], keep=False)]  # type: ignore
-            # Option 2: Check if there is an overlap on the same year and on the same variable.
-            # Count how many non-nan values are present for each year, among the two countries considered.
-            counts = combined.drop(columns=country_col).groupby(year_col, as_index=True, observed=True).count()
-            overlaps = counts[counts.max(axis=1) > 1]
-            if len(overlaps) > 0:
-                # Define new overlap in a convenient format.
-                new_overlap = {year: {region, member} for year in set(overlaps.index)}
-                # Add the overlap found to the dictionary of all overlaps.
-                if new_overlap not in all_overlaps:
-                    all_overlaps.append(new_overlap)
+    for (_, region, member), years in joined.groupby(["pair", "region", "member"], sort=False)["year"]:
+        # Define new overlap in a convenient format.
+        new_overlap = {year: {region, member} for year in years.tolist()}
+        # Add the overlap found to the dictionary of all overlaps.
+        if new_overlap not in all_overlaps:
+            all_overlaps.append(new_overlap)
 
     return all_overlaps
 
 
+# Aggregations that _add_regions_aggregates_at_once can compute for all regions at once (any other aggregation is
+# done region by region, with add_region_aggregates).
+AGGREGATIONS_AT_ONCE = {"sum", "mean"}
+
+# Number of columns aggregated at once (the larger it is, the more memory it requires).
+AGGREGATION_BLOCK_SIZE = 32
+
+
+def _can_aggregate_regions_at_once(
+    df: pd.DataFrame,
+    members: Dict[str, List[str]],
+    aggregations: Dict[str, Any],
+    index_columns: List[str],
+    country_col: str,
+    keep_original_region_with_suffix: Optional[str],
+) -> bool:
+    """Check whether _add_regions_aggregates_at_once gives the same result as applying add_region_aggregates to one
+    region after another.
+
+    That is the case for sums and means of numeric columns, as long as no region is a member of another region (in
+    which case the aggregate of one region would depend on the aggregate of the other).
+    """
+    if not df.columns.is_unique or not set(index_columns) <= set(df.columns) or len(index_columns) < 2:
+        return False
+
+    for column, aggregation in aggregations.items():
+        if column not in df.columns or not isinstance(aggregation, str) or aggregation not in AGGREGATIONS_AT_ONCE:
+            return False
+        dtype = df[column].dtype
+        if pd.api.types.is_bool_dtype(dtype) or not pd.api.types.is_numeric_dtype(dtype) or dtype.kind == "c":
+            return False
+
+    region_names = set(members)
+    if keep_original_region_with_suffix is not None:
+        region_names |= {region + keep_original_region_with_suffix for region in members}
+    return all(region_names.isdisjoint(countries) for countries in members.values())
+
+
+def _add_regions_aggregates_at_once(
+    df: pd.DataFrame,
+    members: Dict[str, List[str]],
+    aggregations: Dict[str, str],
+    index_columns: List[str],
+    countries_that_must_have_data: Dict[str, List[str]],
+    num_allowed_nans_per_year: Optional[int] = None,
+    frac_allowed_nans_per_year: Optional[float] = None,
+    min_num_values_per_year: Optional[int] = None,
+    country_col: str = "country",
+    keep_original_region_with_suffix: Optional[str] = None,
+) -> pd.DataFrame:
+    """Add aggregates of multiple regions to a dataframe in a single pass.
+
+    This gives the same result as applying add_region_aggregates to one region after another (see
+    _can_aggregate_regions_at_once for when that's possible), but it doesn't filter, concatenate and sort the full
+    dataframe for every region.
+
+    """
+    if not members:
+        return df
+
+    rows_original_regions = df[country_col].isin(list(members))
+    regions_with_data = set(df.loc[rows_original_regions, country_col])
+    df_updated = [df[~rows_original_regions]]
+    if isinstance(keep_original_region_with_suffix, str):
+        # Keep original data for regions, appending a suffix to their names.
+        df_original_regions = df[rows_original_regions].reset_index(drop=True)
+        df_original_regions[country_col] = (
+            df_original_regions[country_col].astype(str) + keep_original_region_with_suffix
+        )
+        df_updated.append(df_original_regions)
+    else:
+        # See the warning in add_region_aggregates about regions that already have data for columns without aggregations.
+        columns_without_aggregate = set(df.drop(columns=index_columns).columns) - set(aggregations)
+        if len(columns_without_aggregate) > 0:
+            for region in members:
+                if region in regions_with_data:
+                    log.warning(
+                        f"Region {region} already has data for columns that do not have a defined aggregation method: "
+                        f"({columns_without_aggregate}). That data will become nan."
+                    )
+
+    df_regions = _aggregate_regions(
+        df=df,
+        members=members,
+        aggregations=aggregations,
+        index_columns=index_columns,
+        countries_that_must_have_data=countries_that_must_have_data,
+        num_allowed_nans_per_year=num_allowed_nans_per_year,
+        frac_allowed_nans_per_year=frac_allowed_nans_per_year,
+        min_num_values_per_year=min_num_values_per_year,
+        country_col=country_col,
+    )
+    if len(df_regions) > 0:
+        df_updated.append(df_regions)
+
+    # Sort conveniently.
+    df_updated = pd.concat(df_updated, ignore_index=True).sort_values(index_columns).reset_index(drop=True)
+
+    # Convert country to categorical if the original was
+    if df[country_col].dtype.name == "category":
+        # Adding regions one after another keeps (unused) categories of regions whose original data was removed after
+        # the last time the country column was not categorical, i.e. after the last region with new rows.
+        regions_with_rows = set(df_updated[country_col]) & set(members)
+        if isinstance(keep_original_region_with_suffix, str):
+            regions_with_rows |= regions_with_data
+        if regions_with_rows:
+            last = max(i for i, region in enumerate(members) if region in regions_with_rows)
+            removed = [region for region in list(members)[last + 1 :] if region in regions_with_data]
+            categories = sorted(set(df_updated[country_col].dropna()) | set(removed))
+            df_updated[country_col] = pd.Categorical(df_updated[country_col], categories=categories)
+        else:
+            df_updated = df_updated.astype({country_col: "category"})
+
+    return df_updated
+
+
+def _aggregate_regions(
+    df: pd.DataFrame,
+    members: Dict[str, List[str]],
+    aggregations: Dict[str, str],
+    index_columns: List[str],
+    countries_that_must_have_data: Dict[str, List[str]],
+    num_allowed_nans_per_year: Optional[int] = None,
+    frac_allowed_nans_per_year: Optional[float] = None,
+    min_num_values_per_year: Optional[int] = None,
+    country_col: str = "country",
+) -> pd.DataFrame:
+    """Create rows with aggregates for all regions, with the same values as add_region_aggregates would create.
+
+    A "cell" is a combination of a region and values of index columns other than country (e.g. a year) for which at
+    least one member of the region has data. A sparse matrix maps rows of the dataframe to cells, so that sums and
+    number of nans of all cells are computed by a single matrix product for a block of columns.
+
+    """
+    regions = list(members)
+    group_columns = [column for column in index_columns if column != country_col]
+
+    # Codes of countries and groups (e.g. years) of every row.
+    country_codes, countries = pd.factorize(df[country_col])
+    code_of_country = {country: code for code, country in enumerate(countries)}
+    group_ids = df.groupby(group_columns, dropna=False, observed=True, sort=False).ngroup().to_numpy()
+    _, first_row_of_group = np.unique(group_ids, return_index=True)
+    n_groups = len(first_row_of_group)
+
+    # Membership (and must-have-data) matrices of regions (rows) and countries (columns).
+    is_member = np.zeros((len(regions), len(countries) + 1), dtype=bool)
+    must_have_data = np.zeros_like(is_member)
+    for i, region in enumerate(regions):
+        is_member[i, [code_of_country[c] for c in set(members[region]) if c in code_of_country]] = True
+        must_have_data[
+            i, [code_of_country[c] for c in set(countries_that_must_have_data[region]) if c in code_of_country]
+        ] = True
+    num_must_have_data = np.array([len(set(countries_that_must_have_data[region])) for region in regions])
+
+    # Pairs of regions and rows of their members (rows with a missing country have code -1, and are not members).
+    entry_regions, entry_rows = np.nonzero(is_member[:, country_codes])
+    cells, entry_cells = np.unique(entry_regions * n_groups + group_ids[entry_rows], return_inverse=True)
+    cell_regions, cell_groups = np.divmod(cells, n_groups)
+    num_cells = len(cells)
+    if num_cells == 0:
+        return pd.DataFrame()
+
+    # Matrix mapping rows to cells.
+    to_cells = sparse.csr_matrix(
+        (np.ones(len(entry_rows), dtype=np.int64), (entry_cells, entry_rows)), shape=(num_cells, len(df))
+    )
+    num_elements = np.bincount(entry_cells, minlength=num_cells)
+
+    # Cells where all countries that must have data have at least one row (regardless of their values).
+    is_must_have = must_have_data[entry_regions, country_codes[entry_rows]]
+    cells_and_countries = np.unique(
+        entry_cells[is_must_have].astype(np.int64) * (len(countries) + 1) + country_codes[entry_rows[is_must_have]]
+    )
+    num_present = np.bincount(cells_and_countries // (len(countries) + 1), minlength=num_cells)
+    cells_with_required_countries = num_present == num_must_have_data[cell_regions]
+
+    df_regions = df[group_columns].iloc[first_row_of_group[cell_groups]].reset_index(drop=True)
+    df_regions.insert(0, country_col, np.array(regions, dtype=object)[cell_regions])
+
+    columns = list(aggregations)
+    for start in range(0, len(columns), AGGREGATION_BLOCK_SIZE):
+        block = columns[start : start + AGGREGATION_BLOCK_SIZE]
+        # Integers are summed as integers, to keep them exact.
+        for is_integer in (True, False):
+            block_columns = [
+                column for column in block if pd.api.types.is_integer_dtype(df[column].dtype) == is_integer
+            ]
+            if not block_columns:
+                continue
+            values = np.column_stack(
+                [df[column].to_numpy(dtype=np.int64 if is_integer else float, na_value=0) for column in block_columns]
+            )
+            nans = np.column_stack([df[column].isnull().to_numpy() for column in block_columns]).astype(np.int64)
+            sums = to_cells @ values
+            num_nans = to_cells @ nans
+
+            for i, column in enumerate(block_columns):
+                df_regions[column] = _region_aggregate_values(
+                    column=df[column],
+                    aggregation=aggregations[column],
+                    sums=sums[:, i],
+                    num_nans=num_nans[:, i],
+                    num_elements=num_elements,
+                    is_valid=cells_with_required_countries,
+                    num_allowed_nans=num_allowed_nans_per_year,
+                    frac_allowed_nans=frac_allowed_nans_per_year,
+                    min_num_values=min_num_values_per_year,
+                )
+
+    return df_regions
+
+
+def _region_aggregate_values(
+    column: pd.Series,
+    aggregation: str,
+    sums: np.ndarray,
+    num_nans: np.ndarray,
+    num_elements: np.ndarray,
+    is_valid: np.ndarray,
+    num_allowed_nans: Optional[int] = None,
+    frac_allowed_nans: Optional[float] = None,
+    min_num_values: Optional[int] = None,
+) -> Any:
+    """Return aggregates of a column for all cells, after making nan those that don't fulfil the conditions on nans
+    (the same conditions as in groupby_agg)."""
+    is_valid = is_valid.copy()
+    if num_allowed_nans is not None:
+        is_valid &= num_nans <= num_allowed_nans
+    if frac_allowed_nans is not None:
+        is_valid &= num_nans / num_elements <= frac_allowed_nans
+    if min_num_values is not None:
+        is_valid &= (num_elements - num_nans >= min_num_values) | (num_nans == 0)
+
+    if aggregation == "mean":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = sums / (num_elements - num_nans)
+    else:
+        values = sums
+
+    # Data type that the aggregation would have with pandas groupby.
+    dtype = column.iloc[:1].groupby(np.zeros(1, dtype=int)).agg(aggregation).dtype
+
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        result = pd.array(values, dtype=dtype)
+        result[~is_valid] = pd.NA
+        return result
+
+    if not is_valid.all():
+        values = values.astype(float if dtype.kind in "iu" else dtype)
+        values[~is_valid] = np.nan
+        return values
+
+    return values.astype(dtype)
+
+
 def add_regions_to_table(
     tb: TableOrDataFrame,
     ds_regions: Dataset,
@@ -1220,6 +1577,9 @@ def add_regions_to_table(
     if index_columns is None:
         index_columns = [country_col, year_col]
 
+    # Resolve members of all regions only once.
+    resolver = RegionResolver.from_datasets(ds_regions=ds_regions, ds_income_groups=ds_income_groups)
+
     if check_for_region_overlaps:
         # Find overlaps between regions and its members.
 
@@ -1227,10 +1587,7 @@ def add_regions_to_table(
             accepted_overlaps = []
 
         # Create a dictionary of regions and its members.
-        df_regions_and_members = create_table_of_regions_and_subregions(
-            ds_regions=ds_regions, subregion_type=subregion_type
-        )
-        regions_and_members = df_regions_and_members[subregion_type].to_dict()
+        regions_and_members = resolver.subregions(subregion_type)
 
         # Assume incoming table has a dummy index (the whole function may not work otherwise).
         # Example of region_and_members:
@@ -1279,7 +1636,8 @@ def add_regions_to_table(
     else:
         countries_that_must_have_data = {region: [] for region in list(regions)}
 
-    # Add region aggregates.
+    # List members of each region.
+    members = {}
     for region in regions:
         # Check that the content of the region dictionary is as expected.
         expected_items = {"additional_regions", "excluded_regions", "additional_members", "excluded_members"}
@@ -1289,11 +1647,8 @@ def add_regions_to_table(
                 f"Unknown items in dictionary of regions {region}: {unknown_items}. Expected: {expected_items}."
             )
 
-        # List members of the region.
-        members = list_members_of_region(
+        members[region] = resolver.members_of_region(
             region=region,
-            ds_regions=ds_regions,
-            ds_income_groups=ds_income_groups,
             additional_regions=regions[region].get("additional_regions"),
             excluded_regions=regions[region].get("excluded_regions"),
             additional_members=regions[region].get("additional_members"),
@@ -1305,21 +1660,44 @@ def add_regions_to_table(
         #   identical to df_with_regions, but overlaps in accepted_overlaps are solved (e.g. the data for the historical
         #   or parent region is made nan).
 
-        # Add aggregate data for current region.
-        df_with_regions = add_region_aggregates(
+    if _can_aggregate_regions_at_once(
+        df=df_with_regions,
+        members=members,
+        aggregations=aggregations,
+        index_columns=index_columns,
+        country_col=country_col,
+        keep_original_region_with_suffix=keep_original_region_with_suffix,
+    ):
+        # Add aggregate data for all regions in a single pass.
+        df_with_regions = _add_regions_aggregates_at_once(
             df=df_with_regions,
-            region=region,
+            members=members,
             aggregations=aggregations,
             index_columns=index_columns,
-            countries_in_region=members,
-            countries_that_must_have_data=countries_that_must_have_data[region],
+            countries_that_must_have_data=countries_that_must_have_data,
             num_allowed_nans_per_year=num_allowed_nans_per_year,
             frac_allowed_nans_per_year=frac_allowed_nans_per_year,
             min_num_values_per_year=min_num_values_per_year,
             country_col=country_col,
-            year_col=year_col,
             keep_original_region_with_suffix=keep_original_region_with_suffix,
         )
+    else:
+        # Add aggregate data for one region after another.
+        for region in regions:
+            df_with_regions = add_region_aggregates(
+                df=df_with_regions,
+                region=region,
+                aggregations=aggregations,
+                index_columns=index_columns,
+                countries_in_region=members[region],
+                countries_that_must_have_data=countries_that_must_have_data[region],
+                num_allowed_nans_per_year=num_allowed_nans_per_year,
+                frac_allowed_nans_per_year=frac_allowed_nans_per_year,
+                min_num_values_per_year=min_num_values_per_year,
+                country_col=country_col,
+                year_col=year_col,
+                keep_original_region_with_suffix=keep_original_region_with_suffix,
+            )
 
     # If the original object was a Table, copy metadata
     if isinstance(tb, Table):
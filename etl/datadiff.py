@@ -2,8 +2,7 @@ import difflib
 import os
 import re
 import traceback
-import urllib.error
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Callable, Dict, Iterable, List, Optional, Union, cast
 
@@ -13,19 +12,35 @@ import requests
 import rich
 import rich_click as click
 import structlog
-from owid.catalog import Dataset, DatasetMeta, LocalCatalog, RemoteCatalog, Table, VariableMeta, find
+from owid.catalog import Dataset, DatasetMeta, LocalCatalog, RemoteCatalog, Table, VariableMeta, find, http_utils
 from owid.catalog.catalogs import CHANNEL, OWID_CATALOG_URI
+from owid.catalog.datasets import PREFERRED_FORMAT
 from rich.console import Console
 from rich.panel import Panel
 from rich.syntax import Syntax
 from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 
 from etl.files import yaml_dump
+from etl.paths import CACHE_DIR
 from etl.steps import load_dag
 from etl.tempcompare import series_equals
 
 log = structlog.get_logger()
 
+# Tables with at least this many rows are compared by partitions of their index, and only partitions that differ
+# are aligned and compared value by value.
+PARTITIONED_DIFF_MIN_ROWS = 100_000
+
+# Average number of rows in a partition (by hash of index) of large tables.
+DIFF_PARTITION_ROWS = 1000
+
+# Tables from remote catalog are downloaded to this folder, under checksum of their dataset. Checksum changes with
+# any change of the dataset, so cached tables never have to be invalidated.
+REMOTE_CACHE_DIR = CACHE_DIR / "datadiff"
+
+# Maximum number of concurrent downloads of remote tables.
+MAX_DOWNLOADS = 10
+
 
 class DatasetError(Exception):
     pass
@@ -149,8 +164,24 @@ tb = {_snippet_dataset(ds_b, table_name)}
                 if table_b.index.names != [None]:
                     table_b = table_b.reset_index()
 
+            # number of rows of the new table, used for shares of new, removed and changed values
+            n_rows = len(table_b)
+
             # only sort index if different to avoid unnecessary sorting for huge datasets such as ghe
-            if len(table_a) != len(table_b) or not _index_equals(table_a, table_b):
+            align = len(table_a) != len(table_b) or not _index_equals(table_a, table_b)
+
+            # aligning large tables is slow and memory intensive, keep only partitions with differences in index
+            # or in compared columns
+            if align and table_a.index.names != [None] and max(len(table_a), len(table_b)) >= PARTITIONED_DIFF_MIN_ROWS:
+                # aligning tables adds missing columns, so compare columns from both tables
+                compared_cols = [
+                    col
+                    for col in dict.fromkeys(list(table_a.columns) + list(table_b.columns))
+                    if not (self.cols and not re.search(self.cols, col))
+                ]
+                table_a, table_b = _differing_partitions(table_a, table_b, compared_cols)
+
+            if align:
                 table_a, table_b, eq_index, new_index, removed_index = _align_tables(table_a, table_b)
             else:
                 eq_index = pd.Series(True, index=table_a.index)
@@ -193,6 +224,7 @@ tb = {_snippet_dataset(ds_b, table_name)}
                                 eq_index,
                                 new_index,
                                 removed_index,
+                                n=n_rows,
                                 tabs=4,
                             )
                             if out:
@@ -237,7 +269,16 @@ tb = {_snippet_dataset(ds_b, table_name)}
                                 if meta_diff:
                                     self.p("")
                                 out = _data_diff(
-                                    table_a, table_b, col, dims, eq_data, eq_index, new_index, removed_index, tabs=4
+                                    table_a,
+                                    table_b,
+                                    col,
+                                    dims,
+                                    eq_data,
+                                    eq_index,
+                                    new_index,
+                                    removed_index,
+                                    n=n_rows,
+                                    tabs=4,
                                 )
                                 if out:
                                     self.p(out)
@@ -257,11 +298,26 @@ tb = {_snippet_dataset(ds_b, table_name)}
 class RemoteDataset:
     """Dataset from remote catalog with the same interface as Dataset."""
 
-    def __init__(self, dataset_meta: DatasetMeta, table_names: List[str]):
+    def __init__(
+        self,
+        dataset_meta: DatasetMeta,
+        table_names: List[str],
+        table_files: Optional[Dict[str, str]] = None,
+        checksum: Optional[str] = None,
+    ):
+        """
+        :param table_files: Path of the data file of every table in the remote catalog
+        :param checksum: Checksum of the dataset from the remote catalog, tables are cached under it
+        """
         self.metadata = dataset_meta
         self.table_names = table_names
+        self.table_files = table_files or {}
+        self.checksum = checksum
 
     def __getitem__(self, name: str) -> Table:
+        if self.checksum and name in self.table_files:
+            return Table.read(_cached_remote_file(self.checksum, self.table_files[name]))
+
         tables = find(
             table=name,
             namespace=self.metadata.namespace,
@@ -402,21 +458,16 @@ def cli(
 
         matched_datasets.append((ds_a, ds_b))
 
+    # download remote tables of all datasets at once
+    prefetch_remote_tables([ds for pair in matched_datasets for ds in pair])
+
     if workers > 1:
         futures = []
 
-        with ThreadPoolExecutor(max_workers=workers) as executor:
+        # compare datasets in parallel and print their diffs in order
+        with ProcessPoolExecutor(max_workers=workers) as executor:
             for ds_a, ds_b in matched_datasets:
-
-                def func(ds_a, ds_b):
-                    lines = []
-                    differ = DatasetDiff(
-                        ds_a, ds_b, cols=cols, print=lambda x: lines.append(x), verbose=verbose, snippet=snippet
-                    )
-                    differ.summary()
-                    return lines
-
-                futures.append(executor.submit(func, ds_a, ds_b))
+                futures.append(executor.submit(_diff_lines, ds_a, ds_b, cols=cols, verbose=verbose, snippet=snippet))
 
             for future in futures:
                 try:
@@ -483,6 +534,13 @@ def cli(
     exit(1 if any_diff else 0)
 
 
+def _diff_lines(ds_a: Optional[Dataset], ds_b: Optional[Dataset], **kwargs: Any) -> List[Any]:
+    """Return lines of the diff of two datasets instead of printing them."""
+    lines = []
+    DatasetDiff(ds_a, ds_b, print=lines.append, **kwargs).summary()
+    return lines
+
+
 def _index_equals(table_a: pd.DataFrame, table_b: pd.DataFrame, sample: int = 1000) -> bool:
     """Check if two tables have the same index. Sample both tables to speed up the check."""
     if len(table_a) < sample and len(table_b) < sample:
@@ -536,11 +594,14 @@ def _data_diff(
     eq_index: pd.Series,
     new_index: pd.Series,
     removed_index: pd.Series,
+    n: Optional[int] = None,
     tabs: int = 0,
 ) -> str:
-    """Return summary of data differences."""
+    """Return summary of data differences. `n` is the number of rows of the new table, if tables only contain
+    rows with differences."""
     # eq = eq_data & eq_index
-    n = (eq_index | new_index).sum()
+    if n is None:
+        n = (eq_index | new_index).sum()
 
     lines = []
 
@@ -654,6 +715,42 @@ def _align_tables(table_a: Table, table_b: Table) -> tuple[Table, Table, pd.Seri
     return cast(Table, table_a), cast(Table, table_b), eq_index, new_index, removed_index
 
 
+def _partition_digests(table: Table, columns: List[str], partitions: int) -> tuple[np.ndarray, np.ndarray]:
+    """Assign rows to partitions by hash of their index. Return partition of every row and digests of every
+    partition, with number of rows, digest of index and digest of every column. Values are hashed together with
+    their index, so digests don't depend on the order of rows. Missing columns are hashed as missing values."""
+    index_hash = pd.util.hash_pandas_object(table.index, index=False).to_numpy()
+    partition = (index_hash % np.uint64(partitions)).astype(np.intp)
+
+    def _sum_by_partition(hashes: np.ndarray) -> np.ndarray:
+        # sums overflow on purpose
+        sums = np.zeros(partitions, dtype=np.uint64)
+        np.add.at(sums, partition, hashes)
+        return sums
+
+    digests = [np.bincount(partition, minlength=partitions).astype(np.uint64), _sum_by_partition(index_hash)]
+    for col in columns:
+        if col in table.columns:
+            values_hash = pd.util.hash_pandas_object(table[col], index=False).to_numpy()
+        else:
+            values_hash = np.repeat(pd.util.hash_array(np.array([np.nan])), len(table))
+        digests.append(
+            _sum_by_partition(pd.util.hash_array(index_hash ^ (values_hash * np.uint64(0x9E3779B97F4A7C15))))
+        )
+
+    return partition, np.column_stack(digests)
+
+
+def _differing_partitions(table_a: Table, table_b: Table, columns: List[str]) -> tuple[Table, Table]:
+    """Return rows of both tables from partitions that differ in index or in values of given columns. All rows with
+    differences are kept, so the tables can be aligned and compared as if they were complete."""
+    partitions = max(len(table_a), len(table_b)) // DIFF_PARTITION_ROWS + 1
+    partition_a, digests_a = _partition_digests(table_a, columns, partitions)
+    partition_b, digests_b = _partition_digests(table_b, columns, partitions)
+    differing = (digests_a != digests_b).any(axis=1)
+    return cast(Table, table_a[differing[partition_a]].copy()), cast(Table, table_b[differing[partition_b]].copy())
+
+
 def _sort_index(df: Table) -> Table:
     """Sort dataframe by its index and make sure categories are sorted by their
     names and not codes. Modifies the dataframe in place and also returns it."""
@@ -784,14 +881,59 @@ def _local_catalog_datasets(
 
 def _fetch_remote_dataset(path: str, frame: pd.DataFrame) -> RemoteDataset:
     uri = f"{OWID_CATALOG_URI}{path}/index.json"
-    js = requests.get(uri).json()
+    js = http_utils.get(uri).json()
     # drop origins for backward compatibility
     js.pop("origins", None)
     ds_meta = DatasetMeta(**js)
     # TODO: channel should be in DatasetMeta by default
     ds_meta.channel = path.split("/")[0]  # type: ignore
-    table_names = frame.loc[frame["ds_paths"] == path, "table"].tolist()
-    return RemoteDataset(ds_meta, table_names)
+    rows = frame[frame["ds_paths"] == path]
+    table_names = rows["table"].tolist()
+    table_files = {row["table"]: f"{row['path']}.{_table_format(row)}" for _, row in rows.iterrows()}
+    checksum = rows["checksum"].iloc[0] if "checksum" in rows.columns and len(rows) else None
+    return RemoteDataset(ds_meta, table_names, table_files, checksum if isinstance(checksum, str) else None)
+
+
+def _table_format(row: pd.Series) -> str:
+    """Format of the data file of a table in the catalog, the same one as `CatalogSeries.load` would use."""
+    if "format" in row and isinstance(row["format"], str):
+        return row["format"]
+    formats = list(row["formats"])
+    return PREFERRED_FORMAT if PREFERRED_FORMAT in formats else formats[0]
+
+
+def _cached_remote_file(checksum: str, path: str) -> Path:
+    """Return local copy of a data file (and its metadata) of a table from the remote catalog, download it if
+    it isn't in the cache yet."""
+    cached = REMOTE_CACHE_DIR / checksum / Path(path).name
+    if not cached.exists():
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        # metadata goes first, data file then marks a complete download
+        meta_path = str(Path(path).with_suffix(".meta.json"))
+        _download_file(OWID_CATALOG_URI + meta_path, cached.with_suffix(".meta.json"))
+        _download_file(OWID_CATALOG_URI + path, cached)
+    return cached
+
+
+def _download_file(url: str, path: Path) -> None:
+    """Download a file, it's written to a temporary file first so that concurrent runs never read incomplete files."""
+    http_utils.download(url, path)
+
+
+def prefetch_remote_tables(datasets: Iterable[Optional[Dataset]], max_downloads: int = MAX_DOWNLOADS) -> None:
+    """Download all tables of remote datasets to the cache concurrently, so that diffs of datasets don't have
+    to wait for them one by one. Failed downloads are only logged, they are retried when the table is loaded."""
+    files = {
+        (ds.checksum, file)
+        for ds in datasets
+        if isinstance(ds, RemoteDataset) and ds.checksum
+        for file in ds.table_files.values()
+    }
+    with ThreadPoolExecutor(max_workers=max_downloads) as executor:
+        futures = {executor.submit(_cached_remote_file, checksum, file): file for checksum, file in sorted(files)}
+    for future, file in futures.items():
+        if future.exception():
+            log.warning(f"Failed to download {file}: {future.exception()}")
 
 
 def _remote_catalog_datasets(channels: Iterable[CHANNEL], include: str, exclude: Optional[str]) -> Dict[str, Dataset]:
@@ -831,7 +973,7 @@ def _remote_catalog_datasets(channels: Iterable[CHANNEL], include: str, exclude:
 @retry(
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=2, max=10),
-    retry=retry_if_exception_type(urllib.error.HTTPError),
+    retry=retry_if_exception_type(requests.HTTPError),
 )
 def get_table_with_retry(ds: Dataset, table_name: str) -> Table:
     return ds[table_name]
@@ -7,7 +7,9 @@ import io
 import json
 import os
 import re
+import sqlite3
 import subprocess
+import threading
 import time
 from collections import OrderedDict
 from pathlib import Path
@@ -16,11 +18,14 @@ from typing import Any, Dict, Generator, List, Optional, Set, TextIO, Union
 
 import pandas as pd
 import ruamel.yaml
+import structlog
 import yaml
 from ruamel.yaml import YAML
 from yaml.dumper import Dumper
 
-from etl.paths import BASE_DIR
+from etl.paths import BASE_DIR, CHECKSUM_CACHE_FILE
+
+log = structlog.get_logger()
 
 
 class RuntimeCache:
@@ -53,6 +58,103 @@ class RuntimeCache:
 
 CACHE_CHECKSUM_FILE = RuntimeCache()
 
+
+class PersistentChecksumCache:
+    """Checksums of files persisted in a SQLite database, so that we don't have to re-hash all
+    files on every ETL run. It is safe to use from multiple threads and processes.
+
+    A checksum is only valid if the file has the same path, size, modification time and inode as
+    when it was computed. Files modified in the last few seconds are not cached, because a
+    modification within the same mtime tick could go unnoticed.
+    """
+
+    # don't cache checksums of files modified more recently than this (in nanoseconds)
+    MIN_AGE_NS = 2 * 10**9
+
+    def __init__(self, db_path: Union[str, Path]) -> None:
+        self.db_path = Path(db_path)
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._disabled = False
+
+    def get(self, filename: str, stat: os.stat_result) -> Optional[str]:
+        conn = self._connect()
+        if conn is None:
+            return None
+
+        try:
+            row = conn.execute(
+                "SELECT checksum FROM checksums WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?",
+                (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns, stat.st_ino),
+            ).fetchone()
+        except sqlite3.OperationalError:
+            # database is locked by another process for too long, compute the checksum instead
+            row = None
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return row[0]
+
+    def set(self, filename: str, stat: os.stat_result, checksum: str) -> None:
+        if time.time_ns() - stat.st_mtime_ns < self.MIN_AGE_NS:
+            return
+
+        conn = self._connect()
+        if conn is None:
+            return
+
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO checksums (path, size, mtime_ns, inode, checksum) VALUES (?, ?, ?, ?, ?)",
+                (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns, stat.st_ino, checksum),
+            )
+        except sqlite3.OperationalError:
+            # database is locked by another process for too long, we'll cache it next time
+            pass
+
+    def clear(self) -> None:
+        conn = self._connect()
+        if conn is not None:
+            conn.execute("DELETE FROM checksums")
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Return connection for the current thread and process, SQLite connections can't be shared."""
+        if self._disabled:
+            return None
+
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            # autocommit mode, every statement is its own transaction
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS checksums "
+                "(path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, checksum TEXT)"
+            )
+        except (sqlite3.Error, OSError) as e:
+            # e.g. read-only filesystem, fall back to hashing files every time
+            log.warning("checksum_cache.disabled", path=self.db_path, error=str(e))
+            self._disabled = True
+            return None
+
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+
+CHECKSUM_CACHE = PersistentChecksumCache(CHECKSUM_CACHE_FILE)
+
 TEXT_CHARS = bytes(range(32, 127)) + b"\n\r\t\f\b"
 DEFAULT_CHUNK_SIZE = 512
 
@@ -107,27 +209,40 @@ def checksum_file(filename: Union[str, Path]) -> str:
     if isinstance(filename, Path):
         filename = filename.as_posix()
 
-    mtime = os.path.getmtime(filename)
-    key = f"{filename}-{mtime}"
+    stat = os.stat(filename)
+    key = f"{filename}-{stat.st_mtime}"
 
-    if filename not in CACHE_CHECKSUM_FILE:
-        # Special case for regions.yml, we want to ignore the 'aliases' key
-        if os.path.basename(filename) == "regions.yml":
-            with open(filename, "r") as f:
-                s = f.read()
+    if key not in CACHE_CHECKSUM_FILE:
+        checksum = CHECKSUM_CACHE.get(filename, stat)
 
-            # Regular expression to match the 'aliases' and its list
-            regex_pattern = r"  aliases:\n(\s+-[^\n]*\n?)*"
-            s = re.sub(regex_pattern, "", s)
+        if checksum is None:
+            # Special case for regions.yml, we want to ignore the 'aliases' key
+            if os.path.basename(filename) == "regions.yml":
+                with open(filename, "r") as f:
+                    s = f.read()
+
+                # Regular expression to match the 'aliases' and its list
+                regex_pattern = r"  aliases:\n(\s+-[^\n]*\n?)*"
+                s = re.sub(regex_pattern, "", s)
+
+                checksum = checksum_str(s.strip())
+            else:
+                checksum = checksum_file_nocache(filename)
+
+            CHECKSUM_CACHE.set(filename, stat, checksum)
 
-            checksum = checksum_str(s.strip())
-        else:
-            checksum = checksum_file_nocache(filename)
         CACHE_CHECKSUM_FILE.add(key, checksum)
 
     return CACHE_CHECKSUM_FILE[key]
 
 
+def cached_checksum_file(filename: Union[str, Path]) -> Optional[str]:
+    """Return checksum of the file if it's in the persistent cache, without hashing the file."""
+    if isinstance(filename, Path):
+        filename = filename.as_posix()
+    return CHECKSUM_CACHE.get(filename, os.stat(filename))
+
+
 def checksum_df(df: pd.DataFrame, index=True) -> str:
     """Return the md5 hex digest of dataframe. It is only useful for large dataframes. For smaller
     ones (<1M rows), it's better to use checksum_dict or checksum_str.
@@ -2,7 +2,7 @@ import copy
 from dataclasses import dataclass, field, is_dataclass
 from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Literal, Optional, Set, cast
+from typing import Any, Dict, Iterable, List, Literal, Optional, Set, Tuple, cast
 
 import jinja2
 import numpy as np
@@ -12,7 +12,7 @@ import sqlalchemy
 import structlog
 from jinja2 import Environment
 from owid import catalog
-from owid.catalog import warnings
+from owid.catalog import processing_log
 from owid.catalog.utils import underscore
 from sqlalchemy import text
 from sqlalchemy.engine import Engine
@@ -106,53 +106,48 @@ def _yield_wide_table(
 
     # Keep only entity_id and year in index
     table = table.reset_index(level=dim_names)
+    columns = [c for c in table.columns if c not in dim_names]
 
-    if dim_names:
-        # `dropna=False` makes sure we don't drop NaN values from index
-        grouped = table.groupby(
-            dim_names if len(dim_names) > 1 else dim_names[0], as_index=False, observed=True, dropna=False
-        )
-    else:
-        # a situation when there's only year and entity_id in index with no additional dimensions
-        grouped = [([], table)]
-
-    for dim_values, table_to_yield in grouped:
-        if not isinstance(dim_values, tuple):
-            dim_values = (dim_values,)
-
-        # Exclude dimensions
-        table_to_yield = table_to_yield[[c for c in table_to_yield.columns if c not in dim_names]]
+    # render metadata templates only for columns that use them
+    columns_with_jinja = {column for column in columns if _contains_jinja(table._fields[column])}
 
+    for dim_values, index, arrays in _iter_dimension_groups(table, dim_names, columns):
         # Filter NaN values from dimensions and return dictionary
         dim_dict: Dict[str, Any] = {n: v for n, v in zip(dim_names, dim_values) if pd.notnull(v)}
+        underscored_dims = _underscore_dimensions(dim_dict)
+
+        # every distinct template is rendered only once per combination of dimensions
+        rendered: Dict[str, str] = {}
 
         # Now iterate over every column in the original dataset and export the
         # subset of data that we prepared above
-        for column in table_to_yield.columns:
+        for column, values in zip(columns, arrays):
+            notnull = pd.notnull(values)
+
             # If all values are null, skip variable
-            if table_to_yield[column].isnull().all():
+            if not notnull.any():
                 if warn_null_variables:
                     log.warning("yield_wide_table.null_variable", column=column, dim_dict=dim_dict)
                 continue
 
             # Safety check to see if the metadata is still intact
-            assert (
-                table_to_yield[column].metadata.unit is not None
-            ), f"Unit for column {column} should not be None here!"
-
-            # Select only one column and dimensions for performance
-            # Silence - DeprecationWarning: Passing a BlockManager to Table is deprecated and will raise
-            # in a future version. Use public APIs instead.
-            with warnings.ignore_warnings([DeprecationWarning]):
-                # NOTE: this copy is important, otherwise we'd ruin metadata
-                tab = table_to_yield.loc[:, [column]].copy(deep=False)
+            assert table._fields[column].unit is not None, f"Unit for column {column} should not be None here!"
 
             # Drop NA values
-            tab = tab.dropna() if na_action == "drop" else tab
+            if na_action == "drop" and not notnull.all():
+                values = values[notnull]
+                tab_index = index[notnull]
+            else:
+                tab_index = index
+
+            tab = _single_column_table(table, column, values, tab_index)
+            if na_action == "drop":
+                _log_dropna(tab)
 
             # Create underscored name of a new column from the combination of column and dimensions
-            short_name = _underscore_column_and_dimensions(
+            short_name = _short_name_from_underscored_dimensions(
                 column,
+                underscored_dims,
                 dim_dict,
                 trim_long_short_name=trim_long_short_name,
             )
@@ -161,12 +156,15 @@ def _yield_wide_table(
             tab.metadata.short_name = short_name
             tab.rename(columns={column: short_name}, inplace=True)
 
+            # metadata is shared with the table, get it only once
+            meta = tab._fields[short_name]
+
             # add info about dimensions to metadata
             if dim_dict:
-                tab[short_name].metadata.additional_info = {
+                meta.additional_info = {
                     "dimensions": {
                         "originalShortName": column,
-                        "originalName": tab[short_name].metadata.title,
+                        "originalName": meta.title,
                         "filters": [
                             {"name": dim_name, "value": sanitize_numpy(dim_value)}
                             for dim_name, dim_value in dim_dict.items()
@@ -175,23 +173,77 @@ def _yield_wide_table(
                 }
 
             # Add dimensions to title (which will be used as variable name in grapher)
-            if tab[short_name].metadata.title:
+            if meta.title:
                 # We use template as a title
-                if _uses_jinja(tab[short_name].metadata.title):
-                    title_with_dims = _expand_jinja_text(tab[short_name].metadata.title, dim_dict)
+                if _uses_jinja(meta.title):
+                    title_with_dims = _expand_jinja_text(meta.title, dim_dict, rendered)
                 # Otherwise use default
                 else:
-                    title_with_dims = _title_column_and_dimensions(tab[short_name].metadata.title, dim_dict)
+                    title_with_dims = _title_column_and_dimensions(meta.title, dim_dict)
 
-                tab[short_name].metadata.title = title_with_dims
+                meta.title = title_with_dims
 
             # traverse metadata and expand Jinja
-            tab[short_name].metadata = _expand_jinja(tab[short_name].metadata, dim_dict)
+            if column in columns_with_jinja:
+                tab._fields[short_name] = _expand_jinja(meta, dim_dict, rendered)
 
             # Keep only entity_id and year in index
             yield tab
 
 
+def _iter_dimension_groups(
+    table: catalog.Table, dim_names: List[str], columns: List[str]
+) -> Iterable[Tuple[tuple, pd.Index, List[Any]]]:
+    """Yield values of dimensions, index and arrays with values of `columns` for every combination of
+    dimensions, in the same order as `groupby(dim_names)` would. Rows are sorted by groups only once and
+    every group is then a contiguous slice of the sorted arrays, which avoids creating a table for every
+    group."""
+    if not dim_names:
+        # a situation when there's only year and entity_id in index with no additional dimensions
+        yield (), table.index, [table[column].array for column in columns]
+        return
+
+    # `dropna=False` makes sure we don't drop NaN values from index
+    grouped = pd.DataFrame.groupby(
+        table, dim_names if len(dim_names) > 1 else dim_names[0], observed=True, dropna=False
+    )
+    # group keys in the same order as iterating over `grouped`, group numbers are positions in it
+    group_keys = grouped.size().index
+    codes = grouped.ngroup().to_numpy()
+
+    # stable sort keeps the original order of rows within each group
+    order = np.argsort(codes, kind="stable")
+    codes = codes[order]
+    starts = np.flatnonzero(np.diff(codes, prepend=-1))
+    ends = np.append(starts[1:], len(codes))
+
+    index = table.index.take(order)
+    arrays = [table[column].array.take(order) for column in columns]
+
+    for start, end in zip(starts, ends):
+        dim_values = group_keys[codes[start]]
+        if not isinstance(dim_values, tuple):
+            dim_values = (dim_values,)
+        yield dim_values, index[start:end], [arr[start:end] for arr in arrays]
+
+
+def _single_column_table(table: catalog.Table, column: str, values: Any, index: pd.Index) -> catalog.Table:
+    """Create table with a single column and metadata copied from `table`, this is equivalent to (but much
+    faster than) `table.loc[index, [column]].copy(deep=False)`."""
+    tab = catalog.Table(pd.DataFrame({column: values}, index=index, copy=False), metadata=table.metadata.copy())
+    for name in list(index.names) + [column]:
+        if name in table._fields:
+            tab._fields[name] = table._fields[name].copy()
+    return tab
+
+
+def _log_dropna(tab: catalog.Table) -> None:
+    """Leave the same metadata behind as `Table.dropna` does."""
+    for name in tab.all_columns:
+        parents = [tab.get_column_or_index(name)] if processing_log.enabled() else []
+        tab._fields[name].processing_log.add_entry(variable=name, parents=parents, operation="dropna")
+
+
 def _uses_jinja(text: Optional[str]):
     if not text:
         return False
@@ -203,35 +255,58 @@ def _cached_jinja_template(text: str) -> jinja2.environment.Template:
     return jinja_env.from_string(text)
 
 
-def _expand_jinja_text(text: str, dim_dict: Dict[str, str]) -> str:
+def _expand_jinja_text(text: str, dim_dict: Dict[str, str], rendered: Optional[Dict[str, str]] = None) -> str:
+    """Render Jinja template in `text`. Pass the same `rendered` dictionary for all texts with the same
+    `dim_dict` to render every distinct template only once."""
     if not _uses_jinja(text):
         return text
 
+    if rendered is not None and text in rendered:
+        return rendered[text]
+
     try:
-        return _cached_jinja_template(text).render(dim_dict)
+        out = _cached_jinja_template(text).render(dim_dict)
     except jinja2.exceptions.TemplateSyntaxError as e:
         new_message = f"{e.message}\n\nDimensions:\n{dim_dict}\n\nTemplate:\n{text}\n"
         raise e.__class__(new_message, e.lineno, e.name, e.filename) from e
 
+    if rendered is not None:
+        rendered[text] = out
+    return out
 
-def _expand_jinja(obj: Any, dim_dict: Dict[str, str]) -> Any:
+
+def _expand_jinja(obj: Any, dim_dict: Dict[str, str], rendered: Optional[Dict[str, str]] = None) -> Any:
     """Expand Jinja in all metadata fields."""
     if obj is None:
         return None
     elif isinstance(obj, str):
-        return _expand_jinja_text(obj, dim_dict)
+        return _expand_jinja_text(obj, dim_dict, rendered)
     elif is_dataclass(obj):
         for k, v in obj.__dict__.items():
-            setattr(obj, k, _expand_jinja(v, dim_dict))
+            setattr(obj, k, _expand_jinja(v, dim_dict, rendered))
         return obj
     elif isinstance(obj, list):
-        return type(obj)([_expand_jinja(v, dim_dict) for v in obj])
+        return type(obj)([_expand_jinja(v, dim_dict, rendered) for v in obj])
     elif isinstance(obj, dict):
-        return {k: _expand_jinja(v, dim_dict) for k, v in obj.items()}
+        return {k: _expand_jinja(v, dim_dict, rendered) for k, v in obj.items()}
     else:
         return obj
 
 
+def _contains_jinja(obj: Any) -> bool:
+    """Return True if any metadata field uses Jinja."""
+    if isinstance(obj, str):
+        return _uses_jinja(obj)
+    elif is_dataclass(obj):
+        return any(_contains_jinja(v) for v in obj.__dict__.values())
+    elif isinstance(obj, list):
+        return any(_contains_jinja(v) for v in obj)
+    elif isinstance(obj, dict):
+        return any(_contains_jinja(v) for v in obj.values())
+    else:
+        return False
+
+
 def _title_column_and_dimensions(title: str, dim_dict: Dict[str, Any]) -> str:
     """Create new title from column title and dimensions.
     For instance `Deaths`, ["age", "sex"], ["10-18", "male"] will be converted into
@@ -242,12 +317,23 @@ def _title_column_and_dimensions(title: str, dim_dict: Dict[str, Any]) -> str:
 
 
 def _underscore_column_and_dimensions(column: str, dim_dict: Dict[str, Any], trim_long_short_name: bool = True) -> str:
+    return _short_name_from_underscored_dimensions(
+        column, _underscore_dimensions(dim_dict), dim_dict, trim_long_short_name=trim_long_short_name
+    )
+
+
+def _underscore_dimensions(dim_dict: Dict[str, Any]) -> List[str]:
     # add dimension names to dimensions
     dims = [f"{dim_name}_{dim_value}" for dim_name, dim_value in dim_dict.items()]
+    return [underscore(n) for n in dims]
+
 
+def _short_name_from_underscored_dimensions(
+    column: str, underscored_dims: List[str], dim_dict: Dict[str, Any], trim_long_short_name: bool = True
+) -> str:
     # underscore dimensions and append them using double underscores
     # NOTE: `column` has been already underscored in a table
-    slug = "__".join([column] + [underscore(n) for n in dims])
+    slug = "__".join([column] + underscored_dims)
     short_name = cast(str, slug)
 
     if len(short_name) > 255:
@@ -13,10 +13,10 @@ import datetime
 import json
 import os
 import warnings
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from threading import Lock
-from typing import Dict, List, Optional, cast
+from typing import Dict, List, Optional, Tuple, cast
 
 import pandas as pd
 import structlog
@@ -27,7 +27,7 @@ from sqlalchemy.engine.base import Engine
 from sqlalchemy.orm import Session
 
 from apps.backport.datasync import data_metadata as dm
-from apps.backport.datasync.datasync import upload_gzip_string
+from apps.backport.datasync.datasync import delete_object, upload_arrow_bytes, upload_gzip_string
 from etl import config
 from etl.db import get_engine
 
@@ -192,23 +192,8 @@ def _update_variables_metadata(table: catalog.Table) -> None:
             meta.description_key = [k for k in meta.description_key if k.strip()]
 
 
-def upsert_table(
-    engine: Engine,
-    table: catalog.Table,
-    dataset_upsert_result: DatasetUpsertResult,
-    catalog_path: Optional[str] = None,
-    dimensions: Optional[gm.Dimensions] = None,
-    verbose: bool = True,
-) -> VariableUpsertResult:
-    """This function is used to put one ready to go formatted Table (i.e.
-    in the format (year, entityId, value)) into mysql. The metadata
-    of the variable is used to fill the required fields.
-    """
-
-    # We sometimes get a warning, but it's unclear where it is coming from
-    # Passing a BlockManager to Table is deprecated and will raise in a future version. Use public APIs instead.
-    warnings.filterwarnings("ignore", category=DeprecationWarning)
-
+def _validate_table(engine: Engine, table: catalog.Table) -> catalog.Table:
+    """Check that table has the format expected by `upsert_table` and return it with reordered index."""
     assert set(table.index.names) == {"year", "entity_id"}, (
         "Tables to be upserted must have only 2 indices: year and entity_id. Instead" f" they have: {table.index.names}"
     )
@@ -247,6 +232,42 @@ def upsert_table(
 
     assert not gh.contains_inf(table.iloc[:, 0]), f"Column `{table.columns[0]}` has inf values"
 
+    return table
+
+
+def _timespan(table: catalog.Table) -> str:
+    # Timespan does not work for yearIsDay variables
+    if (table.iloc[:, 0].metadata.display or {}).get("yearIsDay"):
+        return ""
+
+    years = table.index.unique(level="year").values
+    if len(years) == 0:
+        return ""
+
+    min_year = min(years)
+    max_year = max(years)
+    return f"{min_year}-{max_year}"
+
+
+def upsert_table(
+    engine: Engine,
+    table: catalog.Table,
+    dataset_upsert_result: DatasetUpsertResult,
+    catalog_path: Optional[str] = None,
+    dimensions: Optional[gm.Dimensions] = None,
+    verbose: bool = True,
+) -> VariableUpsertResult:
+    """This function is used to put one ready to go formatted Table (i.e.
+    in the format (year, entityId, value)) into mysql. The metadata
+    of the variable is used to fill the required fields.
+    """
+
+    # We sometimes get a warning, but it's unclear where it is coming from
+    # Passing a BlockManager to Table is deprecated and will raise in a future version. Use public APIs instead.
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+    table = _validate_table(engine, table)
+
     _update_variables_metadata(table)
 
     with Session(engine) as session:
@@ -254,17 +275,7 @@ def upsert_table(
         column_name = table.columns[0]
         variable_meta: catalog.VariableMeta = table[column_name].metadata
 
-        # Timespan does not work for yearIsDay variables
-        if (variable_meta.display or {}).get("yearIsDay"):
-            timespan = ""
-        else:
-            years = table.index.unique(level="year").values
-            if len(years) == 0:
-                timespan = ""
-            else:
-                min_year = min(years)
-                max_year = max(years)
-                timespan = f"{min_year}-{max_year}"
+        timespan = _timespan(table)
 
         # sort table to get deterministic checksum later on
         table = table.sort_index()
@@ -317,23 +328,15 @@ def upsert_table(
         session.commit()
 
         # process data and metadata
-        var_data = dm.variable_data(df)
         var_metadata = dm.variable_metadata(session, db_variable_id, df)
-
-        var_data_str = json.dumps(var_data, default=str)
         var_metadata_str = json.dumps(var_metadata, default=str)
 
-        checksum_data = dm.checksum_data_str(var_data_str)
         # NOTE: _checksum_metadata modifies `var_metadata` object, but we have it as a string already
         checksum_metadata = dm.checksum_metadata(var_metadata)
 
         # upload them to R2
         with ThreadPoolExecutor() as executor:
-            futures = []
-
-            if db_variable.dataChecksum != checksum_data:
-                db_variable.dataChecksum = checksum_data
-                futures.append(executor.submit(upload_gzip_string, var_data_str, db_variable.s3_data_path()))
+            futures = _upload_data_if_changed(executor, db_variable, df)
 
             if db_variable.metadataChecksum != checksum_metadata:
                 db_variable.metadataChecksum = checksum_metadata
@@ -356,6 +359,163 @@ def upsert_table(
         return VariableUpsertResult(db_variable_id, source_id)  # type: ignore
 
 
+def upsert_tables(
+    engine: Engine,
+    tables: List[Tuple[catalog.Table, Optional[str], Optional[gm.Dimensions]]],
+    dataset_upsert_result: DatasetUpsertResult,
+    verbose: bool = True,
+) -> List[VariableUpsertResult]:
+    """Batch version of `upsert_table`. Upsert all variables of `tables` (tuples of single-column table,
+    catalog path and dimensions) of a single dataset in one session. Variables, origins and links
+    are upserted with a few multi-row statements per table and entities are resolved only once,
+    instead of a session with several round trips and commits per variable.
+    """
+    if not tables:
+        return []
+
+    # We sometimes get a warning, but it's unclear where it is coming from
+    # Passing a BlockManager to Table is deprecated and will raise in a future version. Use public APIs instead.
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+    prepared = []
+    for table, catalog_path, dimensions in tables:
+        table = _validate_table(engine, table)
+        _update_variables_metadata(table)
+        prepared.append((table, catalog_path, dimensions))
+
+    with Session(engine) as session:
+        # sources are shared by many variables, upsert each of them only once
+        source_ids = DatasetUpsertResult(dataset_upsert_result.dataset_id, dict(dataset_upsert_result.source_ids))
+        variable_source_ids = []
+        for table, _, _ in prepared:
+            column_name = table.columns[0]
+            variable_meta = table[column_name].metadata
+            source_id = _add_or_update_source(session, variable_meta, column_name, source_ids)
+            if source_id:
+                source_ids.source_ids[hash(variable_meta.sources[0])] = source_id
+            variable_source_ids.append(source_id)
+
+        # origins are shared by many variables too
+        origins = list(
+            dict.fromkeys(origin for table, _, _ in prepared for origin in table.iloc[:, 0].metadata.origins)
+        )
+        with origins_table_lock:
+            db_origins = dict(zip(origins, gm.Origin.upsert_many(session, [gm.Origin.from_origin(o) for o in origins])))
+            # commit within the lock to make sure other threads get the latest origins
+            session.commit()
+
+        db_variables = gm.Variable.upsert_many(
+            session,
+            [
+                gm.Variable.from_variable_metadata(
+                    table.iloc[:, 0].metadata,
+                    short_name=table.columns[0],
+                    timespan=_timespan(table),
+                    dataset_id=dataset_upsert_result.dataset_id,
+                    source_id=source_id,
+                    catalog_path=catalog_path,
+                    dimensions=dimensions,
+                )
+                for (table, catalog_path, dimensions), source_id in zip(prepared, variable_source_ids)
+            ],
+        )
+
+        dfs = [_data_df(table) for table, _, _ in prepared]
+
+        # resolve entities of all variables with a single query
+        entity_ids = pd.concat([df["entityId"] for df in dfs]).unique().tolist()
+        entities = dm._fetch_entities(session, entity_ids) if entity_ids else None
+        dfs = [dm.add_entity_code_and_name(session, df, entities=entities) for df in dfs]
+
+        for db_variable, df in zip(db_variables, dfs):
+            if not db_variable.type:
+                db_variable.type = db_variable.infer_type(df["value"])
+
+        metas = [table.iloc[:, 0].metadata for table, _, _ in prepared]
+        gm.Variable.update_links_many(
+            session,
+            db_origins={v.id: [db_origins[o] for o in meta.origins] for v, meta in zip(db_variables, metas)},
+            faqs={v.id: meta.presentation.faqs if meta.presentation else [] for v, meta in zip(db_variables, metas)},
+            tag_names={
+                v.id: meta.presentation.topic_tags if meta.presentation else [] for v, meta in zip(db_variables, metas)
+            },
+        )
+
+        # we need to commit changes because we use SQL command in `variables_metadata`
+        session.commit()
+
+        # process data and metadata
+        vars_metadata = dm.variables_metadata(session, {v.id: df for v, df in zip(db_variables, dfs)})
+
+        with ThreadPoolExecutor(max_workers=config.GRAPHER_INSERT_WORKERS) as executor:
+            futures = []
+            for db_variable, df in zip(db_variables, dfs):
+                var_metadata = vars_metadata[db_variable.id]
+                var_metadata_str = json.dumps(var_metadata, default=str)
+
+                # NOTE: _checksum_metadata modifies `var_metadata` object, but we have it as a string already
+                checksum_metadata = dm.checksum_metadata(var_metadata)
+
+                futures += _upload_data_if_changed(executor, db_variable, df)
+
+                if db_variable.metadataChecksum != checksum_metadata:
+                    db_variable.metadataChecksum = checksum_metadata
+                    futures.append(
+                        executor.submit(upload_gzip_string, var_metadata_str, db_variable.s3_metadata_path())
+                    )
+
+            # Wait for futures to complete in case exceptions are raised
+            [f.result() for f in futures]
+
+        # commit new checksums of all variables at once
+        session.commit()
+
+        if verbose:
+            log.info("upsert_tables.uploaded_to_s3", variables=len(db_variables), uploads=len(futures))
+
+        return [VariableUpsertResult(v.id, source_id) for v, source_id in zip(db_variables, variable_source_ids)]  # type: ignore
+
+
+def _upload_data_if_changed(executor: Executor, db_variable: gm.Variable, df: pd.DataFrame) -> List[Future]:
+    """Upload data of the variable to R2 if its checksum has changed. With `config.VARIABLE_DATA_ARROW`,
+    the checksum is calculated from the Arrow stream (which is much cheaper than JSON) and JSON is only
+    serialized if the data has changed. Without it, Arrow stream from previous uploads is deleted with
+    `config.VARIABLE_DATA_ARROW_CLEANUP`."""
+    if config.VARIABLE_DATA_ARROW:
+        var_data_arrow = dm.variable_data_arrow(df)
+        checksum_data = dm.checksum_data_bytes(var_data_arrow)
+    else:
+        var_data_str = json.dumps(dm.variable_data(df), default=str)
+        checksum_data = dm.checksum_data_str(var_data_str)
+
+    if db_variable.dataChecksum == checksum_data:
+        return []
+
+    db_variable.dataChecksum = checksum_data
+
+    futures = []
+    if config.VARIABLE_DATA_ARROW:
+        futures.append(executor.submit(upload_arrow_bytes, var_data_arrow, db_variable.s3_data_arrow_path()))
+        var_data_str = json.dumps(dm.variable_data(df), default=str)
+    elif config.VARIABLE_DATA_ARROW_CLEANUP:
+        futures.append(executor.submit(delete_object, db_variable.s3_data_arrow_path()))
+    futures.append(executor.submit(upload_gzip_string, var_data_str, db_variable.s3_data_path()))
+    return futures
+
+
+def _data_df(table: catalog.Table) -> pd.DataFrame:
+    """Convert table to dataframe with columns year, entityId and value as string."""
+    column_name = table.columns[0]
+
+    # sort table to get deterministic checksum later on
+    df = pd.DataFrame(table.sort_index()).reset_index()
+    df = df.rename(columns={column_name: "value", "entity_id": "entityId"})
+
+    # following functions assume that `value` is string
+    df["value"] = df["value"].astype(str)
+    return df
+
+
 def fetch_db_checksum(dataset: catalog.Dataset) -> Optional[str]:
     """
     Fetch the latest source checksum associated with a given dataset in the db. Can be compared
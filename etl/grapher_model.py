@@ -14,7 +14,7 @@ import random
 from datetime import date, datetime
 from enum import Enum
 from pathlib import Path
-from typing import Any, Dict, List, Literal, Optional, Union, get_args
+from typing import Any, Dict, List, Literal, Optional, Sequence, Set, Tuple, Union, get_args
 
 import humps
 import pandas as pd
@@ -33,10 +33,13 @@ from sqlalchemy import (
     Integer,
     SmallInteger,
     and_,
+    delete,
     func,
+    insert,
     or_,
     select,
     text,
+    tuple_,
 )
 from sqlalchemy.dialects.mysql import (
     ENUM,
@@ -781,6 +784,16 @@ class OriginsVariablesLink(Base):
                 ]
             )
 
+    @classmethod
+    def link_with_variables(cls, session: Session, new_origin_ids: Dict[int, List[int]]) -> None:
+        """Batch version of `link_with_variable`, link Variable IDs (keys) with the given Origin IDs."""
+        new_links = {
+            (variable_id, origin_id, i)
+            for variable_id, origin_ids in new_origin_ids.items()
+            for i, origin_id in enumerate(origin_ids)
+        }
+        _sync_links(session, cls, ("variableId", "originId", "displayOrder"), list(new_origin_ids), new_links)
+
 
 class PostsGdocsVariablesFaqsLink(Base):
     __tablename__ = "posts_gdocs_variables_faqs"
@@ -826,6 +839,16 @@ class PostsGdocsVariablesFaqsLink(Base):
                 ]
             )
 
+    @classmethod
+    def link_with_variables(cls, session: Session, new_faqs: Dict[int, List[catalog.FaqLink]]) -> None:
+        """Batch version of `link_with_variable`, link Variable IDs (keys) with Faqs."""
+        new_links = {
+            (variable_id, f.gdoc_id, f.fragment_id, i)
+            for variable_id, faqs in new_faqs.items()
+            for i, f in enumerate(faqs)
+        }
+        _sync_links(session, cls, ("variableId", "gdocId", "fragmentId", "displayOrder"), list(new_faqs), new_links)
+
 
 class TagsVariablesTopicTagsLink(Base):
     __tablename__ = "tags_variables_topic_tags"
@@ -871,6 +894,17 @@ class TagsVariablesTopicTagsLink(Base):
                 ]
             )
 
+    @classmethod
+    def link_with_variables(cls, session: Session, new_tag_ids: Dict[int, List[int]]) -> None:
+        """Batch version of `link_with_variable`, link Variable IDs (keys) with the given Tag IDs."""
+        for tag_ids in new_tag_ids.values():
+            assert len(tag_ids) == len(set(tag_ids)), "Tag IDs must be unique"
+
+        new_links = {
+            (variable_id, tag_id, i) for variable_id, tag_ids in new_tag_ids.items() for i, tag_id in enumerate(tag_ids)
+        }
+        _sync_links(session, cls, ("variableId", "tagId", "displayOrder"), list(new_tag_ids), new_links)
+
 
 class Variable(Base):
     """Example:
@@ -1005,44 +1039,7 @@ class Variable(Base):
         if not ds:
             ds = self
         else:
-            ds.shortName = self.shortName
-            ds.name = self.name
-            ds.description = self.description
-            ds.unit = self.unit
-            ds.shortUnit = self.shortUnit
-            ds.sourceId = self.sourceId
-            ds.timespan = self.timespan
-            ds.coverage = self.coverage
-            ds.display = self.display
-            ds.catalogPath = self.catalogPath
-            ds.dimensions = self.dimensions
-            ds.schemaVersion = self.schemaVersion
-            ds.processingLevel = self.processingLevel
-            ds.processingLog = self.processingLog
-            ds.titlePublic = self.titlePublic
-            ds.titleVariant = self.titleVariant
-            ds.attributionShort = self.attributionShort
-            ds.attribution = self.attribution
-            ds.descriptionShort = self.descriptionShort
-            ds.descriptionFromProducer = self.descriptionFromProducer
-            ds.descriptionKey = self.descriptionKey
-            ds.descriptionProcessing = self.descriptionProcessing
-            ds.licenses = self.licenses
-            ds.license = self.license
-            ds.type = self.type
-            ds.updatedAt = datetime.utcnow()
-            # do not update these fields unless they're specified
-            if self.columnOrder is not None:
-                ds.columnOrder = self.columnOrder
-            if self.code is not None:
-                ds.code = self.code
-            if self.originalMetadata is not None:
-                ds.originalMetadata = self.originalMetadata
-            if self.grapherConfigETL is not None:
-                ds.grapherConfigETL = self.grapherConfigETL
-            if self.sort is not None:
-                ds.sort = self.sort
-            assert self.grapherConfigAdmin is None, "grapherConfigETL should be used instead of grapherConfigAdmin"
+            ds._update_from(self)
 
         session.add(ds)
 
@@ -1053,6 +1050,106 @@ class Variable(Base):
         )
         return session.scalars(q).one()
 
+    @classmethod
+    def upsert_many(cls, session: Session, variables: List["Variable"]) -> List["Variable"]:
+        """Batch version of `upsert` for variables of a single dataset. Existing variables are loaded
+        with a single query and new variables are inserted with a multi-row INSERT. Return upserted
+        variables in the same order as `variables`."""
+        if not variables:
+            return []
+
+        dataset_ids = {v.datasetId for v in variables}
+        assert len(dataset_ids) == 1, "all variables must belong to the same dataset"
+        dataset_id = dataset_ids.pop()
+
+        short_names = [v.shortName for v in variables]
+        assert all(short_names), "all variables must have shortName"
+        assert len(short_names) == len(set(short_names)), "shortName of variables must be unique"
+
+        # load all candidates for matching and name conflicts at once
+        q = select(cls).where(
+            cls.datasetId == dataset_id,
+            or_(
+                cls.shortName.in_(set(short_names) | {s.replace("__", "_") for s in short_names}),  # type: ignore
+                cls.name.in_({v.name for v in variables}),
+            ),
+        )
+        existing = session.scalars(q).all()
+
+        matches, conflicts = _match_variables(variables, existing)
+
+        # rename conflicting variables before updating names to not violate unique index on `name`,
+        # see `upsert` for details
+        if conflicts:
+            for conflict in conflicts:
+                conflict.name = f"{conflict.name} (conflict {random.randint(0, 1000)})"
+            session.flush()
+
+        new_rows = []
+        for variable, ds in zip(variables, matches):
+            if ds is None:
+                new_rows.append(variable._insert_dict())
+            else:
+                ds._update_from(variable)
+        session.flush()
+
+        if new_rows:
+            session.execute(insert(cls), new_rows)
+
+        # select upserted objects to get their ids
+        q = select(cls).where(cls.datasetId == dataset_id, cls.shortName.in_(short_names))  # type: ignore
+        upserted = {v.shortName: v for v in session.scalars(q).all()}
+        return [upserted[short_name] for short_name in short_names]
+
+    def _insert_dict(self) -> Dict[str, Any]:
+        """Return column values for INSERT statement."""
+        return {
+            c.name: getattr(self, c.name)
+            for c in self.__table__.c
+            if c.name not in ("id", "createdAt", "updatedAt") and c.name in self.__dataclass_fields__
+        }
+
+    def _update_from(self, other: "Variable") -> None:
+        """Update fields of an existing variable with fields of a new one."""
+        self.shortName = other.shortName
+        self.name = other.name
+        self.description = other.description
+        self.unit = other.unit
+        self.shortUnit = other.shortUnit
+        self.sourceId = other.sourceId
+        self.timespan = other.timespan
+        self.coverage = other.coverage
+        self.display = other.display
+        self.catalogPath = other.catalogPath
+        self.dimensions = other.dimensions
+        self.schemaVersion = other.schemaVersion
+        self.processingLevel = other.processingLevel
+        self.processingLog = other.processingLog
+        self.titlePublic = other.titlePublic
+        self.titleVariant = other.titleVariant
+        self.attributionShort = other.attributionShort
+        self.attribution = other.attribution
+        self.descriptionShort = other.descriptionShort
+        self.descriptionFromProducer = other.descriptionFromProducer
+        self.descriptionKey = other.descriptionKey
+        self.descriptionProcessing = other.descriptionProcessing
+        self.licenses = other.licenses
+        self.license = other.license
+        self.type = other.type
+        self.updatedAt = datetime.utcnow()
+        # do not update these fields unless they're specified
+        if other.columnOrder is not None:
+            self.columnOrder = other.columnOrder
+        if other.code is not None:
+            self.code = other.code
+        if other.originalMetadata is not None:
+            self.originalMetadata = other.originalMetadata
+        if other.grapherConfigETL is not None:
+            self.grapherConfigETL = other.grapherConfigETL
+        if other.sort is not None:
+            self.sort = other.sort
+        assert other.grapherConfigAdmin is None, "grapherConfigETL should be used instead of grapherConfigAdmin"
+
     @classmethod
     def from_variable_metadata(
         cls,
@@ -1158,6 +1255,45 @@ class Variable(Base):
 
         TagsVariablesTopicTagsLink.link_with_variable(session, self.id, [tag.id for tag in tags])
 
+    @classmethod
+    def update_links_many(
+        cls,
+        session: Session,
+        db_origins: Dict[int, List["Origin"]],
+        faqs: Dict[int, List[catalog.FaqLink]],
+        tag_names: Dict[int, List[str]],
+    ) -> None:
+        """Batch version of `update_links`, all dictionaries are keyed by variable id."""
+        OriginsVariablesLink.link_with_variables(
+            session, {variable_id: [origin.id for origin in origins] for variable_id, origins in db_origins.items()}
+        )
+
+        required_gdoc_ids = {faq.gdoc_id for variable_faqs in faqs.values() for faq in variable_faqs}
+        existing_gdoc_ids = set()
+        if required_gdoc_ids:
+            existing_gdoc_ids = set(session.scalars(select(PostsGdocs.id).where(PostsGdocs.id.in_(required_gdoc_ids))))
+        missing_gdoc_ids = required_gdoc_ids - existing_gdoc_ids
+        if missing_gdoc_ids:
+            log.warning("create_links.missing_faqs", missing_gdoc_ids=missing_gdoc_ids)
+        PostsGdocsVariablesFaqsLink.link_with_variables(
+            session,
+            {
+                variable_id: [faq for faq in variable_faqs if faq.gdoc_id in existing_gdoc_ids]
+                for variable_id, variable_faqs in faqs.items()
+            },
+        )
+
+        # load all tags at once
+        all_tag_names = list(dict.fromkeys(name for names in tag_names.values() for name in names))
+        tags = {tag.name: tag for tag in Tag.load_tags_by_names(session, all_tag_names)} if all_tag_names else {}
+        TagsVariablesTopicTagsLink.link_with_variables(
+            session,
+            {
+                variable_id: [tags[name].id for name in names if name in tags]
+                for variable_id, names in tag_names.items()
+            },
+        )
+
     def s3_data_path(self, typ: S3_PATH_TYP = "s3") -> str:
         """Path to S3 with data in JSON format for Grapher. Typically
         s3://owid-api/v1/indicators/123.data.json."""
@@ -1168,6 +1304,16 @@ class Variable(Base):
         else:
             raise NotImplementedError()
 
+    def s3_data_arrow_path(self, typ: S3_PATH_TYP = "s3") -> str:
+        """Path to S3 with data as compressed Arrow IPC stream. Typically
+        s3://owid-api/v1/indicators/123.data.arrow."""
+        if typ == "s3":
+            return f"{config.BAKED_VARIABLES_PATH}/{self.id}.data.arrow"
+        elif typ == "http":
+            return config.variable_data_arrow_url(self.id)
+        else:
+            raise NotImplementedError()
+
     def s3_metadata_path(self, typ: S3_PATH_TYP = "s3") -> str:
         """Path to S3 with metadata in JSON format for Grapher. Typically
         s3://owid-api/v1/indicators/123.metadata.json or
@@ -1277,27 +1423,34 @@ class Origin(Base):
             dateAccessed=origin.date_accessed,  # type: ignore
         )
 
+    # match on all fields for now, otherwise we could get an origin from a different dataset
+    # and modify it, which would make it out of sync with origin from its recipe
+    # NOTE: we don't match on license because it's JSON and hard to compare
+    _upsert_fields = (
+        "producer",
+        "citationFull",
+        "titleSnapshot",
+        "title",
+        "attribution",
+        "attributionShort",
+        "versionProducer",
+        "urlMain",
+        "urlDownload",
+        "descriptionSnapshot",
+        "description",
+        "datePublished",
+        "dateAccessed",
+    )
+
     @property
     def _upsert_select(self) -> Select:
-        # match on all fields for now, otherwise we could get an origin from a different dataset
-        # and modify it, which would make it out of sync with origin from its recipe
-        # NOTE: we don't match on license because it's JSON and hard to compare
         cls = self.__class__
-        return select(cls).where(
-            cls.producer == self.producer,
-            cls.citationFull == self.citationFull,
-            cls.titleSnapshot == self.titleSnapshot,
-            cls.title == self.title,
-            cls.attribution == self.attribution,
-            cls.attributionShort == self.attributionShort,
-            cls.versionProducer == self.versionProducer,
-            cls.urlMain == self.urlMain,
-            cls.urlDownload == self.urlDownload,
-            cls.descriptionSnapshot == self.descriptionSnapshot,
-            cls.description == self.description,
-            cls.datePublished == self.datePublished,
-            cls.dateAccessed == self.dateAccessed,
-        )
+        return select(cls).where(*[getattr(cls, f) == getattr(self, f) for f in self._upsert_fields])
+
+    @property
+    def _upsert_key(self) -> tuple:
+        # dateAccessed is a string in new origins, but a date in origins loaded from DB
+        return tuple(None if getattr(self, f) is None else str(getattr(self, f)) for f in self._upsert_fields)
 
     def upsert(self, session: Session) -> "Origin":
         """
@@ -1332,6 +1485,33 @@ class Origin(Base):
 
         return origin
 
+    @classmethod
+    def upsert_many(cls, session: Session, origins: List["Origin"]) -> List["Origin"]:
+        """Batch version of `upsert`. Candidates are loaded with a single query and matched on all
+        fields from `_upsert_fields`, only missing origins are inserted."""
+        if not origins:
+            return []
+
+        candidates = {(o.producer, o.title) for o in origins}
+        q = select(cls).where(or_(*[and_(cls.producer == p, cls.title == t) for p, t in candidates]))
+
+        existing: Dict[tuple, "Origin"] = {}
+        for origin in session.scalars(q).all():
+            # just pick any origin if there are duplicates
+            existing.setdefault(origin._upsert_key, origin)
+
+        out = []
+        for origin in origins:
+            key = origin._upsert_key
+            if key not in existing:
+                session.add(origin)
+                existing[key] = origin
+            out.append(existing[key])
+
+        # flush to get ids of new origins
+        session.flush()
+        return out
+
 
 class ChartStatus(Enum):
     APPROVED = "approved"
@@ -1498,6 +1678,64 @@ def _json_is(json_field: Any, key: str, val: Any) -> Any:
         return json_field[key] == val
 
 
+def _sync_links(
+    session: Session, cls: type, columns: Tuple[str, ...], variable_ids: List[int], new_links: Set[tuple]
+) -> None:
+    """Replace all links of given variables with `new_links` using a single SELECT, DELETE and INSERT.
+    Links are tuples with values of `columns` where `variableId` comes first."""
+    if not variable_ids:
+        return
+
+    cols = [getattr(cls, c) for c in columns]
+    rows = session.execute(select(*cols).where(cls.variableId.in_(variable_ids))).all()  # type: ignore
+    existing_links = {tuple(row) for row in rows}
+
+    to_delete = existing_links - new_links
+    to_add = new_links - existing_links
+
+    if to_delete:
+        session.execute(
+            delete(cls).where(tuple_(*cols).in_(list(to_delete))).execution_options(synchronize_session=False)
+        )
+
+    if to_add:
+        session.execute(insert(cls), [dict(zip(columns, link)) for link in to_add])
+
+
+def _match_variables(
+    variables: Sequence["Variable"], existing: Sequence["Variable"]
+) -> Tuple[List[Optional["Variable"]], List["Variable"]]:
+    """Match new variables to existing ones the same way as `Variable.upsert` does, i.e. on shortName
+    first and then on name. Return matched variable for each new variable (None if it should be inserted)
+    and existing variables whose name conflicts with the new name of a matched variable."""
+    by_short_name = {v.shortName: v for v in existing}
+    by_name = {v.name: v for v in existing}
+
+    # exact matches on shortName take precedence over the fallbacks
+    matches: List[Optional[Variable]] = [by_short_name.get(v.shortName) for v in variables]
+    claimed = {id(ds) for ds in matches if ds is not None}
+
+    for i, variable in enumerate(variables):
+        if matches[i] is not None:
+            continue
+        assert variable.shortName
+        for ds in (by_short_name.get(variable.shortName.replace("__", "_")), by_name.get(variable.name)):
+            if ds is not None and id(ds) not in claimed:
+                matches[i] = ds
+                claimed.add(id(ds))
+                break
+
+    conflicts: Dict[int, Variable] = {}
+    for variable, ds in zip(variables, matches):
+        if ds is None or not ds.shortName:
+            continue
+        conflict = by_name.get(variable.name)
+        if conflict is not None and conflict is not ds and conflict.shortName != variable.shortName:
+            conflicts[id(conflict)] = conflict
+
+    return matches, list(conflicts.values())
+
+
 def _remap_variable_ids(config: Union[List, Dict[str, Any]], remap_ids: Dict[int, int]) -> Any:
     """Replace variableIds from chart config using `remap_ids` mapping."""
     if isinstance(config, dict):
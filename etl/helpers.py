@@ -768,15 +768,16 @@ def isolated_env(
     # remember modules that were imported before
     imported_modules = set(sys.modules.keys())
 
-    yield
-
-    # unimport modules imported during execution unless they match `keep_modules`
-    for module_name in set(sys.modules.keys()) - imported_modules:
-        if not re.search(keep_modules, module_name):
-            sys.modules.pop(module_name)
-
-    # remove module dir from pythonpath
-    sys.path.remove(working_dir.as_posix())
+    try:
+        yield
+    finally:
+        # unimport modules imported during execution unless they match `keep_modules`
+        for module_name in set(sys.modules.keys()) - imported_modules:
+            if not re.search(keep_modules, module_name):
+                sys.modules.pop(module_name)
+
+        # remove module dir from pythonpath
+        sys.path.remove(working_dir.as_posix())
 
 
 def read_json_schema(path: Union[Path, str]) -> Dict[str, Any]:
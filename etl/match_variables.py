@@ -1,12 +1,12 @@
 import json
 import os
 from pathlib import Path
-from typing import Any, Dict, List, Tuple, Union, cast
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union, cast
 
 import numpy as np
 import pandas as pd
 import rich_click as click
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
 from structlog import get_logger
 
 from etl import db
@@ -29,6 +29,10 @@ SIMILARITY_NAMES = {
     "quick_ratio": fuzz.QRatio,
     "weighted_ratio": fuzz.WRatio,
 }
+# Similarity of variables with identical names, higher than any other score so that they always come first.
+IDENTICAL_SCORE = 9999
+# Number of old variables whose similarities to all new variables are computed at once (limits memory).
+SCORES_CHUNK_SIZE = 1000
 log = get_logger()
 
 
@@ -296,6 +300,7 @@ def find_mapping_suggestions(
     missing_old: pd.DataFrame,
     missing_new: pd.DataFrame,
     similarity_name: str = "partial_ratio",
+    max_suggestions: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
     """Find suggestions for mapping old variables to new variables.
 
@@ -306,7 +311,7 @@ def find_mapping_suggestions(
     - "new": pandas.DataFrame with new variable names, IDs, sorted by similarity to old variable name (according to matching_function).
 
     It uses the similiarity function `similarity_name` to estimate the score between `missing_old` and `missing_new`. Note that regardless of the score,
-    if `missing_old` and `missing_new` have the same name, this will appear first with score 9999. (see _get_score internal function).
+    if `missing_old` and `missing_new` have the same name, this will appear first (see `rank_mapping_suggestions`).
 
     Parameters
     ----------
@@ -316,122 +321,96 @@ def find_mapping_suggestions(
         Dataframe with new variables.
     similarity_name : function, optional
         Similarity function name. The default is 'partial_ratio'. Must be in `SIMILARITY_NAMES`.
+    max_suggestions : int, optional
+        Maximum number of new variables suggested for each old variable. All of them if None.
 
     Returns
     -------
     list
         List of suggestions for mapping old variables to new variables.
     """
-    # get similarity function
-    matching_function = get_similarity_function(similarity_name)
-
-    def _get_score(old_name, new_name) -> float:
-        """Get similarity score for a row.
-
-        Uses matching_function, but on top of that ensures that score is maximum if names of old and new variables are identical.
-        """
-        if old_name == new_name:
-            return 9999
-        return matching_function(old_name, new_name)
+    indices, scores = rank_mapping_suggestions(
+        old_names=missing_old["name_old"].tolist(),
+        new_names=missing_new["name_new"].tolist(),
+        similarity_name=similarity_name,
+        max_suggestions=max_suggestions,
+    )
 
-    # Iterate over old variables, and find the right match among new variables.
     suggestions = []
-    for _, row in missing_old.iterrows():
-        # Old variable name
-        old_name = row["name_old"]
-
-        # Sort new variables from most to least similar to current variable.
-        missing_new["similarity"] = [_get_score(old_name, new_name) for new_name in missing_new["name_new"]]
-        missing_new = missing_new.sort_values("similarity", ascending=False)
-        missing_new["similarity"] = missing_new["similarity"].apply(lambda x: min(x, 100))
-
-        # Add results to suggestions list.
+    for (_, row), row_indices, row_scores in zip(missing_old.iterrows(), indices, scores):
+        new = missing_new.iloc[row_indices].assign(similarity=row_scores)
         suggestions.append(
             {
                 "old": row.to_dict(),
-                "new": missing_new.copy(),
+                "new": new,
             }
         )
     return suggestions
 
 
-def find_mapping_suggestions_optim(
-    missing_old: pd.DataFrame,
-    missing_new: pd.DataFrame,
-    similarity_name: str = "partial_ratio",
-) -> List[Dict[str, Union[pd.DataFrame, pd.Series]]]:
-    """Find suggestions for mapping old variables to new variables.
-
-    Creates a list with new variable suggestions for each old variable. The list is therefore the same
-    size as len(old_indicators). Each item is a dictionary with two keys:
-
-    - "old": Dictionary with old variable name and ID.
-    - "new": pandas.DataFrame with new variable names, IDs, sorted by similarity to old variable name (according to matching_function).
+def rank_mapping_suggestions(
+    old_names: Sequence[str],
+    new_names: Sequence[str],
+    similarity_name: str = SIMILARITY_NAME,
+    max_suggestions: Optional[int] = None,
+    workers: int = -1,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Rank new names by their similarity to each old name.
 
-    It uses the similiarity function `similarity_name` to estimate the score between `missing_old` and `missing_new`. Note that regardless of the score,
-    if `missing_old` and `missing_new` have the same name, this will appear first with score 9999. (see _get_score internal function).
+    Identical names are found first by a hash join and always rank first. Similarities of all pairs are computed by
+    rapidfuzz in batches of `SCORES_CHUNK_SIZE` old names (in parallel, `workers=-1` uses all CPUs). Only the
+    `max_suggestions` most similar new names are kept for each old name.
 
     Parameters
     ----------
-    missing_old : pandas.DataFrame
-        Dataframe with old variables.
-    missing_new : pandas.DataFrame
-        Dataframe with new variables.
-    similarity_name : function, optional
-        Similarity function name. The default is 'partial_ratio'. Must be in `SIMILARITY_NAMES`.
+    old_names : Sequence[str]
+        Names of old variables.
+    new_names : Sequence[str]
+        Names of new variables.
+    similarity_name : str
+        Similarity function name. Must be in `SIMILARITY_NAMES`.
+    max_suggestions : int, optional
+        Number of new names to keep for each old name. All of them if None.
+    workers : int
+        Number of threads computing similarities.
 
     Returns
     -------
-    list
-        List of suggestions for mapping old variables to new variables.
+    Tuple[np.ndarray, np.ndarray]
+        Positions of suggested names in `new_names` and their similarity scores (0-100). Both arrays have a row for
+        each old name, sorted from the most similar new name.
     """
-    # get similarity function
-    matching_function = get_similarity_function(similarity_name)
-
-    def _get_score(old_name, new_name) -> float:
-        """Get similarity score for a row.
-
-        Uses matching_function, but on top of that ensures that score is maximum if names of old and new variables are identical.
-        """
-        if old_name == new_name:
-            return 9999
-        return matching_function(old_name, new_name)
-
-    # Vectorized approach to compute similarities (this needs adjustment based on matching_function capabilities)
-    def compute_similarities_vectorized(old_names, new_names):
-        # This function needs to be adapted to your specific similarity function
-        # For example, using a vectorized string comparison if possible
-        # Placeholder for actual implementation
-        similarity_matrix = np.zeros((len(old_names), len(new_names)))
-        for i, old_name in enumerate(old_names):
-            for j, new_name in enumerate(new_names):
-                similarity_matrix[i, j] = _get_score(old_name, new_name) if old_name != new_name else 9999
-        return similarity_matrix
-
-    # Pre-compute the similarity scores for all combinations
-    old_names = missing_old["name_old"].to_numpy()
-    new_names = missing_new["name_new"].to_numpy()
-    similarity_scores = compute_similarities_vectorized(old_names, new_names)
-
-    # Iterate over old variables to sort new variables based on pre-computed similarities
-    suggestions = []
-    for idx, old_row in missing_old.iterrows():
-        # Retrieve the similarity scores for the current old_name
-        scores = similarity_scores[idx]  # type: ignore
-
-        # Sort missing_new based on these scores
-        sorted_indices = np.argsort(-scores)  # Negative for descending sort
-        sorted_missing_new = missing_new.iloc[sorted_indices].copy()
-        sorted_missing_new["similarity"] = np.minimum(scores[sorted_indices], 100)
-
-        # Add results to suggestions list
-        suggestions.append(
-            {
-                "old": old_row.to_dict(),
-                "new": sorted_missing_new,
-            }
-        )
-    return suggestions
+    scorer = get_similarity_function(similarity_name)
+    k = len(new_names) if max_suggestions is None else min(max_suggestions, len(new_names))
+
+    # Positions of new names by name, to find identical names.
+    new_positions: Dict[str, List[int]] = {}
+    for j, name in enumerate(new_names):
+        new_positions.setdefault(name, []).append(j)
+
+    indices = np.empty((len(old_names), k), dtype=np.int64)
+    scores = np.empty((len(old_names), k), dtype=np.float32)
+    if k == 0 or len(old_names) == 0:
+        return indices, scores
+
+    for start in range(0, len(old_names), SCORES_CHUNK_SIZE):
+        chunk = old_names[start : start + SCORES_CHUNK_SIZE]
+        chunk_scores = process.cdist(chunk, new_names, scorer=scorer, dtype=np.float32, workers=workers)
+        for i, name in enumerate(chunk):
+            chunk_scores[i, new_positions.get(name, [])] = IDENTICAL_SCORE
+
+        if k < len(new_names):
+            # Find top k without sorting all of them, then sort the top k.
+            top = np.argpartition(-chunk_scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(len(new_names)), chunk_scores.shape)
+        top_scores = np.take_along_axis(chunk_scores, top, axis=1)
+        # Sort by descending score, ties by position of new name.
+        order = np.lexsort((top, -top_scores))
+        indices[start : start + len(chunk)] = np.take_along_axis(top, order, axis=1)
+        scores[start : start + len(chunk)] = np.minimum(np.take_along_axis(top_scores, order, axis=1), 100)
+
+    return indices, scores
 
 
 def consolidate_mapping_suggestions_with_user(
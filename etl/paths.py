@@ -65,3 +65,12 @@ DEFAULT_DAG_FILE = DAG_FILE
 
 # Hidden ETL file that will keep the time it took to execute each step.
 EXECUTION_TIME_FILE = BASE_DIR / ".execution_time.json"
+
+# Hidden ETL file that will keep peak memory (in bytes) used by each step.
+PEAK_MEMORY_FILE = BASE_DIR / ".peak_memory.json"
+
+# Persistent cache of file checksums shared by all ETL processes.
+CHECKSUM_CACHE_FILE = DATA_DIR / ".checksums.sqlite"
+
+# Index of clean steps used to speed up detection of dirty steps.
+DIRTY_INDEX_FILE = DATA_DIR / ".dirty_index.json"
@@ -4,27 +4,46 @@
 #
 
 import concurrent.futures
+import json
+import math
 import re
 import sys
 from collections.abc import Iterable
+from dataclasses import dataclass, field
 from http.client import IncompleteRead
 from pathlib import Path
-from typing import Any, Dict, Iterator, Optional, cast
+from typing import Any, Dict, Iterator, List, Optional, Tuple, cast
 from urllib.error import HTTPError
 
 import pandas as pd
 import rich_click as click
+from boto3.s3.transfer import S3UploadFailedError, TransferConfig
 from botocore.client import ClientError
-from owid.catalog import CHANNEL, LocalCatalog
+from botocore.exceptions import ConnectionError, HTTPClientError
+from owid.catalog import CHANNEL, Dataset, LocalCatalog
 from owid.catalog.catalogs import INDEX_FORMATS
-from owid.catalog.datasets import FileFormat
+from owid.catalog.datasets import CHECKSUMS_FILE, FileFormat
 from owid.catalog.s3_utils import connect_r2
+from tenacity import Retrying
+from tenacity.retry import retry_if_exception_type
+from tenacity.stop import stop_after_attempt
+from tenacity.wait import wait_exponential
 
 from etl import config, files
 from etl.paths import DATA_DIR
 
 config.enable_bugsnag()
 
+# every dataset folder on S3 carries a manifest with checksums and sizes of its files, so that we can
+# compare it with the local folder without listing the folder and asking for metadata of its objects
+MANIFEST_FILENAME = ".manifest.json"
+
+# `s3.upload_file` switches to multipart upload for large files, we need this to count requests
+TRANSFER_CONFIG = TransferConfig()
+
+# S3 deletes up to this many objects in a single request
+DELETE_BATCH_SIZE = 1000
+
 
 class CannotPublish(Exception):
     pass
@@ -35,7 +54,7 @@ class CannotPublish(Exception):
     "--dry-run",
     is_flag=True,
     default=False,
-    help="Preview the datasets to sync without actually publishing them.",
+    help="Preview the files to upload and delete, and the number of bytes and requests, without actually publishing them.",
 )
 @click.option(
     "--private",
@@ -129,6 +148,7 @@ def sync_datasets(
 
     to_delete = set(existing)
     local = LocalCatalog(catalog)
+    plans = []
     print("Datasets to sync:")
     for ds in local.iter_datasets(channel):
         # ignore datasets with no tables
@@ -144,8 +164,8 @@ def sync_datasets(
             continue
 
         print("-", path)
-        if not dry_run:
-            sync_folder(s3, bucket, catalog, catalog / path, path, public=ds.metadata.is_public)
+        plan = sync_folder(s3, bucket, catalog / path, path, public=ds.metadata.is_public, dry_run=dry_run)
+        plans.append(plan)
 
     if delete_datasets:
         print("Datasets to delete:")
@@ -154,60 +174,197 @@ def sync_datasets(
             if not dry_run:
                 delete_dataset(s3, bucket, path)
 
+    print(sync_summary(plans))
+
+
+@dataclass
+class SyncPlan:
+    """Files to upload to and delete from a folder on S3 to make it identical to a local folder."""
+
+    # manifest of the local folder, file names are relative to the folder
+    manifest: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # names of files to upload
+    upload: List[str] = field(default_factory=list)
+    # names of files to delete
+    delete: List[str] = field(default_factory=list)
+    # whether the manifest on S3 is missing or outdated
+    write_manifest: bool = False
+    # requests made to find out the state of the remote folder
+    read_requests: int = 0
+
+    @property
+    def upload_bytes(self) -> int:
+        return sum(self.manifest[name]["size"] for name in self.upload)
+
+    @property
+    def write_requests(self) -> int:
+        return (
+            sum(_upload_requests(self.manifest[name]["size"]) for name in self.upload)
+            + math.ceil(len(self.delete) / DELETE_BATCH_SIZE)
+            + int(self.write_manifest)
+        )
+
+
+def sync_summary(plans: List[SyncPlan]) -> str:
+    return (
+        f"Upload {sum(len(p.upload) for p in plans)} files ({sum(p.upload_bytes for p in plans)} bytes), "
+        f"delete {sum(len(p.delete) for p in plans)} files, "
+        f"{sum(p.read_requests for p in plans)} read and {sum(p.write_requests for p in plans)} write requests"
+    )
+
 
 def sync_folder(
     s3: Any,
     bucket: str,
-    catalog: Path,
     local_folder: Path,
     dest_path: str,
     delete: bool = True,
     public: bool = True,
-) -> None:
+    dry_run: bool = False,
+) -> SyncPlan:
     """
     Perform a content-based sync of a local folder with a "folder" on an S3 bucket,
     by comparing checksums and only uploading files that have changed.
+
+    Checksums of remote files are read from the manifest of the remote folder, which is written
+    only after all files have been uploaded. If the upload fails halfway, the outdated manifest
+    makes sure that the files are uploaded again next time.
     """
     # make sure we're not syncing other folders with the same prefix
     if not dest_path.endswith("/"):
         dest_path += "/"
 
-    existing = {o["Key"]: object_md5(s3, bucket, o["Key"], o) for o in walk_s3(s3, bucket, dest_path)}
+    local = local_manifest(local_folder)
+
+    remote = get_remote_manifest(s3, bucket, dest_path)
+    read_requests = 1
+    has_manifest = remote is not None
+    if remote is None:
+        # folder published before we started writing manifests
+        remote, read_requests_listing = remote_manifest_from_listing(s3, bucket, dest_path)
+        read_requests += read_requests_listing
+
+    plan = SyncPlan(
+        manifest=local,
+        upload=[name for name, meta in local.items() if remote.get(name) != meta],
+        delete=[name for name in remote if name not in local] if delete else [],
+        write_manifest=not has_manifest or remote != local,
+        read_requests=read_requests,
+    )
+
+    for name in plan.upload:
+        print(f"  PUT {dest_path}{name} ({local[name]['size']} bytes)")
+    for name in plan.delete:
+        print(f"  DEL {dest_path}{name}")
+
+    if dry_run or not plan.write_manifest:
+        return plan
+
+    ExtraArgs: Dict[str, Any] = {"ACL": "public-read"} if public else {}
 
     # some datasets like `open_numbers/open_numbers/latest/gapminder__gapminder_world`
     # have huge number of tables, upload them in parallel
-    futures = []
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        for filename in files.walk(local_folder):
-            checksum = files.checksum_file(filename)
-            rel_filename = filename.relative_to(catalog).as_posix()
-
-            existing_checksum = existing.get(rel_filename)
-
-            if checksum != existing_checksum:
-                print("  PUT", rel_filename)
-                ExtraArgs: Dict[str, Any] = {"Metadata": {"md5": checksum}}
-                if public:
-                    ExtraArgs["ACL"] = "public-read"
-                futures.append(
-                    executor.submit(
-                        s3.upload_file,
-                        filename.as_posix(),
-                        bucket,
-                        rel_filename,
-                        ExtraArgs=ExtraArgs,
-                    )
-                )
-
-            if rel_filename in existing:
-                del existing[rel_filename]
-
-        if delete:
-            for rel_filename in existing:
-                print("  DEL", rel_filename)
-                futures.append(executor.submit(s3.delete_object, Bucket=bucket, Key=rel_filename))
-
-        concurrent.futures.wait(futures)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=config.PUBLISH_WORKERS) as executor:
+        futures = [
+            executor.submit(
+                _upload_file,
+                s3,
+                (local_folder / name).as_posix(),
+                bucket,
+                dest_path + name,
+                ExtraArgs={"Metadata": {"md5": local[name]["md5"]}, **ExtraArgs},
+            )
+            for name in plan.upload
+        ]
+        # raise the first exception, if any
+        for future in concurrent.futures.as_completed(futures):
+            future.result()
+
+    _delete_objects(s3, bucket, [dest_path + name for name in plan.delete])
+
+    # manifest goes last, it is only valid once all files are in place
+    s3.put_object(
+        Bucket=bucket,
+        Key=dest_path + MANIFEST_FILENAME,
+        Body=json.dumps(local, sort_keys=True).encode(),
+        ContentType="application/json",
+        **ExtraArgs,
+    )
+
+    return plan
+
+
+def local_manifest(local_folder: Path) -> Dict[str, Dict[str, Any]]:
+    """Return checksum and size of every file in a local folder. Checksums of dataset files stored
+    in its `.checksums.json` are used when possible instead of reading the files. The checksums file
+    itself is only valid locally and is not published."""
+    stored = Dataset(local_folder).file_checksums() if (local_folder / "index.json").exists() else {}
+    manifest = {}
+    for filename in files.walk(local_folder):
+        key = filename.relative_to(local_folder).as_posix()
+        if key in (MANIFEST_FILENAME, CHECKSUMS_FILE):
+            continue
+        manifest[key] = {
+            "md5": stored.get(key) or files.checksum_file(filename),
+            "size": filename.stat().st_size,
+        }
+    return manifest
+
+
+def get_remote_manifest(s3: Any, bucket: str, dest_path: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Return manifest of a folder on S3 or None if it doesn't have one."""
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=dest_path + MANIFEST_FILENAME)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None
+        raise
+
+    return cast(Dict[str, Dict[str, Any]], json.loads(obj["Body"].read()))
+
+
+def remote_manifest_from_listing(s3: Any, bucket: str, dest_path: str) -> Tuple[Dict[str, Dict[str, Any]], int]:
+    """Build manifest of a folder on S3 by listing its objects, together with the number of requests
+    it took. Checksums of multipart uploads are not in their ETags and need extra requests."""
+    manifest = {}
+    requests = 0
+    for page in _list_objects_pages(s3, bucket, dest_path):
+        requests += 1
+        for o in page:
+            name = o["Key"][len(dest_path) :]
+            if name == MANIFEST_FILENAME:
+                continue
+            if not re.match("^[0-9a-f]{32}$", o["ETag"].strip('"')):
+                requests += 1
+            manifest[name] = {"md5": object_md5(s3, bucket, o["Key"], o), "size": o["Size"]}
+    return manifest, requests
+
+
+def _upload_requests(size: int) -> int:
+    """Number of requests `s3.upload_file` makes to upload a file of given size."""
+    if size < TRANSFER_CONFIG.multipart_threshold:
+        return 1
+    # create multipart upload, upload parts and complete it
+    return 2 + math.ceil(size / TRANSFER_CONFIG.multipart_chunksize)
+
+
+def _upload_file(s3: Any, filename: str, bucket: str, key: str, ExtraArgs: Dict[str, Any]) -> None:
+    for attempt in Retrying(
+        wait=wait_exponential(min=1, max=30),
+        stop=stop_after_attempt(5),
+        retry=retry_if_exception_type((ConnectionError, HTTPClientError, S3UploadFailedError)),
+        reraise=True,
+    ):
+        with attempt:
+            s3.upload_file(filename, bucket, key, ExtraArgs=ExtraArgs)
+
+
+def _delete_objects(s3: Any, bucket: str, keys: List[str]) -> None:
+    for i in range(0, len(keys), DELETE_BATCH_SIZE):
+        s3.delete_objects(
+            Bucket=bucket,
+            Delete={"Objects": [{"Key": key} for key in keys[i : i + DELETE_BATCH_SIZE]], "Quiet": True},
+        )
 
 
 def object_md5(s3: Any, bucket: str, key: str, obj: Dict[str, Any]) -> Optional[str]:
@@ -222,15 +379,21 @@ def object_md5(s3: Any, bucket: str, key: str, obj: Dict[str, Any]) -> Optional[
 
 
 def walk_s3(s3: Any, bucket: str, path: str) -> Iterator[Dict[str, Any]]:
-    objs = s3.list_objects(Bucket=bucket, Prefix=path, MaxKeys=100)
-    yield from objs.get("Contents", [])
+    for page in _list_objects_pages(s3, bucket, path):
+        yield from page
+
+
+def _list_objects_pages(s3: Any, bucket: str, path: str) -> Iterator[List[Dict[str, Any]]]:
+    # list_objects returns up to 1000 objects per request
+    objs = s3.list_objects(Bucket=bucket, Prefix=path)
+    yield objs.get("Contents", [])
 
     while objs["IsTruncated"] and objs.get("Contents"):
         # If the response does not include the NextMarker element and it is truncated, we can
         # use the value of the last Key element in the response as the marker parameter
         marker = objs.get("NextMarker", objs["Contents"][-1]["Key"])
         objs = s3.list_objects(Bucket=bucket, Prefix=path, Marker=marker)
-        yield from objs["Contents"]
+        yield objs["Contents"]
 
 
 def delete_dataset(s3: Any, bucket: str, relative_path: str) -> None:
@@ -238,14 +401,7 @@ def delete_dataset(s3: Any, bucket: str, relative_path: str) -> None:
     if not relative_path.endswith("/"):
         relative_path += "/"
 
-    to_delete = [o["Key"] for o in walk_s3(s3, bucket, relative_path)]
-    while to_delete:
-        chunk = to_delete[:1000]
-        s3.delete_objects(
-            Bucket=bucket,
-            Delete={"Objects": [{"Key": key} for key in chunk], "Quiet": True},
-        )
-        to_delete = to_delete[1000:]
+    _delete_objects(s3, bucket, [o["Key"] for o in walk_s3(s3, bucket, relative_path)])
 
 
 def update_catalog(s3: Any, bucket: str, catalog: Path, channel: CHANNEL) -> None:
@@ -4,11 +4,13 @@
 
 import sys
 from importlib import import_module
+from pathlib import Path
 from typing import Optional
 
 import rich_click as click
 from ipdb import launch_ipdb_on_exception
 
+from etl.helpers import isolated_env
 from etl.paths import BASE_PACKAGE, STEP_DIR
 
 
@@ -20,6 +22,7 @@ def main(uri: str, dest_dir: str, ipdb: Optional[bool]) -> None:
     """Import and run a specific step of the ETL.
 
     Meant to be ran as a subprocess by the main `etl` command. There's a quite big overhead (~3s) from importing all packages again in the new subprocess.
+    Unless debugging, the `etl` command runs steps in warm worker processes instead (see `etl.step_workers`).
     """
     if not uri.startswith("data://") and not uri.startswith("data-private://"):
         raise ValueError("Only data:// or data-private:// URIs are supported")
@@ -28,21 +31,49 @@ def main(uri: str, dest_dir: str, ipdb: Optional[bool]) -> None:
 
     if ipdb:
         with launch_ipdb_on_exception():
-            _import_and_run(path, dest_dir)
+            _import_and_run(step_search_path(path), dest_dir)
     else:
-        _import_and_run(path, dest_dir)
+        _import_and_run(step_search_path(path), dest_dir)
 
 
-def _import_and_run(path: str, dest_dir: str) -> None:
-    # ensure that the module search path includes the script
-    step_path = STEP_DIR / "data" / path
+def run_isolated(uri: str, dest_dir: str) -> None:
+    """Import and run a step in the current process, then unimport all modules it imported.
+
+    Used by long-lived step workers that run many steps one after another and by `etl --debug`.
+    """
+    if not uri.startswith("data://") and not uri.startswith("data-private://"):
+        raise ValueError("Only data:// or data-private:// URIs are supported")
+
+    search_path = step_search_path(uri.split("//", 1)[1])
+
+    with isolated_env(_module_dir(search_path)):
+        _import_and_run(search_path, dest_dir)
+
+
+def step_search_path(path: str) -> Path:
+    """Return path of a data step without suffix, e.g. `etl/steps/data/garden/ns/2024-01-01/ds`."""
+    # step might have been moved to an archive folder, try that folder first
+    archive_path = STEP_DIR / "archive" / path
+    if list(archive_path.parent.glob(archive_path.name + "*")):
+        return archive_path
+    else:
+        return STEP_DIR / "data" / path
+
+
+def _module_dir(search_path: Path) -> Path:
     # path can be either in a module with __init__.py or a single .py file
-    module_dir = step_path if step_path.is_dir() else step_path.parent
-    sys.path.append(module_dir.as_posix())
+    return search_path if search_path.is_dir() else search_path.parent
+
+
+def _import_and_run(search_path: Path, dest_dir: str) -> None:
+    # ensure that the module search path includes the script
+    module_dir = _module_dir(search_path)
+    if module_dir.as_posix() not in sys.path:
+        sys.path.append(module_dir.as_posix())
 
     # import the module
-    module_path = path.replace("/", ".")
-    import_path = f"{BASE_PACKAGE}.steps.data.{module_path}"
+    module_path = search_path.relative_to(STEP_DIR).as_posix().replace("/", ".")
+    import_path = f"{BASE_PACKAGE}.steps.{module_path}"
     module = import_module(import_path)
 
     # check it matches the expected interface
@@ -1,17 +1,27 @@
 import datetime as dt
+import fcntl
+import hashlib
+import io
 import json
+import os
 import re
+import shutil
+import tarfile
 import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Iterator, Optional, Union
+from typing import IO, Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Union, cast
 
 import owid.catalog.processing as pr
 import pandas as pd
 import structlog
 import yaml
 from dataclasses_json import dataclass_json
-from owid.catalog import Table, s3_utils
+from owid.catalog import Table, http_utils, s3_utils
 from owid.catalog.meta import (
     DatasetMeta,
     License,
@@ -25,10 +35,22 @@ from owid.datautils.io import decompress_file
 from owid.walden import files
 
 from etl import config, paths
-from etl.files import checksum_file, ruamel_dump, ruamel_load, yaml_dump
+from etl.files import CHECKSUM_CACHE, cached_checksum_file, checksum_file, ruamel_dump, ruamel_load, yaml_dump
 
 log = structlog.get_logger()
 
+# Extensions of snapshots that are zip or tar archives.
+ARCHIVE_EXTENSIONS = {"zip", "tar", "tar.gz", "tgz", "tar.bz2", "tar.xz"}
+
+# Extensions of files that can be read from archives as streams, other files are decompressed to memory first.
+STREAMABLE_EXTENSIONS = {"csv", "json"}
+
+# Number of concurrent downloads of `prefetch_snapshots`.
+PREFETCH_WORKERS = 8
+
+# ioctl request to clone a file on Linux filesystems with copy-on-write support (e.g. Btrfs, XFS)
+FICLONE = 0x40049409
+
 
 @dataclass
 class Snapshot:
@@ -66,25 +88,30 @@ class Snapshot:
             return Path(f"{paths.SNAPSHOTS_DIR / self.uri}.dvc")
 
     def _download_dvc_file(self, md5: str) -> None:
-        """Download file from remote to self.path."""
+        """Download file from remote to self.path. The file is copied from the local blob store, where it's
+        downloaded first if it isn't there yet."""
         self.path.parent.mkdir(exist_ok=True, parents=True)
-        if self.metadata.is_public:
-            # TODO: temporarily download files from R2 instead of public link to prevent
-            # issues with cached snapshots. Remove this when convenient
-            download_url = f"{config.R2_SNAPSHOTS_PUBLIC_READ}/{md5[:2]}/{md5[2:]}"
-            files.download(download_url, str(self.path), progress_bar_min_bytes=2**100)
-        else:
-            download_url = f"s3://{config.R2_SNAPSHOTS_PRIVATE}/{md5[:2]}/{md5[2:]}"
-            s3_utils.download(download_url, str(self.path))
-
-        # Check if file was downloaded correctly. This should never happen
-        downloaded_md5 = checksum_file(self.path)
-        if downloaded_md5 != md5:
-            # remove the downloaded file
-            self.path.unlink()
-            raise ValueError(
-                f"Checksum mismatch for {self.path}: expected {md5}, got {downloaded_md5}. It is possible that download got interrupted."
-            )
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp")
+        os.close(fd)
+        try:
+            # the blob could have been evicted from the store by another process in the meantime
+            for attempt in range(2):
+                blob = fetch_snapshot_blob(md5, self.metadata.outs[0]["size"], is_public=self.metadata.is_public)
+                try:
+                    _clone_file(blob, tmp_path)
+                    break
+                except FileNotFoundError:
+                    if attempt:
+                        raise
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        # md5 was verified when downloading the blob, remember it so that we don't have to hash the file again
+        # NOTE: this only works if the blob is older than `PersistentChecksumCache.MIN_AGE_NS` (e.g. it was
+        # prefetched or pulled before), a freshly downloaded file is hashed again when it's checked next time
+        CHECKSUM_CACHE.set(self.path.as_posix(), self.path.stat(), md5)
 
     def pull(self, force=True) -> None:
         """Pull file from S3."""
@@ -92,22 +119,7 @@ class Snapshot:
             return
 
         assert len(self.metadata.outs) == 1
-        expected_md5 = self.metadata.outs[0]["md5"]
-
-        self._download_dvc_file(expected_md5)
-
-        expected_size = self.metadata.outs[0]["size"]
-        downloaded_size = self.path.stat().st_size
-        if downloaded_size != expected_size:
-            # remove the downloaded file
-            self.path.unlink()
-            raise ValueError(f"Size mismatch for {self.path}: expected {expected_size}, got {downloaded_size}")
-
-        downloaded_md5 = checksum_file(self.path)
-        if downloaded_md5 != expected_md5:
-            # remove the downloaded file
-            self.path.unlink()
-            raise ValueError(f"Checksum mismatch for {self.path}: expected {expected_md5}, got {downloaded_md5}")
+        self._download_dvc_file(self.metadata.outs[0]["md5"])
 
     def is_dirty(self) -> bool:
         """Return True if snapshot exists and is in DVC."""
@@ -125,6 +137,10 @@ class Snapshot:
         # for snapshot://climate/latest/weekly_wildfires.csv.dvc. Data was slightly updated, but
         # the file size was the same. This should be a very rare case.
         if file_size >= 20 * 2**20:  # 20MB
+            # use md5 if we have already computed it in the past
+            cached_md5 = cached_checksum_file(self.path)
+            if cached_md5 is not None:
+                return cached_md5 != self.m.outs[0]["md5"]
             return file_size != self.m.outs[0]["size"]
         else:
             return checksum_file(self.path.as_posix()) != self.m.outs[0]["md5"]
@@ -191,7 +207,16 @@ class Snapshot:
         return self.metadata.to_table_metadata()
 
     def read(self, *args, **kwargs) -> Table:
-        """Read file based on its Snapshot extension."""
+        """Read file based on its Snapshot extension. Archives with a single file are read as that file, use
+        `read_in_archive` for archives with more files."""
+        if self.metadata.file_extension in ARCHIVE_EXTENSIONS:
+            members = self.archive_members()
+            if len(members) != 1:
+                raise ValueError(
+                    f"Archive {self.path} contains {len(members)} files, use `read_in_archive` to pick one of them"
+                )
+            return self.read_in_archive(members[0], *args, **kwargs)
+
         return read_table_from_snapshot(
             *args,
             path=self.path,
@@ -211,6 +236,12 @@ class Snapshot:
             self.path, *args, metadata=self.to_table_metadata(), origin=self.metadata.origin, **kwargs
         )
 
+    def read_parquet(self, *args, **kwargs) -> Table:
+        """Read parquet file into a Table and populate it with metadata."""
+        return pr.read_parquet(
+            self.path, *args, metadata=self.to_table_metadata(), origin=self.metadata.origin, **kwargs
+        )
+
     def read_excel(self, *args, **kwargs) -> Table:
         """Read excel file into a Table and populate it with metadata."""
         return pr.read_excel(self.path, *args, metadata=self.to_table_metadata(), origin=self.metadata.origin, **kwargs)
@@ -258,25 +289,88 @@ class Snapshot:
         # Return temporary directory
         return temp_dir
 
-    def read_in_archive(self, filename: str, *args, **kwargs) -> Table:
+    @contextmanager
+    def open_in_archive(self, filename: str) -> Iterator[IO[bytes]]:
+        """Open file inside a zip/tar archive as a binary stream, without extracting the rest of the archive.
+
+        Zip files are looked up in the central directory of the archive, tar archives are scanned sequentially
+        until the file is found.
+        """
+        filename = os.path.normpath(filename)
+        if zipfile.is_zipfile(self.path):
+            with zipfile.ZipFile(self.path) as zip_file:
+                names = {os.path.normpath(name): name for name in zip_file.namelist()}
+                if filename not in names:
+                    raise FileNotFoundError(f"File {filename} not found in archive {self.path}")
+                with zip_file.open(names[filename]) as f:
+                    yield f
+        elif tarfile.is_tarfile(self.path):
+            with tarfile.open(self.path) as tar_file:
+                # read headers of members one by one until we find the file, its data comes right after the header
+                while (member := tar_file.next()) is not None:
+                    if member.isfile() and os.path.normpath(member.name) == filename:
+                        with cast(IO[bytes], tar_file.extractfile(member)) as f:
+                            yield f
+                        return
+            raise FileNotFoundError(f"File {filename} not found in archive {self.path}")
+        else:
+            raise ValueError("File is neither a zip nor a tar file.")
+
+    def archive_members(self) -> List[str]:
+        """List files inside a zip/tar archive."""
+        if zipfile.is_zipfile(self.path):
+            with zipfile.ZipFile(self.path) as zip_file:
+                return [info.filename for info in zip_file.infolist() if not info.is_dir()]
+        elif tarfile.is_tarfile(self.path):
+            with tarfile.open(self.path) as tar_file:
+                return [os.path.normpath(member.name) for member in tar_file if member.isfile()]
+        else:
+            raise ValueError("File is neither a zip nor a tar file.")
+
+    def extract_member(self, filename: str) -> Path:
+        """Extract a single file from a zip/tar archive to the cache and return its path. Extracted files are
+        keyed by md5 of the snapshot, so they are reused until the snapshot changes."""
+        path = paths.CACHE_DIR / "snapshots" / self.metadata.md5 / os.path.normpath(filename)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with self.open_in_archive(filename) as f:
+                fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+                with os.fdopen(fd, "wb") as out:
+                    shutil.copyfileobj(f, out, length=2**20)
+            os.replace(tmp_path, path)
+        return path
+
+    def read_in_archive(self, filename: str, *args, cache: bool = False, **kwargs) -> Table:
         """Read data from file inside a zip/tar archive.
 
         If the relevant data file is within a zip/tar archive, this method will read this file and return it as a table.
 
-        To do so, this method first unzips/untars the archive to a temporary directory, and then reads the file. Note that the file should have a supported extension (see `read` method).
+        The file is streamed from the archive into the reader, the rest of the archive is not extracted. Use
+        `cache=True` to extract the file to the cache on the first read instead, which makes subsequent reads of big
+        files faster. Note that the file should have a supported extension (see `read` method).
         """
-        with self.extract_to_tempdir() as tmpdir:
-            new_extension = filename.split(".")[-1]
-            # Read
-            tb = read_table_from_snapshot(
+        file_extension = filename.split(".")[-1]
+        if cache:
+            return read_table_from_snapshot(
                 *args,
-                path=Path(tmpdir) / filename,
+                path=self.extract_member(filename),
                 table_metadata=self.to_table_metadata(),
                 snapshot_origin=self.metadata.origin,
-                file_extension=new_extension,
+                file_extension=file_extension,
+                **kwargs,
+            )
+
+        with self.open_in_archive(filename) as f:
+            # other readers need to seek in the file, decompress it to memory
+            source = f if file_extension in STREAMABLE_EXTENSIONS else io.BytesIO(f.read())
+            return read_table_from_snapshot(
+                *args,
+                path=source,
+                table_metadata=self.to_table_metadata(),
+                snapshot_origin=self.metadata.origin,
+                file_extension=file_extension,
                 **kwargs,
             )
-            return tb
 
 
 @pruned_json
@@ -480,8 +574,162 @@ class SnapshotMeta:
         return table_meta
 
 
+def _blob_path(md5: str) -> Path:
+    return paths.CACHE_DIR / "snapshot_blobs" / md5[:2] / md5[2:]
+
+
+def fetch_snapshot_blob(md5: str, size: int, is_public: bool = True) -> Path:
+    """Return path to snapshot file with given md5 in the local blob store, download it from R2 if it isn't there.
+
+    The blob store is content-addressed, so snapshots with the same file in different versions download it only
+    once. Interrupted downloads are resumed with range requests and md5 is verified while writing the file. The store
+    lives in the cache dir and can be deleted at any time, least recently used files are deleted when it gets bigger
+    than `config.SNAPSHOT_BLOBS_MAX_SIZE`.
+    """
+    blob = _blob_path(md5)
+    if blob.exists() and blob.stat().st_size == size:
+        _touch_blob(blob)
+        return blob
+
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    part = blob.with_name(blob.name + ".part")
+    with open(part, "ab") as f:
+        # other threads and processes downloading the same file wait here
+        fcntl.flock(f, fcntl.LOCK_EX)
+        if blob.exists() and blob.stat().st_size == size:
+            part.unlink(missing_ok=True)
+            _touch_blob(blob)
+            return blob
+
+        # resume download from the end of the partial file, start over if it turns out to be corrupted
+        for offset in dict.fromkeys([f.seek(0, os.SEEK_END), 0]):
+            f.seek(offset)
+            f.truncate()
+            downloaded_md5 = _download_blob(f, md5, size, is_public)
+            if downloaded_md5 == md5 and f.tell() == size:
+                break
+        else:
+            f.truncate(0)
+            raise ValueError(
+                f"Checksum mismatch for snapshot file {md5}: got {downloaded_md5} of size {f.tell()}, expected size {size}"
+            )
+
+        os.replace(part, blob)
+        _touch_blob(blob)
+
+    _evict_blobs(keep=blob)
+    return blob
+
+
+def _touch_blob(blob: Path) -> None:
+    """Mark blob as recently used. Only access time is updated, modification time is kept for the checksum cache."""
+    try:
+        os.utime(blob, ns=(time.time_ns(), blob.stat().st_mtime_ns))
+    except FileNotFoundError:
+        # evicted by another process
+        pass
+
+
+def _evict_blobs(keep: Path, max_size: Optional[int] = None) -> None:
+    """Delete least recently used blobs until the blob store fits into `max_size`."""
+    max_size = config.SNAPSHOT_BLOBS_MAX_SIZE if max_size is None else max_size
+    blobs = []
+    for blob in (paths.CACHE_DIR / "snapshot_blobs").glob("*/*"):
+        if blob.suffix == ".part":
+            continue
+        try:
+            blobs.append((blob.stat(), blob))
+        except FileNotFoundError:
+            continue
+
+    total_size = sum(stat.st_size for stat, _ in blobs)
+    for stat, blob in sorted(blobs, key=lambda x: x[0].st_atime_ns):
+        if total_size <= max_size:
+            break
+        if blob != keep:
+            blob.unlink(missing_ok=True)
+            total_size -= stat.st_size
+
+
+def _clone_file(src: Path, dst: str) -> None:
+    """Copy file together with its modification time. On filesystems with copy-on-write support the copy is a clone
+    that shares data blocks with the original (like a hard link), but it doesn't change the original when written
+    to. Snapshot scripts overwrite snapshot files in place, so we can't use hard links."""
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        shutil.copystat(src, dst)
+    except OSError as e:
+        if isinstance(e, FileNotFoundError):
+            raise
+        shutil.copy2(src, dst)
+
+
+def _download_blob(f: BinaryIO, md5: str, size: int, is_public: bool) -> str:
+    """Append snapshot file from R2 to the partial file `f` and return md5 of the whole file."""
+    offset = f.tell()
+    _hash = hashlib.md5()
+    if offset > 0:
+        # hash the partial file, it's faster than downloading it again
+        with open(f.name, "rb") as istream:
+            for chunk in iter(lambda: istream.read(2**20), b""):
+                _hash.update(chunk)
+    if offset >= size:
+        return _hash.hexdigest()
+
+    key = f"{md5[:2]}/{md5[2:]}"
+    range_kwargs = {"Range": f"bytes={offset}-"} if offset else {}
+    if is_public:
+        # TODO: temporarily download files from R2 instead of public link to prevent
+        # issues with cached snapshots. Remove this when convenient
+        r = http_utils.get(f"{config.R2_SNAPSHOTS_PUBLIC_READ}/{key}", stream=True, headers=range_kwargs)
+        r.raise_for_status()
+        status, chunks, close = r.status_code, r.iter_content(chunk_size=2**20), r.close
+    else:
+        obj = s3_utils.connect_r2_cached().get_object(Bucket=config.R2_SNAPSHOTS_PRIVATE, Key=key, **range_kwargs)  # type: ignore
+        status, chunks, close = (
+            obj["ResponseMetadata"]["HTTPStatusCode"],
+            obj["Body"].iter_chunks(chunk_size=2**20),
+            obj["Body"].close,
+        )
+
+    # the whole file was sent instead of the requested range, start over
+    if offset and status != 206:
+        f.seek(0)
+        f.truncate()
+        _hash = hashlib.md5()
+
+    try:
+        for chunk in chunks:
+            f.write(chunk)
+            _hash.update(chunk)
+    finally:
+        close()
+    f.flush()
+    return _hash.hexdigest()
+
+
+def prefetch_snapshots(snapshots: Iterable[Snapshot], workers: int = PREFETCH_WORKERS) -> None:
+    """Download files of snapshots that aren't up to date to the blob store concurrently, so that pulling them later
+    only copies them. Failed downloads are only logged, they are retried when the snapshot is pulled."""
+    blobs = {}
+    for snap in snapshots:
+        if snap.metadata.outs and snap.is_dirty():
+            out = snap.metadata.outs[0]
+            blobs[out["md5"]] = (out["size"], snap.metadata.is_public, snap.uri)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(fetch_snapshot_blob, md5, size, is_public): uri
+            for md5, (size, is_public, uri) in blobs.items()
+        }
+    for future, uri in futures.items():
+        if future.exception():
+            log.warning("prefetch_snapshots.failed", snapshot=uri, error=str(future.exception()))
+
+
 def read_table_from_snapshot(
-    path: Union[str, Path],
+    path: Union[str, Path, IO[bytes]],
     table_metadata: TableMeta,
     snapshot_origin: Union[Origin, None],
     file_extension: str,
@@ -504,6 +752,8 @@ def read_table_from_snapshot(
         return pr.read_csv(*args, **kwargs)
     elif file_extension == "feather":
         return pr.read_feather(*args, **kwargs)
+    elif file_extension == "parquet":
+        return pr.read_parquet(*args, **kwargs)
     elif file_extension in ["xlsx", "xls", "xlsm", "xlsb", "odf", "ods", "odt"]:
         return pr.read_excel(*args, **kwargs)
     elif file_extension == "json":
@@ -0,0 +1,249 @@
+#
+#  step_workers.py
+#
+"""Warm worker processes for running data steps.
+
+Running every data step in a fresh `poetry run etl d run-python-step` subprocess costs ~3s
+of re-importing pandas, owid.catalog, structlog and friends. Instead, we keep a long-lived
+worker process that has already imported the heavy dependencies and send it one step at a time.
+
+Each step still runs isolated from the others:
+
+- modules imported by the step (e.g. `etl.steps.data.*` and its shared modules) are unimported
+  after it finishes, so the next step gets a fresh `sys.modules` view
+- the worker process is started with `prlimit --as={config.MAX_VIRTUAL_MEMORY_LINUX}`, just like
+  the `run-python-step` subprocess
+- environment variables are replaced by a copy of the caller's environment for the duration of the step
+
+Workers are recycled after `config.STEP_WORKER_MAX_STEPS` steps or once their resident memory
+grows over `config.STEP_WORKER_MAX_RSS`. Every process (e.g. each process of `exec_steps_parallel`)
+owns its own worker, so a pool of N processes runs with N warm workers.
+"""
+
+import os
+import resource
+import secrets
+import subprocess
+import sys
+import traceback
+from importlib import import_module
+from multiprocessing.connection import Client, Connection, Listener
+from multiprocessing.util import Finalize
+from typing import Dict, Optional, Tuple
+
+import structlog
+
+from etl import config
+
+log = structlog.get_logger()
+
+# modules imported by the worker before it starts accepting steps
+PRELOAD_MODULES = (
+    "numpy",
+    "pandas",
+    "pyarrow",
+    "structlog",
+    "owid.catalog",
+    "owid.datautils",
+    "etl.helpers",
+    "etl.data_helpers.geo",
+)
+
+
+class StepWorkerError(Exception):
+    """Raised when a step fails inside the worker, or the worker dies while running it."""
+
+
+class StepWorker:
+    """Long-lived process with heavy dependencies already imported that runs data steps one at a time."""
+
+    def __init__(
+        self,
+        max_steps: int = config.STEP_WORKER_MAX_STEPS,
+        max_rss: int = config.STEP_WORKER_MAX_RSS,
+    ) -> None:
+        self.max_steps = max_steps
+        self.max_rss = max_rss
+        self.steps_run = 0
+        self.rss = 0
+        # peak resident memory of the last step
+        self.peak_rss = 0
+
+        authkey = secrets.token_bytes(32)
+        with Listener(family="AF_UNIX", authkey=authkey) as listener:
+            # start the worker the same way we used to start `run-python-step` subprocess
+            args = []
+            if sys.platform == "linux":
+                args.extend(["prlimit", f"--as={config.MAX_VIRTUAL_MEMORY_LINUX}"])
+            args.extend([sys.executable, "-m", "etl.step_workers", str(listener.address)])
+
+            self._process = subprocess.Popen(args, stdin=subprocess.PIPE, env=os.environ.copy())
+            assert self._process.stdin
+            self._process.stdin.write(authkey)
+            self._process.stdin.close()
+
+            self._conn = listener.accept()
+
+    def is_alive(self) -> bool:
+        return self._process.poll() is None
+
+    def should_recycle(self) -> bool:
+        return not self.is_alive() or self.steps_run >= self.max_steps or self.rss >= self.max_rss
+
+    def run(self, uri: str, dest_dir: str, env: Optional[Dict[str, str]] = None) -> None:
+        """Run step `uri` in the worker and block until it finishes."""
+        env = dict(os.environ) if env is None else env
+        try:
+            self._conn.send((uri, dest_dir, env))
+            ok, self.rss, self.peak_rss = self._conn.recv()
+        except (EOFError, BrokenPipeError, ConnectionResetError):
+            # worker got killed, most likely by running out of memory
+            self._process.wait()
+            raise StepWorkerError(f"Step worker died with exit code {self._process.returncode} while running {uri}")
+        finally:
+            self.steps_run += 1
+
+        if not ok:
+            raise StepWorkerError(f"Step {uri} failed")
+
+    def close(self) -> None:
+        if self.is_alive():
+            try:
+                self._conn.send(None)
+                self._process.wait(timeout=10)
+            except (BrokenPipeError, OSError, subprocess.TimeoutExpired):
+                self._process.terminate()
+                self._process.wait()
+        self._conn.close()
+
+
+# worker owned by the current process, together with the PID of the owner (forked children
+# must not reuse worker of their parent)
+_WORKER: Optional[Tuple[int, StepWorker]] = None
+
+
+def get_worker() -> StepWorker:
+    """Return worker of the current process, start a new one if needed."""
+    global _WORKER
+    if _WORKER is not None:
+        pid, worker = _WORKER
+        if pid == os.getpid() and not worker.should_recycle():
+            return worker
+        if pid == os.getpid():
+            log.info("step_worker.recycle", steps_run=worker.steps_run, rss_mb=worker.rss // 2**20)
+            worker.close()
+
+    if _WORKER is None or _WORKER[0] != os.getpid():
+        # make sure the worker is shut down before multiprocessing joins child processes on exit
+        Finalize(None, shutdown_worker, exitpriority=10)
+
+    worker = StepWorker()
+    _WORKER = (os.getpid(), worker)
+    return worker
+
+
+def start_worker() -> None:
+    """Start the worker ahead of time so that it's warm when the first step arrives."""
+    get_worker()
+
+
+def shutdown_worker() -> None:
+    global _WORKER
+    if _WORKER is not None:
+        pid, worker = _WORKER
+        if pid == os.getpid():
+            worker.close()
+        _WORKER = None
+
+
+def run_step(uri: str, dest_dir: str) -> None:
+    """Run data step `uri` in a warm worker of the current process."""
+    get_worker().run(uri, dest_dir, env=dict(os.environ))
+
+
+def pop_last_step_peak_rss() -> int:
+    """Return peak resident memory of the last step run by the worker of the current process and forget it."""
+    if _WORKER is not None and _WORKER[0] == os.getpid():
+        peak, _WORKER[1].peak_rss = _WORKER[1].peak_rss, 0
+        return peak
+    return 0
+
+
+def reset_peak_rss() -> None:
+    """Reset peak resident memory of the current process, only supported on Linux."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss() -> int:
+    """Return peak resident set size of the current process in bytes."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # peak RSS since the start of the process, it is in kilobytes on Linux, bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def _worker_loop(conn: Connection) -> None:
+    for module_name in PRELOAD_MODULES:
+        import_module(module_name)
+
+    from etl.run_python_step import run_isolated
+
+    base_env = dict(os.environ)
+
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            break
+
+        if msg is None:
+            break
+
+        uri, dest_dir, env = msg
+        _set_environ(env)
+        reset_peak_rss()
+        try:
+            run_isolated(uri, dest_dir)
+            ok = True
+        except BaseException:
+            # print traceback the same way the subprocess would do
+            traceback.print_exc()
+            ok = False
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            _set_environ(base_env)
+
+        conn.send((ok, _current_rss(), peak_rss()))
+
+    conn.close()
+
+
+def _set_environ(env: Dict[str, str]) -> None:
+    os.environ.clear()
+    os.environ.update(env)
+
+
+def _current_rss() -> int:
+    """Return resident set size of the current process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        # peak RSS is the best we can get without /proc
+        return peak_rss()
+
+
+if __name__ == "__main__":
+    # authkey is passed through stdin so that it doesn't show up in the process list
+    _worker_loop(Client(sys.argv[1], family="AF_UNIX", authkey=sys.stdin.buffer.read()))
@@ -16,9 +16,8 @@ from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, field
 from glob import glob
-from importlib import import_module
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Protocol, Set, Union, cast
+from typing import Any, Dict, Iterable, List, Optional, Protocol, Set, Tuple, Union, cast
 from urllib.parse import urlparse
 
 import fasteners
@@ -519,6 +518,24 @@ class DataStep(Step):
         in_order = [v for _, v in sorted(checksums.items())]
         return hashlib.md5(",".join(in_order).encode("utf8")).hexdigest()
 
+    def index_files(self) -> List[str]:
+        """Files whose state determines whether the step is dirty, see `DirtyIndex`."""
+        return self._step_files() + [(self._dest_dir / "index.json").as_posix()]
+
+    def declared_peak_memory(self) -> Optional[int]:
+        """Return peak memory in bytes declared by the step code with e.g. `PEAK_MEMORY_GB = 20`.
+
+        It is used when running steps in parallel to avoid running several memory-hungry steps at once.
+        """
+        for f in self._step_files():
+            if not f.endswith(".py"):
+                continue
+            with open(f) as istream:
+                match = re.search(r"^PEAK_MEMORY_GB\s*=\s*(\d+(?:\.\d+)?)", istream.read(), re.MULTILINE)
+            if match:
+                return int(float(match.group(1)) * 2**30)
+        return None
+
     @property
     def _output_dataset(self) -> catalog.Dataset:
         "If this step is completed, return the MD5 of the output."
@@ -542,12 +559,9 @@ class DataStep(Step):
 
     @property
     def _search_path(self) -> Path:
-        # step might have been moved to an archive folder, try that folder first
-        archive_path = paths.STEP_DIR / "archive" / self.path
-        if list(archive_path.parent.glob(archive_path.name + "*")):
-            return archive_path
-        else:
-            return paths.STEP_DIR / "data" / self.path
+        from etl.run_python_step import step_search_path
+
+        return step_search_path(self.path)
 
     @property
     def _dest_dir(self) -> Path:
@@ -559,23 +573,35 @@ class DataStep(Step):
         does not have overhead from forking an extra process like _run_py and
         should be used with caution.
         """
-        from etl.helpers import isolated_env
-
-        # path can be either in a module with __init__.py or a single .py file
-        module_dir = self._search_path if self._search_path.is_dir() else self._search_path.parent
+        from etl.run_python_step import run_isolated
 
-        with isolated_env(module_dir):
-            step_module = import_module(self._search_path.relative_to(paths.BASE_DIR).as_posix().replace("/", "."))
-            if not hasattr(step_module, "run"):
-                raise Exception(f'no run() method defined for module "{step_module}"')
-
-            # data steps
-            step_module.run(self._dest_dir.as_posix())  # type: ignore
+        run_isolated(str(self), self._dest_dir.as_posix())
 
     def _run_py(self) -> None:
         """
         Import the Python module for this step and call run() on it.
         """
+        if config.STEP_WORKERS and not config.IPDB_ENABLED:
+            self._run_py_in_worker()
+        else:
+            self._run_py_in_subprocess()
+
+    def _run_py_in_worker(self) -> None:
+        """
+        Run the step in a warm worker process that has heavy packages already imported. The worker
+        gives the same isolation as a subprocess, but saves us from importing everything again.
+        """
+        from etl import step_workers
+
+        try:
+            step_workers.run_step(str(self), self._dest_dir.as_posix())
+        except step_workers.StepWorkerError as e:
+            # swallow this exception and just exit -- the important stack trace
+            # will already have been printed to stderr
+            print(f"\n{e}", file=sys.stderr)
+            sys.exit(1)
+
+    def _run_py_in_subprocess(self) -> None:
         # use a subprocess to isolate each step from the others, and avoid state bleeding
         # between them
         args = []
@@ -769,6 +795,10 @@ class SnapshotStep(Step):
     def checksum_output(self) -> str:
         return files.checksum_file(self._dvc_path)
 
+    def index_files(self) -> List[str]:
+        """Files whose state determines whether the step is dirty, see `DirtyIndex`."""
+        return [self._dvc_path, self._path]
+
     @property
     def _dvc_path(self) -> str:
         return f"{paths.SNAPSHOTS_DIR}/{self.path}.dvc"
@@ -862,51 +892,10 @@ class GrapherStep(Step):
         # Passing a BlockManager to Table is deprecated and will raise in a future version. Use public APIs instead.
         warnings.filterwarnings("ignore", category=DeprecationWarning)
 
-        with ThreadPoolExecutor(max_workers=config.GRAPHER_INSERT_WORKERS) as thread_pool:
-            futures = []
-            verbose = True
-            i = 0
-
-            # NOTE: multiple tables will be saved under a single dataset, this could cause problems if someone
-            # is fetching the whole dataset from data-api as they would receive all tables merged in a single
-            # table. This won't be a problem after we introduce the concept of "tables"
-            for table in dataset:
-                assert not table.empty, f"table {table.metadata.short_name} is empty"
-
-                # if GRAPHER_FILTER is set, only upsert matching columns
-                if config.GRAPHER_FILTER:
-                    cols = table.filter(regex=config.GRAPHER_FILTER).columns.tolist()
-                    cols += [c for c in table.columns if c in {"year", "date", "country"} and c not in cols]
-                    table = table.loc[:, cols]
-
-                table = gh._adapt_table_for_grapher(table, engine)
-
-                for t in gh._yield_wide_table(table, na_action="drop"):
-                    i += 1
-                    assert len(t.columns) == 1
-                    catalog_path = f"{self.path}/{table.metadata.short_name}#{t.columns[0]}"
-
-                    # stop logging to stop cluttering logs
-                    if i > 20 and verbose:
-                        verbose = False
-                        thread_pool.submit(
-                            lambda: (time.sleep(10), log.info("upsert_dataset.continue_without_logging"))
-                        )
-
-                    # generate table with entity_id, year and value for every column
-                    futures.append(
-                        thread_pool.submit(
-                            gi.upsert_table,
-                            engine,
-                            t,
-                            dataset_upsert_results,
-                            catalog_path=catalog_path,
-                            dimensions=(t.iloc[:, 0].metadata.additional_info or {}).get("dimensions"),
-                            verbose=verbose,
-                        )
-                    )
-
-            variable_upsert_results = [future.result() for future in as_completed(futures)]
+        if config.GRAPHER_UPSERT_BATCH_SIZE:
+            variable_upsert_results = self._upsert_variables_in_batches(engine, dataset, dataset_upsert_results)
+        else:
+            variable_upsert_results = self._upsert_variables_one_by_one(engine, dataset, dataset_upsert_results)
 
         if not config.GRAPHER_FILTER and not config.SUBSET:
             # cleaning up ghost resources could be unsuccessful if someone renamed short_name of a variable
@@ -923,6 +912,77 @@ class GrapherStep(Step):
 
             gi.set_dataset_checksum_and_editedAt(dataset_upsert_results.dataset_id, checksum)
 
+    def _upsert_variables_one_by_one(
+        self, engine: Engine, dataset: catalog.Dataset, dataset_upsert_results
+    ) -> List[Any]:
+        import etl.grapher_import as gi
+
+        with ThreadPoolExecutor(max_workers=config.GRAPHER_INSERT_WORKERS) as thread_pool:
+            futures = []
+            verbose = True
+
+            for i, (t, catalog_path, dimensions) in enumerate(self._yield_variable_tables(engine, dataset)):
+                # stop logging to stop cluttering logs
+                if i >= 20 and verbose:
+                    verbose = False
+                    thread_pool.submit(lambda: (time.sleep(10), log.info("upsert_dataset.continue_without_logging")))
+
+                # generate table with entity_id, year and value for every column
+                futures.append(
+                    thread_pool.submit(
+                        gi.upsert_table,
+                        engine,
+                        t,
+                        dataset_upsert_results,
+                        catalog_path=catalog_path,
+                        dimensions=dimensions,
+                        verbose=verbose,
+                    )
+                )
+
+            return [future.result() for future in as_completed(futures)]
+
+    def _upsert_variables_in_batches(
+        self, engine: Engine, dataset: catalog.Dataset, dataset_upsert_results
+    ) -> List[Any]:
+        """Upsert variables in batches of `config.GRAPHER_UPSERT_BATCH_SIZE` with a few multi-row
+        statements per batch instead of a session per variable."""
+        import etl.grapher_import as gi
+
+        variable_upsert_results = []
+        batch = []
+        for item in self._yield_variable_tables(engine, dataset):
+            batch.append(item)
+            if len(batch) >= config.GRAPHER_UPSERT_BATCH_SIZE:
+                variable_upsert_results += gi.upsert_tables(engine, batch, dataset_upsert_results)
+                batch = []
+        variable_upsert_results += gi.upsert_tables(engine, batch, dataset_upsert_results)
+
+        return variable_upsert_results
+
+    def _yield_variable_tables(
+        self, engine: Engine, dataset: catalog.Dataset
+    ) -> Iterable[Tuple[catalog.Table, str, Optional[Dict[str, Any]]]]:
+        """Yield single-column table for every variable together with its catalog path and dimensions."""
+        # NOTE: multiple tables will be saved under a single dataset, this could cause problems if someone
+        # is fetching the whole dataset from data-api as they would receive all tables merged in a single
+        # table. This won't be a problem after we introduce the concept of "tables"
+        for table in dataset:
+            assert not table.empty, f"table {table.metadata.short_name} is empty"
+
+            # if GRAPHER_FILTER is set, only upsert matching columns
+            if config.GRAPHER_FILTER:
+                cols = table.filter(regex=config.GRAPHER_FILTER).columns.tolist()
+                cols += [c for c in table.columns if c in {"year", "date", "country"} and c not in cols]
+                table = table.loc[:, cols]
+
+            table = gh._adapt_table_for_grapher(table, engine)
+
+            for t in gh._yield_wide_table(table, na_action="drop"):
+                assert len(t.columns) == 1
+                catalog_path = f"{self.path}/{table.metadata.short_name}#{t.columns[0]}"
+                yield t, catalog_path, (t.iloc[:, 0].metadata.additional_info or {}).get("dimensions")
+
     def checksum_output(self) -> str:
         raise NotImplementedError("GrapherStep should not be used as an input")
 
@@ -1088,18 +1148,32 @@ class BackportStepPrivate(PrivateMixin, BackportStep):
 
 def select_dirty_steps(steps: List[Step], workers: int = 1) -> List[Step]:
     """Select dirty steps using threadpool."""
-    # dynamically add cached version of `is_dirty` to all steps to avoid re-computing
-    # this is a bit hacky, but it's the easiest way to only cache it here without
+    # dynamically add cached version of `is_dirty` and `checksum_output` to all steps to avoid
+    # re-computing this is a bit hacky, but it's the easiest way to only cache it here without
     # affecting the rest
     cache_is_dirty = files.RuntimeCache()
+    cache_checksum_output = files.RuntimeCache()
+
+    # steps that haven't changed since the last run don't have to be checked at all
+    index = DirtyIndex.load(paths.DIRTY_INDEX_FILE) if config.DIRTY_INDEX else None
+    if index:
+        for step_name, checksum in index.clean_steps(steps).items():
+            cache_is_dirty.add(step_name, False)
+            cache_checksum_output.add(step_name, checksum)
+
     for s in steps:
-        _add_is_dirty_cached(s, cache_is_dirty)
+        _add_is_dirty_cached(s, cache_is_dirty, cache_checksum_output)
 
     with ThreadPoolExecutor(max_workers=workers) as executor:
         steps_dirty = executor.map(_step_is_dirty, steps)  # type: ignore
         steps = [s for s, is_dirty in zip(steps, steps_dirty) if is_dirty]
 
+    if index:
+        index.update(cache_is_dirty)
+        index.save()
+
     cache_is_dirty.clear()
+    cache_checksum_output.clear()
 
     return steps
 
@@ -1115,12 +1189,135 @@ def _cached_is_dirty(self: Step, cache: files.RuntimeCache) -> bool:
     return cache[key]  # type: ignore
 
 
-def _add_is_dirty_cached(s: Step, cache: files.RuntimeCache) -> None:
+def _cached_checksum_output(self: Step, cache: files.RuntimeCache) -> str:
+    key = str(self)
+    if key not in cache:
+        cache.add(key, self._checksum_output())  # type: ignore
+    return cache[key]
+
+
+def _add_is_dirty_cached(
+    s: Step, cache: files.RuntimeCache, cache_checksum_output: Optional[files.RuntimeCache] = None
+) -> None:
     """Save copy of a method to _is_dirty and replace it with a cached version."""
     s._is_dirty = s.is_dirty  # type: ignore
     s.is_dirty = lambda s=s: _cached_is_dirty(s, cache)  # type: ignore
+    if cache_checksum_output is not None:
+        s._checksum_output = s.checksum_output  # type: ignore
+        s.checksum_output = lambda s=s: _cached_checksum_output(s, cache_checksum_output)  # type: ignore
     for dep in getattr(s, "dependencies", []):
-        _add_is_dirty_cached(dep, cache)
+        _add_is_dirty_cached(dep, cache, cache_checksum_output)
+
+
+class DirtyIndex:
+    """Persisted index of steps that were clean in the last run, together with their output checksums
+    and the state (size and mtime) of files they depend on, see `Step.index_files`.
+
+    A step is clean without any checks if neither its files nor files of any of its upstream steps have
+    changed since then. Only steps downstream of changed files go through the full `is_dirty` check.
+    """
+
+    def __init__(self, path: Path, fingerprint: str, entries: Dict[str, Any]) -> None:
+        self.path = path
+        self.fingerprint = fingerprint
+        self.entries = entries
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._steps: Dict[str, Step] = {}
+        self._graph: Graph = {}
+
+    @classmethod
+    def load(cls, path: Path) -> "DirtyIndex":
+        fingerprint = cls._current_fingerprint()
+        entries = {}
+        if path.exists():
+            try:
+                with open(path) as f:
+                    index = json.load(f)
+                # anything that affects checksums of all steps invalidates the whole index
+                if index.get("fingerprint") == fingerprint:
+                    entries = index["steps"]
+            except (json.JSONDecodeError, KeyError):
+                log.warning("dirty_index.corrupted", path=path)
+        return cls(path, fingerprint, entries)
+
+    @staticmethod
+    def _current_fingerprint() -> str:
+        return files.checksum_dict(
+            {"pandas": pd.__version__, "etl_epoch": config.ETL_EPOCH, "subset": config.SUBSET, "version": 1}
+        )
+
+    def clean_steps(self, steps: List[Step]) -> Dict[str, str]:
+        """Return steps (including all their dependencies) that are clean for sure, together with their
+        output checksums."""
+        self._collect(steps, self._graph)
+
+        changed = set()
+        for step_name, step in self._steps.items():
+            entry = self.entries.get(step_name)
+            if (
+                entry is None
+                or step_name not in self._stats
+                or entry["files"] != self._stats[step_name]
+                # adding or removing a dependency changes checksum of the step
+                or entry.get("dependencies") != sorted(self._graph[step_name])
+            ):
+                changed.add(step_name)
+
+        # everything downstream of a changed step has to be checked
+        affected = traverse(reverse_graph(self._graph), changed)
+
+        return {
+            step_name: self.entries[step_name]["checksum"] for step_name in self._steps if step_name not in affected
+        }
+
+    def _collect(self, steps: List[Step], graph: Graph) -> None:
+        """Walk steps and their dependencies, build their graph and record current state of their files."""
+        for step in steps:
+            step_name = str(step)
+            if step_name in graph:
+                continue
+            dependencies = getattr(step, "dependencies", [])
+            graph[step_name] = {str(dep) for dep in dependencies}
+            self._steps[step_name] = step
+
+            # steps without files, e.g. grapher or etag steps, have to be always checked
+            index_files = getattr(step, "index_files", None)
+            if index_files:
+                self._stats[step_name] = {f: _file_state(f) for f in index_files()}
+
+            self._collect(dependencies, graph)
+
+    def update(self, cache_is_dirty: files.RuntimeCache) -> None:
+        """Record clean steps, forget dirty ones."""
+        for step_name, step in self._steps.items():
+            if step_name not in cache_is_dirty:
+                continue
+
+            if cache_is_dirty[step_name] or step_name not in self._stats:
+                self.entries.pop(step_name, None)
+            else:
+                # use state of files from before the checks, if they changed since then, we'll check them next time
+                self.entries[step_name] = {
+                    "files": self._stats[step_name],
+                    "dependencies": sorted(self._graph[step_name]),
+                    "checksum": step.checksum_output(),
+                }
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # write to temporary file first to avoid corrupting the index if we get interrupted
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"fingerprint": self.fingerprint, "steps": self.entries}, f)
+        os.replace(tmp_path, self.path)
+
+
+def _file_state(path: str) -> Optional[List[int]]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
 
 
 def _uses_old_schema(e: KeyError) -> bool:
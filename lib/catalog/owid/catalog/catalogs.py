@@ -3,22 +3,23 @@
 #  owid-catalog-py
 #
 
+import hashlib
 import heapq
+import io
 import json
 import os
 import re
 import tempfile
 from pathlib import Path
-from typing import Any, Dict, Iterable, Iterator, List, Optional, Union, cast
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union, cast
 from urllib.parse import urlparse
 
 import numpy as np
 import numpy.typing as npt
 import pandas as pd
-import requests
 import structlog
 
-from . import s3_utils
+from . import http_utils, s3_utils
 from .datasets import CHANNEL, PREFERRED_FORMAT, SUPPORTED_FORMATS, Dataset, FileFormat
 from .tables import Table
 
@@ -57,33 +58,59 @@ class CatalogMixin:
         dataset: Optional[str] = None,
         channel: Optional[CHANNEL] = None,
     ) -> "CatalogFrame":
-        criteria: npt.ArrayLike = np.ones(len(self.frame), dtype=bool)
+        # positions of matching rows, None means all rows
+        positions: Optional[npt.NDArray[np.intp]] = None
 
         if table:
-            criteria &= self.frame.table.str.contains(table)
+            # match only unique table names, there are fewer of them than rows
+            codes, uniques = self._table_codes()
+            matched = np.flatnonzero(pd.Series(uniques, dtype=object).str.contains(table).fillna(False).to_numpy())
+            positions = _intersect(positions, np.flatnonzero(np.isin(codes, matched)))
 
         if namespace:
-            criteria &= self.frame.namespace == namespace
+            positions = _intersect(positions, self._positions("namespace", namespace))
 
         if version:
-            criteria &= self.frame.version == version
+            positions = _intersect(positions, self._positions("version", version))
 
         if dataset:
-            criteria &= self.frame.dataset == dataset
+            positions = _intersect(positions, self._positions("dataset", dataset))
 
         if channel:
             if channel not in self.channels:
                 raise ValueError(
                     f"You need to add `{channel}` to channels in Catalog init (only `{self.channels}` are loaded now)"
                 )
-            criteria &= self.frame.channel == channel
+            positions = _intersect(positions, self._positions("channel", channel))
 
-        matches = self.frame[criteria]
+        matches = self.frame if positions is None else self.frame.iloc[positions]
         if "checksum" in matches.columns:
             matches = matches.drop(columns=["checksum"])
 
         return cast(CatalogFrame, matches)
 
+    def _lookups(self) -> Dict[str, Any]:
+        """Lookup structures of the current frame, they're built lazily and thrown away when the
+        frame is replaced (e.g. by reindexing)."""
+        if getattr(self, "_lookups_frame", None) is not self.frame:
+            self._lookups_frame = self.frame
+            self._lookups_cache: Dict[str, Any] = {}
+        return self._lookups_cache
+
+    def _positions(self, column: str, value: Any) -> npt.NDArray[np.intp]:
+        """Return positions of rows with given value in a column."""
+        lookups = self._lookups()
+        if column not in lookups:
+            lookups[column] = self.frame.groupby(column, sort=False).indices
+        return lookups[column].get(value, np.array([], dtype=np.intp))
+
+    def _table_codes(self) -> Tuple[npt.NDArray[np.intp], npt.NDArray[Any]]:
+        """Return codes of tables and unique table names."""
+        lookups = self._lookups()
+        if "table" not in lookups:
+            lookups["table"] = pd.factorize(self.frame.table)
+        return lookups["table"]
+
     def find_one(self, *args: Optional[str], **kwargs: Optional[str]) -> Table:
         return self.find(*args, **kwargs).load()  # type: ignore
 
@@ -152,7 +179,15 @@ class LocalCatalog(CatalogMixin):
         df.dimensions = df.dimensions.map(lambda s: json.loads(s) if isinstance(s, str) else s)
         return df
 
+    @property
+    def _state_file(self) -> Path:
+        return self.path / "catalog.state.json"
+
     def iter_datasets(self, channel: CHANNEL, include: Optional[str] = None) -> Iterator[Dataset]:
+        for dir in self._iter_dataset_dirs(channel, include=include):
+            yield Dataset(dir)
+
+    def _iter_dataset_dirs(self, channel: CHANNEL, include: Optional[str] = None) -> Iterator[Path]:
         to_search = [self.path / channel]
         if not to_search[0].exists():
             return
@@ -162,7 +197,7 @@ class LocalCatalog(CatalogMixin):
         while to_search:
             dir = heapq.heappop(to_search)
             if (dir / "index.json").exists() and re_search.search(str(dir)):
-                yield Dataset(dir)
+                yield dir
                 continue
 
             for child in dir.iterdir():
@@ -189,6 +224,7 @@ class LocalCatalog(CatalogMixin):
         index.dimensions = index.dimensions.map(lambda s: json.loads(s) if isinstance(s, str) else s)
 
         self._save_index(index)
+        self._save_state(self._state)
         self.frame = index
 
     @staticmethod
@@ -216,21 +252,50 @@ class LocalCatalog(CatalogMixin):
         self._save_metadata({"format_version": OWID_CATALOG_VERSION})
 
     def _scan_for_datasets(self, include: Optional[str] = None) -> "CatalogFrame":
-        """Scan datasets. You can filter by `include` to get better performance."""
+        """Scan datasets. You can filter by `include` to get better performance.
+
+        Datasets whose files haven't changed since the last reindex (according to their fingerprints
+        in the state file) are not indexed again, their rows are taken from the current index.
+        """
+        previous_state = self._read_state()
+        previous = self._previous_rows()
+        state = dict(previous_state)
+
         frames = []
         log.info("reindex.start", channels=self.channels, include=include)
         for channel in self.channels:
+            if not include:
+                # datasets that no longer exist are dropped from the state
+                state = {k: v for k, v in state.items() if not k.startswith(f"{channel}/")}
+
             channel_frames = []
-            for ds in self.iter_datasets(channel, include=include):
-                channel_frames.append(ds.index(self.path))
+            reused = 0
+            for dir in self._iter_dataset_dirs(channel, include=include):
+                key = dir.relative_to(self.path).as_posix()
+                fingerprint = _dataset_fingerprint(dir)
+
+                rows = _reusable_rows(previous, previous_state.get(key), key, fingerprint)
+                if rows is not None:
+                    reused += 1
+                else:
+                    rows = Dataset(dir).index(self.path)
+
+                channel_frames.append(rows)
+                state[key] = {
+                    "fingerprint": fingerprint,
+                    "checksum": rows.checksum.iloc[0] if len(rows) else None,
+                }
             frames += channel_frames
             log.info(
                 "reindex",
                 channel=channel,
                 datasets=len(channel_frames),
+                reused=reused,
                 include=include,
             )
 
+        self._state = state
+
         df = pd.concat(frames, ignore_index=True)
 
         keys = ["table", "dataset", "version", "namespace", "channel", "is_public"]
@@ -245,6 +310,54 @@ class LocalCatalog(CatalogMixin):
         with open(self._metadata_file, "w") as ostream:
             json.dump(contents, ostream, indent=2)
 
+    def _read_state(self) -> Dict[str, Dict[str, Any]]:
+        """Read fingerprints and checksums of datasets from the last reindex."""
+        if not self._state_file.exists() or getattr(self, "frame", None) is None:
+            return {}
+        with open(self._state_file) as istream:
+            return cast(Dict[str, Dict[str, Any]], json.load(istream))
+
+    def _save_state(self, state: Dict[str, Dict[str, Any]]) -> None:
+        with open(self._state_file, "w") as ostream:
+            json.dump(state, ostream, sort_keys=True)
+
+    def _previous_rows(self) -> Dict[str, pd.DataFrame]:
+        """Rows of the current index grouped by dataset path."""
+        frame = getattr(self, "frame", None)
+        if frame is None or frame.empty:
+            return {}
+        dataset_paths = frame.path.str.rsplit("/", n=1).str[0]
+        return {k: frame.iloc[v] for k, v in frame.groupby(dataset_paths, sort=False).indices.items()}
+
+
+def _dataset_fingerprint(dir: Path) -> str:
+    """Return fingerprint of files in a dataset folder, it changes whenever a file is added, removed or
+    modified. Unlike checksum, it doesn't need to read the files."""
+    entries = sorted((e.name, e.stat().st_size, e.stat().st_mtime_ns) for e in os.scandir(dir) if e.is_file())
+    return hashlib.md5(json.dumps(entries).encode()).hexdigest()
+
+
+def _reusable_rows(
+    previous: Dict[str, pd.DataFrame], state: Optional[Dict[str, Any]], key: str, fingerprint: str
+) -> Optional[pd.DataFrame]:
+    """Return rows of a dataset from the previous index if the dataset hasn't changed since then."""
+    if not state or state["fingerprint"] != fingerprint:
+        return None
+
+    rows = previous.get(key, pd.DataFrame({"checksum": []}))
+    # make sure rows are from the same version of the dataset as the state
+    if set(rows.checksum) != ({state["checksum"]} if state["checksum"] else set()):
+        return None
+
+    return rows
+
+
+def _intersect(positions: Optional[npt.NDArray[np.intp]], other: npt.NDArray[np.intp]) -> npt.NDArray[np.intp]:
+    """Intersect sorted arrays of row positions, None stands for all rows."""
+    if positions is None:
+        return other
+    return np.intersect1d(positions, other, assume_unique=True)
+
 
 class RemoteCatalog(CatalogMixin):
     uri: str
@@ -272,7 +385,7 @@ class RemoteCatalog(CatalogMixin):
         """
         Read the metadata JSON blob for this repo.
         """
-        resp = requests.get(uri)
+        resp = http_utils.get(uri)
         resp.raise_for_status()
         return cast(Dict[str, Any], resp.json())
 
@@ -429,14 +542,20 @@ def read_frame(uri: Union[str, Path]) -> pd.DataFrame:
     if isinstance(uri, Path):
         uri = str(uri)
 
+    source: Any = uri
+    if uri.startswith("http"):
+        resp = http_utils.get(uri)
+        resp.raise_for_status()
+        source = io.BytesIO(resp.content)
+
     if uri.endswith(".feather"):
-        return cast(pd.DataFrame, pd.read_feather(uri))
+        return cast(pd.DataFrame, pd.read_feather(source))
 
     elif uri.endswith(".parquet"):
-        return cast(pd.DataFrame, pd.read_parquet(uri))
+        return cast(pd.DataFrame, pd.read_parquet(source))
 
     elif uri.endswith(".csv"):
-        return pd.read_csv(uri)
+        return pd.read_csv(source)
 
     raise ValueError(f"could not detect format of uri: {uri}")
 
@@ -4,6 +4,7 @@
 
 import hashlib
 import json
+import os
 import shutil
 import warnings
 from dataclasses import dataclass
@@ -11,7 +12,7 @@ from glob import glob
 from os import environ
 from os.path import join
 from pathlib import Path
-from typing import Iterator, List, Literal, Optional, Union
+from typing import Any, Dict, Iterator, List, Literal, Optional, Union
 
 import numpy as np
 import pandas as pd
@@ -43,6 +44,9 @@ assert SUPPORTED_FORMATS[0] == PREFERRED_FORMAT
 # available channels in the catalog
 CHANNEL = Literal["garden", "meadow", "grapher", "backport", "open_numbers", "examples", "explorers", "external"]
 
+# file in the dataset folder with checksums of its files, it's local only and not part of the dataset
+CHECKSUMS_FILE = ".checksums.json"
+
 # all pandas nullable dtypes
 NULLABLE_DTYPES = [f"{sign}{typ}{size}" for typ in ("Int", "Float") for sign in ("", "U") for size in (8, 16, 32, 64)]
 
@@ -137,26 +141,38 @@ class Dataset:
         # copy dataset metadata to the table
         table.metadata.dataset = self.metadata
 
+        checksums = {}
         for format in formats:
             if format not in SUPPORTED_FORMATS:
                 raise Exception(f"Format '{format}'' is not supported")
 
             table_filename = join(self.path, table.metadata.checked_name + f".{format}")
-            table.to(table_filename, repack=repack)
+            checksums.update(table.to(table_filename, repack=repack))
+
+        self._store_file_checksums(checksums)
 
-    def read_table(self, name: str, reset_index: bool = True) -> tables.Table:
+    def read_table(
+        self,
+        name: str,
+        reset_index: bool = True,
+        columns: Optional[List[str]] = None,
+        filters: Optional[tables.Filters] = None,
+    ) -> tables.Table:
         """Read dataset's table from disk. Alternative to ds[table_name], but
         with more options to optimize the reading.
 
         :param reset_index: If true, don't set primary keys of the table. This can make loading
             large datasets with multi-indexes much faster.
+        :param columns: Only read these columns (primary key is always read), e.g. `["gdp"]`.
+        :param filters: Only read rows matching these filters, e.g. `[("year", ">=", 2000)]`. See
+            `pyarrow.parquet.read_table` for the syntax.
         """
         stem = self.path / Path(name)
 
         for format in SUPPORTED_FORMATS:
             path = stem.with_suffix(f".{format}")
             if path.exists():
-                t = tables.Table.read(path, primary_key=[] if reset_index else None)
+                t = tables.Table.read(path, primary_key=[] if reset_index else None, columns=columns, filters=filters)
                 # dataset metadata might have been updated, refresh it
                 t.metadata.dataset = self.metadata
                 return t
@@ -190,6 +206,7 @@ class Dataset:
         # Update the copy of this datasets metadata in every table in the set.
         # TODO: this entire part should go away and we should make t.metadata.dataset read only
         #   also dataset metadata should be only saved in `index.json` and not in every table
+        checksums = {}
         for table_name in self.table_names:
             # NOTE: don't load the table here, that could be slow. Just update the metadata file.
             table_meta_path = Path(self.path) / f"{table_name}.meta.json"
@@ -198,8 +215,11 @@ class Dataset:
                 table_meta = json.load(f)
                 table_meta["dataset"] = self.metadata.to_dict()
 
-            with open(table_meta_path, "w") as f:
-                json.dump(table_meta, f, indent=2, default=str)
+            with utils.HashingFileWriter(table_meta_path) as f:
+                f.write(json.dumps(table_meta, indent=2, default=str).encode())
+            checksums[table_meta_path.name] = f.hexdigest()
+
+        self._store_file_checksums(checksums)
 
     def update_metadata(
         self,
@@ -228,6 +248,7 @@ class Dataset:
         """
         self.metadata.update_from_yaml(metadata_path, if_source_exists=if_source_exists)
 
+        checksums = {}
         with open(metadata_path) as istream:
             metadata = yaml.safe_load(istream)
             for table_name in metadata.get("tables", {}).keys():
@@ -242,7 +263,10 @@ class Dataset:
                                 warnings.warn(str(e))
                             continue
                 table.update_metadata_from_yaml(metadata_path, table_name, if_origins_exist=if_origins_exist)
-                table._save_metadata(join(self.path, table.metadata.checked_name + ".meta.json"))
+                metadata_file = table.metadata.checked_name + ".meta.json"
+                checksums[metadata_file] = table._save_metadata(join(self.path, metadata_file))
+
+        self._store_file_checksums(checksums)
 
     def index(self, catalog_path: Path = Path("/")) -> pd.DataFrame:
         """
@@ -309,19 +333,69 @@ class Dataset:
     def _metadata_files(self) -> List[str]:
         return sorted(glob(join(self.path, "*.meta.json")))
 
-    def checksum(self) -> str:
-        "Return a MD5 checksum of all data and metadata in the dataset."
+    def checksum(self, verify: bool = False) -> str:
+        """Return a MD5 checksum of all data and metadata in the dataset.
+
+        Checksums of files written by `add` or `save` are stored in `.checksums.json` and only combined
+        here. Files that were modified in other ways are read again. Use `verify=True` to ignore
+        stored checksums and read all files.
+        """
+        checksums = {} if verify else self.file_checksums()
+
+        def _digest(filename: str) -> bytes:
+            md5 = checksums.get(Path(filename).name)
+            return bytes.fromhex(md5) if md5 else checksum_file(filename).digest()
+
         _hash = hashlib.md5()
         _hash.update(checksum_file(self._index_file).digest())
 
         for data_file in self._data_files:
-            _hash.update(checksum_file(data_file).digest())
+            _hash.update(_digest(data_file))
 
             metadata_file = Path(data_file).with_suffix(".meta.json").as_posix()
-            _hash.update(checksum_file(metadata_file).digest())
+            _hash.update(_digest(metadata_file))
 
         return _hash.hexdigest()
 
+    def file_checksums(self) -> Dict[str, str]:
+        """Return MD5 checksums of files in the dataset folder stored in `.checksums.json`. Only files that
+        haven't been modified since they were written by `add` or `save` are included."""
+        checksums = {}
+        for filename, entry in self._read_checksums_file().items():
+            try:
+                stat = os.stat(join(self.path, filename))
+            except FileNotFoundError:
+                continue
+            if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]:
+                checksums[filename] = entry["md5"]
+        return checksums
+
+    @property
+    def _checksums_file(self) -> str:
+        return join(self.path, CHECKSUMS_FILE)
+
+    def _read_checksums_file(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._checksums_file) as istream:
+                return json.load(istream)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _store_file_checksums(self, checksums: Dict[str, str]) -> None:
+        """Store checksums of files written to the dataset folder in `.checksums.json` together with their
+        size and modification time, so that we can tell whether they are still valid. It is a separate file
+        because `mtime` is only valid locally and `index.json` gets published."""
+        files = self._read_checksums_file()
+        for filename, md5 in checksums.items():
+            stat = os.stat(join(self.path, filename))
+            files[filename] = {"md5": md5, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+        # drop checksums of deleted files
+        files = {k: files[k] for k in sorted(files) if os.path.exists(join(self.path, k))}
+
+        with open(self._checksums_file, "w") as ostream:
+            json.dump(files, ostream, indent=2)
+
 
 for k in DatasetMeta.__dataclass_fields__:
     if hasattr(Dataset, k):
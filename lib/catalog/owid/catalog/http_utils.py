@@ -0,0 +1,215 @@
+"""Shared HTTP transport for our catalogs and APIs.
+
+All requests go through a session with keep-alive connection pools, at most `MAX_CONNECTIONS_PER_HOST` connections
+to a single host, adaptive rate limiting and retries of failed requests. Use `get` and `download` from this module
+instead of calling `requests` directly.
+"""
+
+import os
+import random
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+from urllib.parse import urlparse
+
+import requests
+import structlog
+from requests.adapters import HTTPAdapter
+
+log = structlog.get_logger()
+
+# Maximum number of open connections (and thus concurrent requests) to a single host, per process. Threads wait
+# for a free connection when all of them are in use.
+MAX_CONNECTIONS_PER_HOST = int(os.environ.get("OWID_HTTP_MAX_CONNECTIONS_PER_HOST", 16))
+
+# Initial limit of requests per second to hosts with known rate limits. Cloudflare limits us to 600 requests
+# per minute on the data API. Other hosts are not limited until they respond with 429 Too Many Requests.
+RATE_LIMITS: Dict[str, float] = {
+    "api.ourworldindata.org": 10.0,
+    "api-staging.owid.io": 10.0,
+}
+
+# Limit of requests per second to a host that started responding with 429 without a known rate limit.
+THROTTLED_RATE = 10.0
+
+# Rate never drops below this many requests per second.
+MIN_RATE = 0.5
+
+# Number of attempts of a request before giving up.
+MAX_ATTEMPTS = 5
+
+# Responses with these status codes are retried.
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Exceptions that are retried.
+RETRY_EXCEPTIONS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+# Timeout of connecting and reading in seconds.
+TIMEOUT = (10, 120)
+
+
+@dataclass
+class HostStats:
+    """Metrics of requests to a single host."""
+
+    requests: int = 0
+    retries: int = 0
+    throttled: int = 0
+    errors: int = 0
+    # total time spent waiting for the rate limit in seconds
+    wait_time: float = 0.0
+    # current limit of requests per second, None if not limited
+    rate: Optional[float] = None
+
+
+class _RateLimiter:
+    """Adaptive rate limiter of a single host. Requests are spaced out evenly according to the rate, which halves
+    whenever the host responds with 429 and recovers by one request per second for every second of successful
+    requests (AIMD)."""
+
+    def __init__(self, rate: Optional[float]) -> None:
+        self.max_rate = rate
+        self.stats = HostStats(rate=rate)
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self, retry: bool = False) -> None:
+        """Wait until the next request (or retry of a request) can start."""
+        with self._lock:
+            self.stats.requests += 1
+            self.stats.retries += retry
+            if self.stats.rate is None:
+                return
+            now = time.monotonic()
+            start = max(now, self._next_time)
+            self._next_time = start + 1 / self.stats.rate
+            self.stats.wait_time += start - now
+        if start > now:
+            time.sleep(start - now)
+
+    def error(self) -> None:
+        with self._lock:
+            self.stats.errors += 1
+
+    def success(self) -> None:
+        with self._lock:
+            rate = self.stats.rate
+            if rate is not None and (self.max_rate is None or rate < self.max_rate):
+                rate += 1 / rate
+                self.stats.rate = rate if self.max_rate is None else min(rate, self.max_rate)
+
+    def throttle(self, retry_after: Optional[float]) -> None:
+        """Slow down after the host responded with 429 Too Many Requests."""
+        with self._lock:
+            self.stats.throttled += 1
+            self.stats.rate = max(MIN_RATE, (self.stats.rate or THROTTLED_RATE * 2) / 2)
+            pause = retry_after if retry_after is not None else 1 / self.stats.rate
+            self._next_time = max(self._next_time, time.monotonic() + pause)
+
+
+# Sessions by process ID, forked processes must not share connections of their parent.
+_SESSIONS: Dict[int, requests.Session] = {}
+_LIMITERS: Dict[str, _RateLimiter] = {}
+_LOCK = threading.Lock()
+
+
+def session() -> requests.Session:
+    """Return session shared by all threads of this process."""
+    pid = os.getpid()
+    with _LOCK:
+        if pid not in _SESSIONS:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=MAX_CONNECTIONS_PER_HOST, pool_block=True)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _SESSIONS[pid] = s
+        return _SESSIONS[pid]
+
+
+def _limiter(url: str) -> _RateLimiter:
+    host = urlparse(url).netloc
+    with _LOCK:
+        if host not in _LIMITERS:
+            _LIMITERS[host] = _RateLimiter(RATE_LIMITS.get(host))
+        return _LIMITERS[host]
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    """Return metrics of requests by host."""
+    with _LOCK:
+        return {host: asdict(limiter.stats) for host, limiter in _LIMITERS.items()}
+
+
+def request(method: str, url: str, **kwargs: Any) -> requests.Response:
+    """Send a request with the shared session. Connection errors and responses with status codes from
+    `RETRY_STATUS_CODES` are retried with exponential backoff, the response of the last attempt is returned
+    (call `raise_for_status` on it if needed)."""
+    kwargs.setdefault("timeout", TIMEOUT)
+    limiter = _limiter(url)
+    for attempt in range(MAX_ATTEMPTS):
+        limiter.wait(retry=attempt > 0)
+        try:
+            r = session().request(method, url, **kwargs)
+        except RETRY_EXCEPTIONS:
+            limiter.error()
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            _backoff(attempt)
+            continue
+
+        if r.status_code not in RETRY_STATUS_CODES or attempt == MAX_ATTEMPTS - 1:
+            if r.ok:
+                limiter.success()
+            return r
+
+        r.close()
+        if r.status_code == 429:
+            limiter.throttle(_retry_after(r))
+        else:
+            limiter.error()
+            _backoff(attempt)
+
+    raise AssertionError("unreachable")
+
+
+def get(url: str, **kwargs: Any) -> requests.Response:
+    """Send GET request, see `request`."""
+    return request("GET", url, **kwargs)
+
+
+def download(url: str, filename: Union[str, Path], **kwargs: Any) -> None:
+    """Download file from URL. It's written to a temporary file first, so that the file is never incomplete."""
+    filename = Path(filename)
+    with get(url, stream=True, **kwargs) as r:
+        r.raise_for_status()
+        fd, tmp_filename = tempfile.mkstemp(dir=filename.parent, prefix=f".{filename.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in r.iter_content(chunk_size=2**20):
+                    f.write(chunk)
+            os.replace(tmp_filename, filename)
+        except BaseException:
+            os.unlink(tmp_filename)
+            raise
+
+
+def _backoff(attempt: int) -> None:
+    time.sleep(min(2**attempt, 30) * random.uniform(0.5, 1.0))
+
+
+def _retry_after(r: requests.Response) -> Optional[float]:
+    """Return number of seconds from Retry-After header, if there is any."""
+    value = r.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
@@ -6,11 +6,12 @@
 
 import dataclasses
 import datetime as dt
+import functools
 import json
 import re
 from dataclasses import dataclass, field, fields, is_dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Literal, NewType, Optional, Type, TypeVar, Union
+from typing import Any, Dict, Iterable, List, Literal, NewType, Optional, Tuple, Type, TypeVar, Union
 
 import mistune
 import pandas as pd
@@ -30,10 +31,48 @@ YearDateLatest = NewType("YearDateLatest", str)
 T = TypeVar("T")
 
 
+# Field values that can't be changed in place. Their hash can be cached until the attribute is set again.
+_IMMUTABLE_TYPES = (str, int, float, bool, type(None), dt.date)
+
+
 class MetaBase:
+    def __setattr__(self, name: str, value: Any) -> None:
+        # invalidate cached digest
+        self.__dict__.pop("_digest", None)
+        object.__setattr__(self, name, value)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # hashes of strings differ between processes, don't pickle the digest
+        state = self.__dict__.copy()
+        state.pop("_digest", None)
+        return state
+
     def __hash__(self):
         """Hash that uniquely identifies an object (without needing frozen dataclass)."""
-        return _hash_any(self)
+        return hash(self._canonical_digest())
+
+    def _canonical_digest(self) -> Tuple[Any, ...]:
+        """Return digest of all fields. Hash of fields with immutable values is computed once and cached until any
+        attribute is set. Lists, dicts and nested objects can be changed in place, they are hashed on every call
+        (nested metadata objects use their own cached digests)."""
+        try:
+            immutable_hash, mutable_fields = self.__dict__["_digest"]
+        except KeyError:
+            immutable_values = []
+            mutable_fields = []
+            for name in _field_names(type(self)):
+                value = getattr(self, name)
+                if isinstance(value, _IMMUTABLE_TYPES):
+                    immutable_values.append((name, value))
+                else:
+                    mutable_fields.append(name)
+            immutable_hash = hash(tuple(immutable_values))
+            mutable_fields = tuple(mutable_fields)
+            self.__dict__["_digest"] = (immutable_hash, mutable_fields)
+
+        if not mutable_fields:
+            return (immutable_hash,)
+        return (immutable_hash, *[_hash_any(getattr(self, name)) for name in mutable_fields])
 
     def __eq__(self, other: Self) -> bool:
         if not isinstance(other, self.__class__):
@@ -454,10 +493,23 @@ def is_year_or_date(s: str) -> bool:
         return False
 
 
+def deduplicate(objects: Iterable[T]) -> List[T]:
+    """Return unique metadata objects (e.g. origins) in their original order. Objects are compared by their
+    digests, which is much faster than comparing them with each other."""
+    unique = {}
+    for obj in objects:
+        unique.setdefault(hash(obj), obj)
+    return list(unique.values())
+
+
 def _hash_any(x: Any) -> int:
     """Return unique hash for an arbitrary object. This is useful if you can't make your dataclasses
     frozen but still want to use operations such as `set` or `unique`."""
-    if is_dataclass(x):
+    if isinstance(x, _IMMUTABLE_TYPES):
+        return hash(x)
+    elif isinstance(x, MetaBase):
+        return hash(x)
+    elif is_dataclass(x):
         return hash(tuple([(f.name, _hash_any(getattr(x, f.name))) for f in fields(x)]))
     elif isinstance(x, list):
         return hash(tuple([_hash_any(y) for y in x]))
@@ -467,20 +519,41 @@ def _hash_any(x: Any) -> int:
         return hash(x)
 
 
+@functools.lru_cache(maxsize=None)
+def _field_names(cls: type) -> Tuple[str, ...]:
+    return tuple(f.name for f in fields(cls))
+
+
+@functools.lru_cache(maxsize=None)
+def _is_immutable_dataclass(cls: type) -> bool:
+    return is_dataclass(cls) and cls.__dataclass_params__.frozen  # type: ignore
+
+
+def _is_mutable_dataclass(x: Any) -> bool:
+    return is_dataclass(x) and not _is_immutable_dataclass(type(x))
+
+
 def _deepcopy_dataclass(dc) -> Any:
     """Create a deep copy of a dataclass. This is much faster than running copy.deepcopy."""
-    dc = dataclasses.replace(dc)
+    # Copy attributes directly instead of calling __init__. Copy is equal to the original, so the cached
+    # digest of MetaBase objects is kept.
+    new_dc = object.__new__(type(dc))
+    new_dc.__dict__.update(dc.__dict__)
+    dc = new_dc
     for k, v in dc.__dict__.items():
-        if is_dataclass(v):
-            setattr(dc, k, _deepcopy_dataclass(v))
+        if isinstance(v, _IMMUTABLE_TYPES) or _is_immutable_dataclass(type(v)):
+            pass
+        elif is_dataclass(v):
+            dc.__dict__[k] = _deepcopy_dataclass(v)
+        elif isinstance(v, ProcessingLog):
+            # entries are immutable and shared between copies
+            dc.__dict__[k] = v.copy()
         elif isinstance(v, list):
-            lis = [_deepcopy_dataclass(x) if is_dataclass(x) else x for x in v]
+            lis = [_deepcopy_dataclass(x) if _is_mutable_dataclass(x) else x for x in v]
             # make sure to preserve the type of the list if we subclass it
             if type(v) != list:  # noqa
                 lis = type(v)(lis)
-            setattr(dc, k, lis)
+            dc.__dict__[k] = lis
         elif isinstance(v, dict):
-            setattr(dc, k, {x: _deepcopy_dataclass(y) if is_dataclass(y) else y for x, y in v.items()})
-        else:
-            pass
+            dc.__dict__[k] = {x: _deepcopy_dataclass(y) if _is_mutable_dataclass(y) else y for x, y in v.items()}
     return dc
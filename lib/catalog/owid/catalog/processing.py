@@ -18,6 +18,7 @@ from .tables import (
     read_from_records,
     read_fwf,
     read_json,
+    read_parquet,
     read_rda,
     read_rds,
     read_stata,
@@ -38,6 +39,7 @@ __all__ = [
     "read_from_dict",
     "read_from_records",
     "read_json",
+    "read_parquet",
     "read_fwf",
     "read_stata",
     "read_rda",
@@ -6,38 +6,52 @@ from contextlib import contextmanager
 from dataclasses import dataclass, field
 from functools import wraps
 from pathlib import Path
-from typing import Any, Dict, List, Literal, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Literal, Optional, Sequence, Tuple, Union, overload
 
 from dataclasses_json import dataclass_json
 
 from .utils import pruned_json
 
 
-def enabled() -> bool:
-    """Is processing log enabled? The env can be changing during the execution of the program."""
-    # Environment variable such that, if True, the processing log will be updated, if False, the log will always be empty.
-    # If not defined, assume False.
+def _enabled_in_env() -> bool:
     return os.getenv("PROCESSING_LOG", "") in ("True", "true", "1")
 
 
+# Processing log is updated only if environment variable PROCESSING_LOG is True when the module is imported. It's a
+# module attribute (rather than reading the env on every call) because it's checked in every operation on tables.
+_ENABLED = _enabled_in_env()
+
+
+def enabled() -> bool:
+    """Is processing log enabled?"""
+    return _ENABLED
+
+
+def set_enabled(value: bool) -> None:
+    """Enable or disable processing log. Environment variable is updated too for subprocesses."""
+    global _ENABLED
+    _ENABLED = value
+    os.environ["PROCESSING_LOG"] = "1" if value else "0"
+
+
 @contextmanager
 def disable_processing_log():
-    original_value = os.environ.get("PROCESSING_LOG", "0")
-    os.environ["PROCESSING_LOG"] = "0"
+    original_value = _ENABLED
+    set_enabled(False)
     try:
         yield
     finally:
-        os.environ["PROCESSING_LOG"] = original_value
+        set_enabled(original_value)
 
 
 @contextmanager
 def enable_processing_log():
-    original_value = os.environ.get("PROCESSING_LOG", "0")
-    os.environ["PROCESSING_LOG"] = "1"
+    original_value = _ENABLED
+    set_enabled(True)
     try:
         yield
     finally:
-        os.environ["PROCESSING_LOG"] = original_value
+        set_enabled(original_value)
 
 
 @pruned_json
@@ -64,18 +78,114 @@ class LogEntry:
         return LogEntry.from_dict(d)
 
 
-class ProcessingLog(List[LogEntry]):
+class _Node:
+    """Immutable node of processing log. Node points to its parent nodes, whose entries come before its own entry (if
+    any). Logs with common history share their nodes instead of copying entries."""
+
+    __slots__ = ("parents", "entry", "length")
+
+    def __init__(self, parents: Tuple["_Node", ...], entry: Optional[LogEntry]) -> None:
+        self.parents = parents
+        self.entry = entry
+        self.length = sum(p.length for p in parents) + (entry is not None)
+
+    def entries(self) -> Iterator[LogEntry]:
+        # walk the graph iteratively, logs can be deeper than the recursion limit
+        stack: List[Union[_Node, LogEntry]] = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, LogEntry):
+                yield item
+                continue
+            if item.entry is not None:
+                stack.append(item.entry)
+            stack.extend(reversed(item.parents))
+
+    def last(self) -> Optional[LogEntry]:
+        node: Optional[_Node] = self
+        while node is not None:
+            if node.entry is not None:
+                return node.entry
+            node = next((p for p in reversed(node.parents) if p.length > 0), None)
+        return None
+
+
+class ProcessingLog(Sequence[LogEntry]):
+    """Append-only log of operations. Copying, appending and concatenating logs is O(1), because logs share their
+    history (see `_Node`) and only the pointer to the latest node is replaced."""
+
     # hack for dataclasses_json
     __args__ = (LogEntry,)
 
+    __slots__ = ("_head",)
+
+    def __init__(self, entries: Iterable[LogEntry] = ()) -> None:
+        self._head: Optional[_Node] = None
+        for entry in entries:
+            self.append(entry)
+
+    @classmethod
+    def concat(cls, logs: Iterable["ProcessingLog"]) -> "ProcessingLog":
+        """Return log with entries of all logs one after another."""
+        heads = tuple(log._head for log in logs if log._head is not None)
+        pl = cls()
+        if len(heads) == 1:
+            pl._head = heads[0]
+        elif heads:
+            pl._head = _Node(heads, None)
+        return pl
+
+    def copy(self) -> "ProcessingLog":
+        pl = ProcessingLog()
+        pl._head = self._head
+        return pl
+
+    def append(self, entry: LogEntry) -> None:
+        self._head = _Node((self._head,) if self._head is not None else (), entry)
+
+    def __iter__(self) -> Iterator[LogEntry]:
+        return self._head.entries() if self._head is not None else iter(())
+
+    def __len__(self) -> int:
+        return self._head.length if self._head is not None else 0
+
+    @overload
+    def __getitem__(self, i: int) -> LogEntry:
+        ...
+
+    @overload
+    def __getitem__(self, i: slice) -> List[LogEntry]:
+        ...
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[LogEntry, List[LogEntry]]:
+        if i == -1 and self._head is not None:
+            return self._head.last()  # type: ignore
+        return list(self)[i]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, ProcessingLog):
+            return self._head is other._head or list(self) == list(other)
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def __repr__(self) -> str:
+        return f"ProcessingLog({list(self)!r})"
+
+    def __reduce__(self):
+        return (ProcessingLog, (list(self),))
+
     # NOTE: calling this method `as_dict` is intentional, otherwise it gets called
     # by dataclass_json
     def as_dict(self) -> List[Dict[str, Any]]:
         return [r.to_dict() for r in self]
 
     def clear(self) -> "ProcessingLog":
-        if enabled():
-            super().clear()
+        if _ENABLED:
+            self._head = None
         return self
 
     def _parse_parents(self, parents: List[Any]) -> List[str]:
@@ -120,7 +230,7 @@ class ProcessingLog(List[LogEntry]):
         target: Optional[str] = None,
         comment: Optional[str] = None,
     ) -> None:
-        if not enabled():
+        if not _ENABLED:
             # Avoid any processing
             return
 
@@ -139,8 +249,8 @@ class ProcessingLog(List[LogEntry]):
             variable=variable, parents=tuple(new_parents), operation=operation, target=target, comment=comment
         )
 
-        # TODO: can this duplication happen?
-        if entry in self:
+        # TODO: can this duplication happen? (only the latest entry is checked, checking all of them is O(n))
+        if len(self) > 0 and self[-1] == entry:
             raise NotImplementedError("Fixme")
 
         self.append(entry)
@@ -151,11 +261,11 @@ class ProcessingLog(List[LogEntry]):
         comment: Optional[str] = None,
     ) -> None:
         """Amend last entry in the log."""
-        if not enabled():
+        if not _ENABLED:
             # Avoid any processing
             return
 
-        if len(self) == 0:
+        if self._head is None:
             raise ValueError("Cannot amend empty processing log.")
 
         kwargs = {}
@@ -164,7 +274,14 @@ class ProcessingLog(List[LogEntry]):
         if comment:
             kwargs["comment"] = comment
 
-        self[-1] = self[-1].clone(**kwargs)
+        head = self._head
+        if head.entry is not None:
+            self._head = _Node(head.parents, head.entry.clone(**kwargs))
+        else:
+            # latest entry comes from a concatenated log, rebuild the log
+            entries = list(self)
+            entries[-1] = entries[-1].clone(**kwargs)
+            self._head = ProcessingLog(entries)._head
 
     def display(
         self,
@@ -255,7 +372,7 @@ def wrap(operation: str, parents: List[str] = []):
                 for col in tb.columns:
                     # if column is in the input table, use its processing log
                     if col in input_table.columns:
-                        tb[col].m.processing_log = input_table[col].m.processing_log
+                        tb[col].m.processing_log = input_table[col].m.processing_log.copy()
                         tb[col].m.processing_log.add_entry(col, parents=[input_table[col]], operation=operation)
                     # if column is not there, use `parents` columns
                     else:
@@ -331,13 +448,13 @@ def _add_upstream_channels(data_dir: Path, pl: ProcessingLog) -> ProcessingLog:
     from owid.catalog import Dataset
 
     # reverse processing log to traverse backwards
-    pl = ProcessingLog(pl[::-1])
+    queue = pl[::-1]
     new_pl = []
 
     seen_parents_variables = set()
 
-    while pl:
-        r = pl.pop(0)
+    while queue:
+        r = queue.pop(0)
         new_pl.append(r)
 
         # load upstream channels
@@ -359,7 +476,7 @@ def _add_upstream_channels(data_dir: Path, pl: ProcessingLog) -> ProcessingLog:
             upstream_pl = tab[r.variable].m.processing_log
 
             # add reverted log to the queue
-            pl = pl + upstream_pl[::-1]
+            queue = queue + upstream_pl[::-1]
             seen_parents_variables.add((parent, r.variable))
 
     return ProcessingLog(new_pl[::-1])
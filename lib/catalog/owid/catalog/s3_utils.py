@@ -132,6 +132,9 @@ def _read_owid_rclone_config() -> Dict[str, str]:
 def connect_r2() -> BaseClient:
     "Return a connection to Cloudflare's R2."
     import boto3
+    from botocore.config import Config
+
+    from .http_utils import MAX_ATTEMPTS, MAX_CONNECTIONS_PER_HOST
 
     # first, get the R2 credentials from dotenv
     R2_ACCESS_KEY = env.get("R2_ACCESS_KEY")
@@ -156,6 +159,11 @@ def connect_r2() -> BaseClient:
         aws_secret_access_key=R2_SECRET_KEY,
         endpoint_url=R2_ENDPOINT or "https://078fcdfed9955087315dd86792e71a7e.r2.cloudflarestorage.com",
         region_name=R2_REGION_NAME or "auto",
+        # share limits with HTTP requests, adaptive mode also slows down the client when R2 throttles us
+        config=Config(
+            max_pool_connections=MAX_CONNECTIONS_PER_HOST,
+            retries={"max_attempts": MAX_ATTEMPTS, "mode": "adaptive"},
+        ),
     )
 
     return client
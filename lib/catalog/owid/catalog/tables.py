@@ -27,11 +27,15 @@ from typing import (
 import numpy as np
 import pandas as pd
 import pyarrow
+import pyarrow.compute as pc
+import pyarrow.dataset as pds
+import pyarrow.feather as feather
 import pyarrow.parquet as pq
 import rdata
 import structlog
 from pandas._typing import FilePath, ReadCsvBuffer, Scalar  # type: ignore
 from pandas.core.series import Series
+from pyarrow.fs import LocalFileSystem
 
 from owid.datautils import dataframes
 from owid.repack import repack_frame
@@ -46,8 +50,9 @@ from .meta import (
     Source,
     TableMeta,
     VariableMeta,
+    deduplicate,
 )
-from .utils import underscore
+from .utils import HashingFileWriter, underscore
 from .variables import Variable
 
 log = structlog.get_logger()
@@ -61,6 +66,10 @@ AnyStr = TypeVar("AnyStr", str, bytes)
 # pd.Series or Variable
 SeriesOrVariable = TypeVar("SeriesOrVariable", pd.Series, Variable)
 
+# Row filters for reading tables, either pyarrow expression or list of tuples such as
+# `[("country", "in", ["France", "Germany"]), ("year", ">=", 2000)]`, see `pyarrow.parquet.read_table`
+Filters = Union[pc.Expression, List[Tuple[str, str, Any]], List[List[Tuple[str, str, Any]]]]
+
 
 class Table(pd.DataFrame):
     # metdata about the entire table
@@ -143,9 +152,10 @@ class Table(pd.DataFrame):
     def primary_key(self) -> List[str]:
         return [n for n in self.index.names if n]
 
-    def to(self, path: Union[str, Path], repack: bool = True) -> None:
+    def to(self, path: Union[str, Path], repack: bool = True) -> Dict[str, str]:
         """
-        Save this table in one of our SUPPORTED_FORMATS.
+        Save this table in one of our SUPPORTED_FORMATS. Return MD5 checksums of written files
+        by their file names.
         """
         # Add entry in the processing log about operation "save".
         self = update_processing_logs_when_saving_table(table=self, path=path)
@@ -168,6 +178,12 @@ class Table(pd.DataFrame):
 
     @classmethod
     def read(cls, path: Union[str, Path], **kwargs) -> "Table":
+        """Read the table from csv, feather or parquet file plus accompanying JSON sidecar.
+
+        :param primary_key: Set these columns as index instead of the primary key from metadata.
+        :param columns: Only read these columns (and primary key).
+        :param filters: Only read rows matching these filters, not supported for csv.
+        """
         if isinstance(path, Path):
             path = path.as_posix()
 
@@ -191,11 +207,11 @@ class Table(pd.DataFrame):
         return table
 
     # Mypy complaints about this not matching the defintiion of NDFrame.to_csv but I don't understand why
-    def to_csv(self, path: Any, **kwargs: Any) -> None:  # type: ignore
+    def to_csv(self, path: Any, **kwargs: Any) -> Dict[str, str]:  # type: ignore
         """
         Save this table as a csv file plus accompanying JSON metadata file.
         If the table is stored at "mytable.csv", the metadata will be at
-        "mytable.meta.json".
+        "mytable.meta.json". Return MD5 checksums of written files by their file names.
         """
         if not str(path).endswith(".csv"):
             raise ValueError(f'filename must end in ".csv": {path}')
@@ -205,10 +221,14 @@ class Table(pd.DataFrame):
             # if the dataframe uses the default index then we don't want to store it (would be a column of row numbers)
             # NOTE: By default pandas does store the index, and users often explicitly add "index=False".
             kwargs["index"] = self.primary_key != []
-        df.to_csv(path, **kwargs)
+        with HashingFileWriter(path) as ostream:
+            df.to_csv(ostream, **kwargs)
 
         metadata_filename = splitext(path)[0] + ".meta.json"
-        self._save_metadata(metadata_filename)
+        return {
+            Path(path).name: ostream.hexdigest(),
+            Path(metadata_filename).name: self._save_metadata(metadata_filename),
+        }
 
     def to_feather(
         self,
@@ -216,11 +236,11 @@ class Table(pd.DataFrame):
         repack: bool = True,
         compression: Literal["zstd", "lz4", "uncompressed"] = "zstd",
         **kwargs: Any,
-    ) -> None:
+    ) -> Dict[str, str]:
         """
         Save this table as a feather file plus accompanying JSON metadata file.
         If the table is stored at "mytable.feather", the metadata will be at
-        "mytable.meta.json".
+        "mytable.meta.json". Return MD5 checksums of written files by their file names.
         """
         if not str(path).endswith(".feather"):
             raise ValueError(f'filename must end in ".feather": {path}')
@@ -238,16 +258,21 @@ class Table(pd.DataFrame):
             # NOTE: this can be slow for large dataframes
             df = repack_frame(df)
 
-        df.to_feather(path, compression=compression, **kwargs)
+        with HashingFileWriter(path) as ostream:
+            df.to_feather(ostream, compression=compression, **kwargs)
 
-        self._save_metadata(self.metadata_filename(path))
+        return {
+            Path(path).name: ostream.hexdigest(),
+            Path(self.metadata_filename(path)).name: self._save_metadata(self.metadata_filename(path)),
+        }
 
     def metadata_filename(self, path: str):
         return splitext(path)[0] + ".meta.json"
 
-    def to_parquet(self, path: Any, repack: bool = True) -> None:  # type: ignore
+    def to_parquet(self, path: Any, repack: bool = True) -> Dict[str, str]:  # type: ignore
         """
-        Save this table as a parquet file with embedded metadata in the table schema.
+        Save this table as a parquet file with embedded metadata in the table schema. Return MD5
+        checksums of written files by their file names.
 
         NOTE: we save the metadata for fields in the table scheme, but it might be
               possible with Parquet to store it in the fields themselves somehow
@@ -281,20 +306,31 @@ class Table(pd.DataFrame):
         # t = t.cast(schema)
 
         # write the combined table to disk
-        pq.write_table(t, path)
-
-        self._save_metadata(self.metadata_filename(path))
-
-    def _save_metadata(self, filename: str) -> None:
-        # write metadata
-        with open(filename, "w") as ostream:
-            metadata = self.metadata.to_dict()  # type: ignore
-            metadata["primary_key"] = self.primary_key
-            metadata["fields"] = self._get_fields_as_dict()
-            json.dump(metadata, ostream, indent=2, default=str)
+        with HashingFileWriter(path) as ostream:
+            pq.write_table(t, ostream)
+
+        return {
+            Path(path).name: ostream.hexdigest(),
+            Path(self.metadata_filename(path)).name: self._save_metadata(self.metadata_filename(path)),
+        }
+
+    def _save_metadata(self, filename: str) -> str:
+        """Write metadata to JSON file and return its MD5 checksum."""
+        metadata = self.metadata.to_dict()  # type: ignore
+        metadata["primary_key"] = self.primary_key
+        metadata["fields"] = self._get_fields_as_dict()
+        with HashingFileWriter(filename) as ostream:
+            ostream.write(json.dumps(metadata, indent=2, default=str).encode())
+        return ostream.hexdigest()
 
     @classmethod
-    def read_csv(cls, path: Union[str, Path], **kwargs) -> "Table":
+    def read_csv(
+        cls,
+        path: Union[str, Path],
+        primary_key: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,
+        filters: Optional[Filters] = None,
+    ) -> "Table":
         """
         Read the table from csv plus accompanying JSON sidecar.
         """
@@ -304,9 +340,29 @@ class Table(pd.DataFrame):
         if not path.endswith(".csv"):
             raise ValueError(f'filename must end in ".csv": {path}')
 
+        if filters is not None:
+            raise NotImplementedError("Filters are only supported for feather and parquet files")
+
+        metadata = cls._read_metadata(path)
+        if primary_key is None:
+            primary_key = metadata.get("primary_key", [])
+
         # load the data and add metadata
-        df = Table(pd.read_csv(path, index_col=False, na_values=[""], keep_default_na=False))
-        cls._add_metadata(df, path, **kwargs)
+        df = Table(
+            pd.read_csv(
+                path,
+                index_col=False,
+                na_values=[""],
+                keep_default_na=False,
+                usecols=_columns_to_read(metadata, primary_key, columns),
+            )
+        )
+        cls._set_metadata_from_dict(df, metadata, columns=columns and list(df.columns))
+
+        # NOTE: setting index is really slow for large datasets
+        if primary_key:
+            df.set_index(primary_key, inplace=True)
+
         return df
 
     def update_metadata(self, **kwargs) -> "Table":
@@ -316,24 +372,25 @@ class Table(pd.DataFrame):
             setattr(self.metadata, k, v)
         return self
 
-    @classmethod
-    def _add_metadata(cls, df: pd.DataFrame, path: str, primary_key: Optional[list[str]] = None) -> None:
-        """Read metadata from JSON sidecar and add it to the dataframe."""
-        metadata = cls._read_metadata(path)
-
-        if primary_key is None:
-            primary_key = metadata.get("primary_key", [])
+    @staticmethod
+    def _set_metadata_from_dict(df: "Table", metadata: Dict[str, Any], columns: Optional[List[str]] = None) -> None:
+        """Set metadata from JSON sidecar to the dataframe. If `columns` is given, only load metadata of these
+        columns and the primary key."""
         fields = metadata.pop("fields") if "fields" in metadata else {}
+        if columns is not None:
+            fields = {k: v for k, v in fields.items() if k in columns or k in metadata.get("primary_key", [])}
 
         df.metadata = TableMeta.from_dict(metadata)
         df._set_fields_from_dict(fields)
 
-        # NOTE: setting index is really slow for large datasets
-        if primary_key:
-            df.set_index(primary_key, inplace=True)
-
     @classmethod
-    def read_feather(cls, path: Union[str, Path], **kwargs) -> "Table":
+    def read_feather(
+        cls,
+        path: Union[str, Path],
+        primary_key: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,
+        filters: Optional[Filters] = None,
+    ) -> "Table":
         """
         Read the table from feather plus accompanying JSON sidecar.
 
@@ -345,13 +402,16 @@ class Table(pd.DataFrame):
         if not path.endswith(".feather"):
             raise ValueError(f'filename must end in ".feather": {path}')
 
-        # load the data and add metadata
-        df = Table(pd.read_feather(path))
-        cls._add_metadata(df, path, **kwargs)
-        return df
+        return cls._read_arrow(path, "feather", primary_key=primary_key, columns=columns, filters=filters)
 
     @classmethod
-    def read_parquet(cls, path: Union[str, Path], **kwargs) -> "Table":
+    def read_parquet(
+        cls,
+        path: Union[str, Path],
+        primary_key: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,
+        filters: Optional[Filters] = None,
+    ) -> "Table":
         """
         Read the table from a parquet file plus accompanying JSON sidecar.
 
@@ -363,9 +423,27 @@ class Table(pd.DataFrame):
         if not path.endswith(".parquet"):
             raise ValueError(f'filename must end in ".parquet": {path}')
 
+        return cls._read_arrow(path, "parquet", primary_key=primary_key, columns=columns, filters=filters)
+
+    @classmethod
+    def _read_arrow(
+        cls,
+        path: str,
+        format: Literal["feather", "parquet"],
+        primary_key: Optional[List[str]],
+        columns: Optional[List[str]],
+        filters: Optional[Filters],
+    ) -> "Table":
+        metadata = cls._read_metadata(path)
+        if primary_key is None:
+            primary_key = metadata.get("primary_key", [])
+
+        # load only selected columns and rows
+        t = _read_arrow_table(path, format, columns=_columns_to_read(metadata, primary_key, columns), filters=filters)
+
         # load the data and add metadata
-        df = Table(pd.read_parquet(path))
-        cls._add_metadata(df, path, **kwargs)
+        df = Table(_arrow_to_pandas(t, primary_key))
+        cls._set_metadata_from_dict(df, metadata, columns=columns and t.column_names)
         return df
 
     def _get_fields_as_dict(self) -> Dict[str, Any]:
@@ -376,12 +454,14 @@ class Table(pd.DataFrame):
 
     @staticmethod
     def _read_metadata(data_path: str) -> Dict[str, Any]:
-        import requests
-
         metadata_path = splitext(data_path)[0] + ".meta.json"
 
         if metadata_path.startswith("http"):
-            return cast(Dict[str, Any], requests.get(metadata_path).json())
+            from . import http_utils
+
+            resp = http_utils.get(metadata_path)
+            resp.raise_for_status()
+            return cast(Dict[str, Any], resp.json())
 
         with open(metadata_path, "r") as istream:
             return cast(Dict[str, Any], json.load(istream))
@@ -461,7 +541,7 @@ class Table(pd.DataFrame):
 
         for old_col, new_col in zip(old_cols, new_table.all_columns):
             # Update processing log.
-            if old_col != new_col:
+            if old_col != new_col and pl.enabled():
                 new_table._fields[new_col].processing_log.add_entry(
                     variable=new_col,
                     parents=[self._fields[old_col]],
@@ -817,6 +897,9 @@ class Table(pd.DataFrame):
         if tb is None:
             return None
         tb = tb.copy()
+        if not pl.enabled():
+            return cast("Table", tb)
+
         for column in list(tb.all_columns):
             tb._fields[column].processing_log.add_entry(
                 variable=column,
@@ -839,6 +922,9 @@ class Table(pd.DataFrame):
         variable_names: Optional[List[str]] = None,
         comment: Optional[str] = None,
     ) -> "Table":
+        if not pl.enabled():
+            return self
+
         # Append a new entry to the processing log of the required variables.
         if variable_names is None:
             # If no variable is specified, assume all (including index columns).
@@ -862,6 +948,9 @@ class Table(pd.DataFrame):
         operation: Optional[str] = None,
     ) -> "Table":
         """Amend operation or comment of the latest processing log entry."""
+        if not pl.enabled():
+            return self
+
         # Append a new entry to the processing log of the required variables.
         if variable_names is None:
             # If no variable is specified, assume all (including index columns).
@@ -876,6 +965,9 @@ class Table(pd.DataFrame):
 
     def sort_values(self, by: Union[str, List[str]], *args, **kwargs) -> "Table":
         tb = super().sort_values(by=by, *args, **kwargs).copy()
+        if not pl.enabled():
+            return cast("Table", tb)
+
         for column in list(tb.all_columns):
             if isinstance(by, str):
                 parents = [by, column]
@@ -914,6 +1006,9 @@ class Table(pd.DataFrame):
         # The following would have a parents only the scalar, not the scalar and the corresponding variable.
         # tb = update_log(table=tb, operation="+", parents=[other], variable_names=tb.columns)
         # Instead, update the processing log of each variable in the table.
+        if not pl.enabled():
+            return
+
         for column in tb.columns:
             if isinstance(other, pd.DataFrame):
                 parents = [tb[column], other[column]]
@@ -1598,6 +1693,49 @@ def pivot(
     return table
 
 
+def _columns_to_read(
+    metadata: Dict[str, Any], primary_key: List[str], columns: Optional[List[str]]
+) -> Optional[List[str]]:
+    """Return columns to read from a file, primary key is always included. Return None for all columns."""
+    if columns is None:
+        return None
+    return list(dict.fromkeys(metadata.get("primary_key", []) + primary_key + columns))
+
+
+def _read_arrow_table(
+    path: str, format: Literal["feather", "parquet"], columns: Optional[List[str]], filters: Optional[Filters]
+) -> pyarrow.Table:
+    """Read feather or parquet file into pyarrow table. Only selected columns are read and filters are
+    pushed down to the reader. Local files are memory-mapped, which makes reading of uncompressed files
+    almost free."""
+    if path.startswith("http"):
+        from . import http_utils
+
+        resp = http_utils.get(path)
+        resp.raise_for_status()
+        buf = pyarrow.BufferReader(resp.content)
+        dataset = pds.dataset(feather.read_table(buf) if format == "feather" else pq.read_table(buf))
+    else:
+        dataset = pds.dataset(path, format=format, filesystem=LocalFileSystem(use_mmap=True))
+
+    if filters is not None and not isinstance(filters, pc.Expression):
+        filters = pq.filters_to_expression(filters)
+
+    return dataset.to_table(columns=columns, filter=filters)
+
+
+def _arrow_to_pandas(t: pyarrow.Table, primary_key: List[str]) -> pd.DataFrame:
+    """Convert pyarrow table to dataframe with primary key as index. This is much faster than `set_index`
+    on the dataframe, which copies all other columns."""
+    if not primary_key:
+        return t.to_pandas()
+
+    index = t.select(primary_key).to_pandas().set_index(primary_key).index
+    df = t.drop_columns(primary_key).to_pandas()
+    df.index = index
+    return df
+
+
 def _add_table_and_variables_metadata_to_table(
     table: Table, metadata: Optional[TableMeta], origin: Optional[Origin]
 ) -> Table:
@@ -1653,6 +1791,19 @@ def read_feather(
     return cast(Table, table)
 
 
+def read_parquet(
+    filepath: Union[str, Path, IO[AnyStr]],
+    metadata: Optional[TableMeta] = None,
+    origin: Optional[Origin] = None,
+    underscore: bool = False,
+    *args,
+    **kwargs,
+) -> Table:
+    table = Table(pd.read_parquet(filepath, *args, **kwargs), underscore=underscore)
+    table = _add_table_and_variables_metadata_to_table(table=table, metadata=metadata, origin=origin)
+    return cast(Table, table)
+
+
 def read_excel(
     io: Union[str, Path],
     *args,
@@ -1789,6 +1940,9 @@ class ExcelFile(pd.ExcelFile):
 
 
 def update_processing_logs_when_loading_or_creating_table(table: Table) -> Table:
+    if not pl.enabled():
+        return table
+
     # Add entry to processing log, specifying that each variable was loaded from this table.
     try:
         # If the table comes from an ETL dataset, generate a URI for the table.
@@ -1802,12 +1956,12 @@ def update_processing_logs_when_loading_or_creating_table(table: Table) -> Table
 
     # Add log entries to all columns
     for column in list(table.all_columns):
-        pl = table._fields[column].processing_log
+        log = table._fields[column].processing_log
 
         # Clear processing log, we're not keeping log from previous channels. It can always be reconstructed
         # by concatenating processing log of indicators accross channels.
-        pl.clear()
-        pl.add_entry(
+        log.clear()
+        log.add_entry(
             variable=column,
             parents=parents,
             operation=operation,
@@ -1817,6 +1971,9 @@ def update_processing_logs_when_loading_or_creating_table(table: Table) -> Table
 
 
 def update_processing_logs_when_saving_table(table: Table, path: Union[str, Path]) -> Table:
+    if not pl.enabled():
+        return table
+
     # Infer the ETL uri from the path where the table will be saved.
     # Note: If the path does not fit the expected format, the result will be an arbitrary path, but it will not raise an
     # error, as long as path is a Path.
@@ -1856,22 +2013,16 @@ def copy_metadata(from_table: Table, to_table: Table, deep=False) -> Table:
 
 def get_unique_sources_from_tables(tables: List[Table]) -> List[Source]:
     # Make a list of all sources of all variables in all tables.
-    sources = []
-    for table in tables:
-        for column in list(table.all_columns):
-            # Get unique array of tuples of source fields (respecting the order).
-            sources += [source for source in table._fields[column].sources if source not in sources]
-    return sources
+    return deduplicate(
+        source for table in tables for column in list(table.all_columns) for source in table._fields[column].sources
+    )
 
 
 def get_unique_licenses_from_tables(tables: List[Table]) -> List[License]:
     # Make a list of all licenses of all variables in all tables.
-    licenses = []
-    for table in tables:
-        for column in list(table.all_columns):
-            # Get unique array of tuples of source fields (respecting the order).
-            licenses += [license for license in table._fields[column].licenses if license not in licenses]
-    return licenses
+    return deduplicate(
+        license for table in tables for column in list(table.all_columns) for license in table._fields[column].licenses
+    )
 
 
 def _get_metadata_value_from_tables_if_all_identical(tables: List[Table], field: str) -> Optional[Any]:
@@ -1,4 +1,6 @@
 import datetime as dt
+import hashlib
+import io
 import re
 from pathlib import Path
 from typing import Any, Optional, TypeVar, Union, overload
@@ -200,3 +202,39 @@ def dynamic_yaml_to_dict(yd: Any) -> dict:
     """Convert dynamic yaml to dict. Using dynamic yaml can cause problems when you
     try to run e.g. Origin(**yd). It's safer to run Origin(**dynamic_yaml_to_dict(yd)) instead."""
     return yaml.safe_load(dynamic_yaml.dump(yd))
+
+
+class _HashingFileIO(io.FileIO):
+    """Raw file opened for writing that updates MD5 checksum with every write."""
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        super().__init__(path, "wb")
+        self.md5 = hashlib.md5()
+
+    def write(self, b: Any) -> int:
+        n = super().write(b)
+        self.md5.update(memoryview(b).cast("B")[:n])
+        return n
+
+    def seekable(self) -> bool:
+        # seeking back would make the checksum invalid
+        return False
+
+
+class HashingFileWriter(io.BufferedWriter):
+    """Binary file writer that computes MD5 checksum of the file while it is being written, so that
+    we don't have to read the file again to get its checksum.
+
+    Usage:
+
+        with HashingFileWriter(path) as f:
+            df.to_feather(f)
+        md5 = f.hexdigest()
+    """
+
+    def __init__(self, path: Union[str, Path], buffer_size: int = 2**20) -> None:
+        super().__init__(_HashingFileIO(path), buffer_size=buffer_size)
+
+    def hexdigest(self) -> str:
+        """Return MD5 checksum of the written bytes, call it after the file is closed."""
+        return self.raw.md5.hexdigest()  # type: ignore
@@ -24,6 +24,7 @@ from .meta import (
     Source,
     VariableMeta,
     VariablePresentationMeta,
+    deduplicate,
 )
 from .properties import metadata_property
 
@@ -301,6 +302,9 @@ class Variable(pd.Series):
         variable: Optional[str] = None,
         comment: Optional[str] = None,
     ) -> "Variable":
+        if not pl.enabled():
+            return self
+
         if variable is None:
             # If a variable name is not specified, take it from the variable, or otherwise use UNNAMED_VARIABLE.
             variable = self.name or UNNAMED_VARIABLE
@@ -395,27 +399,17 @@ def _get_metadata_value_from_variables_if_all_identical(
 
 def get_unique_sources_from_variables(variables: List[Variable]) -> List[Source]:
     # Make a list of all sources of all variables.
-    sources = []
-    for variable in variables:
-        sources += [s for s in variable.metadata.sources if s not in sources]
-    return sources
+    return deduplicate(s for variable in variables for s in variable.metadata.sources)
 
 
 def get_unique_origins_from_variables(variables: List[Variable]) -> List[Origin]:
     # Make a list of all origins of all variables.
-    origins = []
-    for variable in variables:
-        # Get unique array of tuples of origin fields (respecting the order).
-        origins += [o for o in variable.metadata.origins if o not in origins]
-    return origins
+    return deduplicate(o for variable in variables for o in variable.metadata.origins)
 
 
 def get_unique_licenses_from_variables(variables: List[Variable]) -> List[License]:
     # Make a list of all licenses of all variables.
-    licenses = []
-    for variable in variables:
-        licenses += [license for license in variable.metadata.licenses if license not in licenses]
-    return licenses
+    return deduplicate(license for variable in variables for license in variable.metadata.licenses)
 
 
 def get_unique_description_key_points_from_variables(variables: List[Variable]) -> List[str]:
@@ -427,17 +421,11 @@ def get_unique_description_key_points_from_variables(variables: List[Variable])
 
 
 def combine_variables_processing_logs(variables: List[Variable]) -> ProcessingLog:
-    # Make a list with all entries in the processing log of all variables.
-    processing_log = sum(
-        [
-            variable.metadata.processing_log if variable.metadata.processing_log is not None else []
-            for variable in variables
-        ],
-        [],
+    # Concatenate processing logs of all variables (they share entries with the new log, nothing is copied).
+    return ProcessingLog.concat(
+        variable.metadata.processing_log for variable in variables if variable.metadata.processing_log is not None
     )
 
-    return ProcessingLog(processing_log)
-
 
 def _get_dict_from_list_if_all_identical(list_of_objects: List[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
     # The argument list_of_objects can contain dictionaries or None, or be empty.
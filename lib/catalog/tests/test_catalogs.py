@@ -2,6 +2,7 @@
 #  test_catalogs.py
 #
 
+import shutil
 import tempfile
 from contextlib import contextmanager
 from pathlib import Path
@@ -9,7 +10,7 @@ from typing import Iterable, Iterator, Optional
 
 import pytest  # noqa
 
-from owid.catalog import CHANNEL, LocalCatalog, RemoteCatalog, Table, find
+from owid.catalog import CHANNEL, LocalCatalog, RemoteCatalog, Table, catalogs, find
 
 from .test_datasets import create_temp_dataset
 
@@ -111,6 +112,63 @@ def test_reindex_with_include():
         )
 
 
+def test_reindex_reuses_unchanged_datasets(monkeypatch):
+    with mock_catalog(3, channels=("garden",)) as catalog:
+        old_frame = catalog.frame.copy()
+
+        indexed = []
+        original_index = catalogs.Dataset.index
+
+        def index(self, catalog_path):
+            indexed.append(Path(self.path).name)
+            return original_index(self, catalog_path)
+
+        monkeypatch.setattr(catalogs.Dataset, "index", index)
+
+        # nothing changed, nothing is indexed
+        catalog.reindex()
+        assert indexed == []
+        assert set(catalog.frame.checksum) == set(old_frame.checksum)
+        assert len(catalog.frame) == len(old_frame)
+
+        # only the modified dataset is indexed, deleted dataset is dropped
+        create_temp_dataset(catalog.path / "garden" / "dataset0")
+        shutil.rmtree(catalog.path / "garden" / "dataset2")
+        catalog.reindex()
+        assert indexed == ["dataset0"]
+        assert set(catalog.frame.dataset) == {"dataset0", "dataset1"}
+        assert set(catalog.frame[catalog.frame.dataset == "dataset0"].checksum) != set(
+            old_frame[old_frame.dataset == "dataset0"].checksum
+        )
+        assert set(catalog._read_state()) == {"garden/dataset0", "garden/dataset1"}
+
+        # index is the same as if created from scratch
+        fresh = LocalCatalog(catalog.path, channels=("garden",))
+        fresh.reindex()
+        assert set(fresh.frame.path) == set(catalog.frame.path)
+        assert set(fresh.frame.checksum) == set(catalog.frame.checksum)
+
+
+def test_find_matches_all_criteria():
+    with mock_catalog(3, channels=("garden",)) as catalog:
+        frame = catalog.frame
+        table = frame.table.iloc[0]
+        dataset = frame.dataset.iloc[-1]
+
+        matches = catalog.find(table=table[:3], dataset=dataset)
+        expected = frame[frame.table.str.contains(table[:3]) & (frame.dataset == dataset)]
+        assert list(matches.index) == list(expected.index)
+        assert "checksum" not in matches.columns
+
+        assert len(catalog.find()) == len(frame)
+        assert catalog.find(dataset="unknown").empty
+
+        # lookups are rebuilt after reindex
+        shutil.rmtree(catalog.path / "garden" / dataset)
+        catalog.reindex()
+        assert catalog.find(dataset=dataset).empty
+
+
 @contextmanager
 def mock_catalog(n: int = 3, channels: Iterable[CHANNEL] = ("garden",)) -> Iterator[LocalCatalog]:
     with tempfile.TemporaryDirectory() as dirname:
@@ -20,7 +20,7 @@ import pytest
 import yaml
 
 from owid.catalog import Dataset, DatasetMeta, Table
-from owid.catalog.datasets import NonUniqueIndex, PrimaryKeyMissing
+from owid.catalog.datasets import CHECKSUMS_FILE, NonUniqueIndex, PrimaryKeyMissing, checksum_file
 
 from .mocking import mock
 from .test_tables import mock_table
@@ -114,6 +114,22 @@ def test_add_table():
         assert t2.metadata.dataset == ds.metadata
 
 
+def test_read_table_with_columns_and_filters():
+    t = mock_table()
+    t["hdi"] = [0.9, 0.8, 0.7]
+
+    with temp_dataset_dir() as dirname:
+        ds = Dataset.create_empty(dirname)
+        ds.metadata = DatasetMeta(short_name="bob")
+        ds.add(t, repack=False)
+
+        t2 = ds.read_table(t.metadata.checked_name, columns=["hdi"], filters=[("gdp", ">=", 102)])
+        assert list(t2.columns) == ["country", "hdi"]
+        assert list(t2.country) == ["SE", "CH"]
+        assert t2.hdi.metadata == t.hdi.metadata
+        assert t2.metadata.dataset == ds.metadata
+
+
 @patch.dict(os.environ, {})
 def test_add_table_without_primary_key():
     t = mock_table().reset_index()
@@ -245,6 +261,50 @@ def test_dataset_hash_invariant_to_copying():
             assert d2.checksum() == d1.checksum()
 
 
+def test_dataset_checksum_uses_stored_file_checksums():
+    with mock_dataset() as d:
+        t = mock_table()
+        d.add(t, formats=["feather", "csv"])
+        d.save()
+
+        # checksums of all files are stored in .checksums.json
+        files = {Path(f).name for f in glob(join(d.path, "*")) if not f.endswith("index.json")}
+        assert set(d.file_checksums()) == files
+
+        with patch("owid.catalog.datasets.checksum_file", wraps=checksum_file) as mock_checksum_file:
+            checksum = d.checksum()
+            # only index.json had to be read
+            mock_checksum_file.assert_called_once_with(d._index_file)
+
+        assert checksum == d.checksum(verify=True)
+
+        # modifying a file outside of dataset invalidates its stored checksum
+        table_file = f"{t.metadata.short_name}.feather"
+        os.utime(join(d.path, table_file), ns=(0, 0))
+        assert table_file not in d.file_checksums()
+        assert d.checksum() == d.checksum(verify=True)
+
+
+def test_dataset_file_checksums_are_not_in_index_file():
+    with mock_dataset() as d:
+        with open(d._index_file) as istream:
+            index = istream.read()
+
+        t = mock_table()
+        d.add(t)
+
+        # index.json is only modified by `save`
+        with open(d._index_file) as istream:
+            assert istream.read() == index
+        assert f"{t.metadata.short_name}.feather" in Dataset(d.path).file_checksums()
+
+        # index.json only contains dataset metadata (it gets published), checksums are in a separate file
+        d.save()
+        with open(d._index_file) as istream:
+            DatasetMeta(**json.load(istream))
+        assert exists(join(d.path, CHECKSUMS_FILE))
+
+
 def test_snake_case_dataset():
     with mock_dataset() as d:
         # short_name of a dataset must be snake_case
@@ -0,0 +1,101 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, Tuple
+
+import pytest
+import requests
+
+from owid.catalog import http_utils
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # responses (status, headers, body) by path, popped one by one, the last one is repeated
+    responses: dict = {}
+
+    def do_GET(self):
+        responses = self.responses[self.path]
+        status, headers, body = responses.pop(0) if len(responses) > 1 else responses[0]
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch) -> Iterator[Tuple[str, dict]]:
+    monkeypatch.setattr(http_utils, "_backoff", lambda attempt: None)
+    monkeypatch.setattr(http_utils, "_LIMITERS", {})
+    responses: dict = {}
+    monkeypatch.setattr(_Handler, "responses", responses)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", responses
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_get_retries_throttled_and_failed_requests(server):
+    url, responses = server
+    responses["/x.json"] = [(429, {"Retry-After": "0"}, b""), (503, {}, b""), (200, {}, b'{"a": 1}')]
+
+    r = http_utils.get(url + "/x.json")
+    assert r.json() == {"a": 1}
+
+    (host_stats,) = http_utils.stats().values()
+    assert host_stats["requests"] == 3
+    assert host_stats["retries"] == 2
+    assert host_stats["throttled"] == 1
+    assert host_stats["errors"] == 1
+    # host without a known rate limit is limited once it starts throttling
+    assert host_stats["rate"] > http_utils.THROTTLED_RATE
+
+
+def test_get_returns_last_response(server):
+    url, responses = server
+    responses["/missing"] = [(404, {}, b"")]
+    responses["/broken"] = [(500, {}, b"")]
+
+    assert http_utils.get(url + "/missing").status_code == 404
+    r = http_utils.get(url + "/broken")
+    assert r.status_code == 500
+    assert http_utils.stats()[url.split("//")[1]]["requests"] == 1 + http_utils.MAX_ATTEMPTS
+
+
+def test_download(server, tmp_path):
+    url, responses = server
+    responses["/data.csv"] = [(503, {}, b""), (200, {}, b"a,b\n1,2\n")]
+    responses["/missing.csv"] = [(404, {}, b"")]
+
+    http_utils.download(url + "/data.csv", tmp_path / "data.csv")
+    assert (tmp_path / "data.csv").read_bytes() == b"a,b\n1,2\n"
+
+    with pytest.raises(requests.HTTPError):
+        http_utils.download(url + "/missing.csv", tmp_path / "missing.csv")
+    assert [p.name for p in tmp_path.iterdir()] == ["data.csv"]
+
+
+def test_rate_limiter_halves_and_recovers():
+    limiter = http_utils._RateLimiter(10.0)
+
+    limiter.throttle(retry_after=0)
+    limiter.throttle(retry_after=0)
+    assert limiter.stats.rate == 2.5
+
+    # recovers by one request per second for every second of successful requests
+    for _ in range(3):
+        limiter.success()
+    assert 3.4 < limiter.stats.rate < 3.6
+
+    for _ in range(1000):
+        limiter.success()
+    assert limiter.stats.rate == 10.0
+
+    for _ in range(20):
+        limiter.throttle(retry_after=0)
+    assert limiter.stats.rate == http_utils.MIN_RATE
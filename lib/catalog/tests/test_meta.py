@@ -2,6 +2,7 @@
 #  test_meta.py
 #
 
+import pickle
 from dataclasses import dataclass
 from typing import Any, Dict, Optional
 
@@ -123,3 +124,43 @@ def test_hash():
     var_c = meta.VariableMeta(display={"d": {"a": 1, "b": 2, "c": 3}})
     assert var_a == var_b
     assert var_a != var_c
+
+
+def test_hash_after_mutation():
+    origin_a = meta.Origin("a", "b", license=meta.License(name="CC BY 4.0"))
+    origin_b = meta.Origin("a", "b", license=meta.License(name="CC BY 4.0"))
+    assert origin_a == origin_b
+
+    origin_b.title = "c"
+    assert origin_a != origin_b
+    origin_b.title = "b"
+    assert origin_a == origin_b
+
+    # nested objects and lists are hashed again
+    origin_b.license.name = "CC BY 3.0"  # type: ignore
+    assert origin_a != origin_b
+
+    var_a = meta.VariableMeta(origins=[origin_a])
+    var_b = meta.VariableMeta(origins=[origin_a])
+    assert var_a == var_b
+    var_b.origins.append(origin_b)
+    assert var_a != var_b
+
+
+def test_copy_and_pickle_keep_hash():
+    var = meta.VariableMeta(title="a", origins=[meta.Origin("a", "b")], display={"unit": "%"})
+    hash(var)
+
+    var_copy = var.copy()
+    assert var_copy == var
+    assert var_copy.origins[0] is not var.origins[0]
+
+    unpickled = pickle.loads(pickle.dumps(var))
+    assert "_digest" not in unpickled.__dict__
+    assert unpickled == var
+
+
+def test_deduplicate():
+    origins = [meta.Origin("a", "b"), meta.Origin("a", "c"), meta.Origin("a", "b")]
+    assert meta.deduplicate(origins) == origins[:2]
+    assert meta.deduplicate(origins)[0] is origins[0]
@@ -1,3 +1,4 @@
+import pickle
 import random
 
 from owid.catalog import Table, Variable, VariableMeta
@@ -142,3 +143,44 @@ def test_preprocess_log_rename_after_add():
         )
     )
     assert out.as_dict() == [{"variable": "b", "parents": ["a", "b"], "operation": "+", "target": "b#234"}]
+
+
+def test_processing_log_shares_history():
+    log = ProcessingLog([LogEntry("a", "create", "a")])
+    copy = log.copy()
+    copy.append(LogEntry("a", "+", "a#1"))
+    assert len(log) == 1
+    assert len(copy) == 2
+    assert copy._head.parents == (log._head,)
+
+    combined = ProcessingLog.concat([log, copy])
+    assert [e.target for e in combined] == ["a", "a", "a#1"]
+    assert combined[-1].target == "a#1"
+    assert combined[::-1] == list(combined)[::-1]
+
+
+def test_processing_log_deep_history():
+    log = ProcessingLog(LogEntry("a", "+", f"a#{i}") for i in range(10_000))
+    assert len(log) == 10_000
+    assert log[0].target == "a#0"
+    assert pickle.loads(pickle.dumps(log)) == log
+
+
+@enable_pl
+def test_amend_concatenated_log():
+    log = ProcessingLog.concat(
+        [ProcessingLog([LogEntry("a", "create", "a")]), ProcessingLog([LogEntry("b", "create", "b")])]
+    )
+    log.amend_entry(comment="b from a")
+    assert log.as_dict() == [
+        {"variable": "a", "operation": "create", "target": "a"},
+        {"variable": "b", "operation": "create", "target": "b", "comment": "b from a"},
+    ]
+
+
+def test_disabled_processing_log():
+    with pl.disable_processing_log():
+        t = Table({"a": [1, 2], "b": [3, 4]})
+        t["c"] = t["a"] + t["b"]
+        t = (t + t).sort_values("a").dropna()
+    assert all(len(t[col].metadata.processing_log) == 0 for col in t.columns)
@@ -178,6 +178,53 @@ def test_round_trip_with_metadata(format: FileFormat) -> None:
         assert_tables_eq(t1, t2)
 
 
+@pytest.mark.parametrize("format", ["feather", "parquet"])
+def test_read_columns_and_filters(format: FileFormat) -> None:
+    t1 = Table(
+        {
+            "country": ["AU", "SE", "CH", "AU"],
+            "year": [2000, 2000, 2000, 2001],
+            "gdp": [100, 102, 104, 106],
+            "hdi": [0.9, 0.8, 0.7, 0.6],
+        }
+    ).set_index(["country", "year"])
+    t1.gdp.metadata.unit = "$"
+    t1.hdi.metadata.unit = "index"
+
+    with tempfile.TemporaryDirectory() as path:
+        filename = join(path, f"table.{format}")
+        t1.to(filename, repack=False)
+
+        # full read is the same as before
+        assert_tables_eq(t1, Table.read(filename))
+
+        t2 = Table.read(filename, columns=["gdp"], filters=[("country", "==", "AU")])
+        assert t2.primary_key == ["country", "year"]
+        assert list(t2.columns) == ["gdp"]
+        assert list(t2.index) == [("AU", 2000), ("AU", 2001)]
+        assert list(t2.gdp) == [100, 106]
+        assert t2.gdp.metadata.unit == "$"
+        # metadata of other columns is not loaded
+        assert "hdi" not in t2._fields
+
+        # filter on a column that is not read, without primary key
+        t3 = Table.read(filename, columns=["hdi"], filters=[("gdp", ">", 102)], primary_key=[])
+        assert t3.primary_key == []
+        assert list(t3.columns) == ["country", "year", "hdi"]
+        assert list(t3.hdi) == [0.7, 0.6]
+
+
+def test_read_csv_filters_not_supported() -> None:
+    t1 = Table({"gdp": [100, 102, 104], "country": ["AU", "SE", "CH"]})
+    with tempfile.TemporaryDirectory() as path:
+        filename = join(path, "table.csv")
+        t1.to(filename)
+
+        assert list(Table.read(filename, columns=["gdp"]).columns) == ["gdp"]
+        with pytest.raises(NotImplementedError):
+            Table.read(filename, filters=[("gdp", ">", 100)])
+
+
 def test_field_metadata_copied_between_tables():
     t1 = Table({"gdp": [100, 102, 104], "country": ["AU", "SE", "CH"]})
     t2 = Table({"hdi": [73, 92, 45], "country": ["AU", "SE", "CH"]})
@@ -1,8 +1,10 @@
+import hashlib
+
 import pandas as pd
 import pytest
 
 from owid.catalog import Origin, Table, VariableMeta, VariablePresentationMeta
-from owid.catalog.utils import underscore
+from owid.catalog.utils import HashingFileWriter, underscore
 
 
 def test_underscore():
@@ -149,3 +151,13 @@ def test_pruned_json():
         "origins": [{"producer": "Producer", "title": "Title"}],
         "presentation": {"title_public": "Title public"},
     }
+
+
+def test_hashing_file_writer(tmp_path):
+    path = tmp_path / "table.feather"
+    df = pd.DataFrame({"a": range(1000), "b": ["x"] * 1000})
+    with HashingFileWriter(path) as f:
+        df.to_feather(f)
+
+    assert f.hexdigest() == hashlib.md5(path.read_bytes()).hexdigest()
+    assert pd.read_feather(path).equals(df)
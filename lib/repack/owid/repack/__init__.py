@@ -1,14 +1,31 @@
 import datetime as dt
+import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional, cast
 
 import numpy as np
 import pandas as pd
 
+# repack columns in parallel threads for frames with at least this many values, numpy releases GIL
+# for most of the work, so this pays off for large frames
+PARALLEL_MIN_SIZE = 1_000_000
+
+# candidate integer types from the largest to the smallest, we don't bother with 64-bit types
+# and keep the original type if the values don't fit into 32 bits
+INT_TYPES = {
+    # (nullable, signed)
+    (False, True): ["int32", "int16", "int8"],
+    (False, False): ["uint32", "uint16", "uint8"],
+    (True, True): ["Int32", "Int16", "Int8"],
+    (True, False): ["UInt32", "UInt16", "UInt8"],
+}
+
 
 def repack_frame(
     df: pd.DataFrame,
     remap: Optional[Dict[str, str]] = None,
     dtypes: Optional[Dict[str, Any]] = {},
+    max_workers: Optional[int] = None,
 ) -> pd.DataFrame:
     """
     Convert the DataFrame's columns to the most compact types possible.
@@ -17,6 +34,8 @@ def repack_frame(
 
     :param remap: remap column names
     :param dtypes: dictionary of fixed dtypes to use
+    :param max_workers: number of threads repacking columns in parallel, by default use
+        all CPUs for large frames and a single thread otherwise
     """
     if df.index.names != [None]:
         raise ValueError("repacking is lost for index columns")
@@ -31,11 +50,17 @@ def repack_frame(
         primary_key = cast(List[str], df.index.names)
         df.reset_index(inplace=True)
 
+    if max_workers is None:
+        max_workers = min(len(df.columns), os.cpu_count() or 1) if df.size >= PARALLEL_MIN_SIZE else 1
+
     # repack each column into the best dtype we can give it
-    df = pd.concat(
-        [repack_series(df.loc[:, col]) if col not in dtypes else df[col] for col in df.columns],
-        axis=1,
-    )
+    columns = [df.iloc[:, i] for i in range(len(df.columns))]
+    if max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            repacked = list(executor.map(lambda s: repack_series(s) if s.name not in dtypes else s, columns))
+    else:
+        repacked = [repack_series(s) if s.name not in dtypes else s for s in columns]
+    df = pd.concat(repacked, axis=1)
 
     # use given dtypes
     if dtypes:
@@ -59,15 +84,43 @@ def repack_frame(
 
 
 def repack_series(s: pd.Series) -> pd.Series:
+    """Convert series to the most compact type possible.
+
+    Integers are shrunk to the smallest integer type, floats and objects are converted to integers if
+    all their values are integers, to float32 if it's close enough to the original values or to float64,
+    and strings and dates become categories. Everything is decided from a single conversion of the series
+    to float64, the series is then converted only once to the final type.
+    """
     if s.dtype.name in ("Int64", "int64", "UInt64", "uint64"):
         return shrink_integer(s)
 
     if s.dtype.name in ("object", "string", "float64", "Float64"):
-        for strategy in [to_int, to_float, to_category]:
-            try:
-                return strategy(s)
-            except (ValueError, TypeError, OverflowError):
-                continue
+        try:
+            values = (
+                s.to_numpy(dtype="float64", na_value=np.nan)
+                if s.dtype.name == "Float64"
+                else s.astype("float64").to_numpy()
+            )
+        except (ValueError, TypeError, OverflowError):
+            return _to_category_or_keep(s)
+
+        isnull = np.isnan(values)
+        notnull = values[~isnull]
+
+        if _is_int64(notnull):
+            # it's an integer, now pack it smaller
+            if notnull.size == 0:
+                dtype = "Int8"
+            else:
+                dtype = _int_dtype(bool(isnull.any()), notnull.min(), notnull.max()) or "Int64"
+            return pd.Series(_to_int_array(values, isnull, dtype), index=s.index, name=s.name)
+
+        # same check as `to_float`, but without creating intermediate series
+        with np.errstate(over="ignore"):
+            v = s.astype("float32")
+        if np.allclose(values, v.to_numpy(dtype="float64", na_value=np.nan), rtol=1e-5, atol=1e-8, equal_nan=True):
+            return v
+        return s.astype("float64")
 
     return s
 
@@ -92,25 +145,9 @@ def shrink_integer(s: pd.Series) -> pd.Series:
     if s.isnull().all():
         # shrink all NaNs to Int8
         return s.astype("Int8")
-    elif s.isnull().any():
-        if s.min() < 0:
-            series = ["Int32", "Int16", "Int8"]
-        else:
-            series = ["UInt32", "UInt16", "UInt8"]
-    else:
-        if s.min() < 0:
-            series = ["int32", "int16", "int8"]
-        else:
-            series = ["uint32", "uint16", "uint8"]
-
-    for dtype in series:
-        v = s.astype(dtype)
-        if not (v == s).all():
-            break
 
-        s = v
-
-    return s
+    dtype = _int_dtype(bool(s.hasnans), s.min(), s.max())
+    return s.astype(dtype) if dtype else s
 
 
 def to_float(s: pd.Series) -> pd.Series:
@@ -125,14 +162,54 @@ def to_float(s: pd.Series) -> pd.Series:
 
 
 def to_category(s: pd.Series) -> pd.Series:
-    types = set(s.dropna().apply(type).unique())
+    # infer_dtype is implemented in C and covers the most common case of strings only
+    if pd.api.types.infer_dtype(s, skipna=True) not in ("string", "empty"):
+        types = set(map(type, s.dropna()))
 
-    if types.difference({str, np.str_, dt.datetime, dt.date, type(None)}):
-        raise ValueError()
+        if types.difference({str, np.str_, dt.datetime, dt.date, type(None)}):
+            raise ValueError()
 
     return s.astype("category")
 
 
+def _to_category_or_keep(s: pd.Series) -> pd.Series:
+    try:
+        return to_category(s)
+    except (ValueError, TypeError, OverflowError):
+        return s
+
+
+def _is_int64(values: np.ndarray) -> bool:
+    """Return True if all (non-null) float values can be safely cast to int64."""
+    with np.errstate(invalid="ignore"):
+        return bool(
+            np.isfinite(values).all()
+            and (values >= -(2.0**63)).all()
+            and (values < 2.0**63).all()
+            and (np.trunc(values) == values).all()
+        )
+
+
+def _to_int_array(values: np.ndarray, isnull: np.ndarray, dtype: str) -> Any:
+    """Convert float values that are known to be integers fitting into `dtype` without checking them
+    again, which is what makes `astype` slow."""
+    if dtype[0].islower():
+        return values.astype(dtype)
+    return pd.arrays.IntegerArray(np.where(isnull, 0, values).astype(dtype.lower()), isnull)
+
+
+def _int_dtype(hasnans: bool, min_value: Any, max_value: Any) -> Optional[str]:
+    """Return the smallest integer type for values between `min_value` and `max_value` or None if they
+    don't fit into 32 bits."""
+    best = None
+    for dtype in INT_TYPES[(hasnans, min_value < 0)]:
+        info = np.iinfo(dtype.lower())
+        if not (info.min <= min_value and max_value <= info.max):
+            break
+        best = dtype
+    return best
+
+
 def series_eq(lhs: pd.Series, rhs: pd.Series, cast: Any, rtol: float = 1e-5, atol: float = 1e-8) -> bool:
     """
     Check that series are equal, but unlike normal floating point checks where
@@ -253,3 +253,35 @@ def test_repack_string_type():
 
     v = repack.repack_series(s)
     assert v.dtype == "category"
+
+
+def test_repack_large_integers():
+    # integers that don't fit into 32 bits are kept as they are
+    assert repack.repack_series(pd.Series([2**40, 1])).dtype.name == "int64"
+    assert repack.repack_series(pd.Series([2**40, None], dtype="Int64")).dtype.name == "Int64"
+    assert repack.repack_series(pd.Series([2.0**40, np.nan])).dtype.name == "Int64"
+    # floats that can't be cast to int64 become floats
+    assert repack.repack_series(pd.Series([2.0**63, 1.0])).dtype.name == "float32"
+
+
+def test_repack_nullable_float():
+    assert repack.repack_series(pd.Series([1, None], dtype="Float64")).dtype.name == "UInt8"
+    assert repack.repack_series(pd.Series([1.5, None], dtype="Float64")).dtype.name == "float32"
+
+
+def test_repack_object_with_pd_na():
+    assert repack.repack_series(pd.Series(["a", pd.NA], dtype=object)).dtype.name == "category"
+    # pd.NA can't be converted to float and integers aren't categories
+    assert repack.repack_series(pd.Series([1, pd.NA], dtype=object)).dtype.name == "object"
+
+
+def test_repack_frame_threads():
+    df = pd.DataFrame(
+        {
+            "myint": [1, 2, None, 3],
+            "myfloat": [1.2, 2.0, 3.0, None],
+            "mycat": ["a", None, "b", "c"],
+        },
+        dtype="object",
+    )
+    assert_frame_equal(repack.repack_frame(df.copy(), max_workers=1), repack.repack_frame(df.copy(), max_workers=3))
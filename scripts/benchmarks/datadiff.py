@@ -0,0 +1,86 @@
+"""Benchmark `etl diff` of a large table with dimensions (similar to GBD tables) where only a few values changed
+and a few rows were removed, comparing the whole table vs. only partitions with differences.
+
+Usage:
+
+    python -m scripts.benchmarks.datadiff --rows 5000000 --changed 100 --removed 100
+"""
+
+import multiprocessing
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+import click
+import numpy as np
+import pandas as pd
+from owid.catalog import Dataset, DatasetMeta, Table
+
+from etl import datadiff
+
+
+def _synthetic_table(rows: int, columns: int) -> pd.DataFrame:
+    """Table with country, year and 4 categorical dimensions (e.g. sex, age, cause and metric)."""
+    dims = {"sex": 2, "age": 20, "cause": 25, "metric": 3}
+    countries = max(1, rows // (30 * int(np.prod(list(dims.values())))))
+    index = pd.MultiIndex.from_product(
+        [[f"Country {i}" for i in range(countries)], range(1990, 2020)]
+        + [[f"{dim} {i}" for i in range(size)] for dim, size in dims.items()],
+        names=["country", "year", *dims],
+    )
+    df = pd.DataFrame(index=index).reset_index()
+    for col in ["country", *dims]:
+        df[col] = df[col].astype("category")
+    rng = np.random.default_rng(0)
+    for i in range(columns):
+        df[f"value{i}"] = rng.exponential(1000, size=len(df))
+    return df
+
+
+def _write_datasets(path: Path, rows: int, columns: int, changed: int, removed: int) -> None:
+    """Write both datasets to `path`. Runs in a separate process to keep large frames out of max RSS of the diff."""
+    df = _synthetic_table(rows, columns)
+    df_b = df.copy()
+    rng = np.random.default_rng(1)
+    df_b.loc[rng.choice(len(df_b), size=changed, replace=False), "value0"] += 1
+    df_b = df_b.drop(index=rng.choice(len(df_b), size=removed, replace=False))
+
+    for name, frame in [("a", df), ("b", df_b)]:
+        ds = Dataset.create_empty(path / name, DatasetMeta(namespace="n", version="v", short_name="ds"))
+        ds.add(Table(frame.set_index(list(frame.columns[:6])), short_name="gbd"))
+
+
+@click.command(help=__doc__)
+@click.option("--rows", default=5_000_000, help="Approximate number of rows")
+@click.option("--columns", default=3, help="Number of indicators")
+@click.option("--changed", default=100, help="Number of changed values")
+@click.option("--removed", default=100, help="Number of removed rows")
+@click.option("--partitioned/--full", default=True, help="Compare only partitions with differences")
+def cli(rows: int, columns: int, changed: int, removed: int, partitioned: bool) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        process = multiprocessing.get_context("spawn").Process(
+            target=_write_datasets, args=(Path(tmp), rows, columns, changed, removed)
+        )
+        process.start()
+        process.join()
+
+        datasets = []
+        for name in ["a", "b"]:
+            ds = Dataset(Path(tmp) / name)
+            ds.metadata.channel = "garden"  # type: ignore
+            datasets.append(ds)
+
+        datadiff.PARTITIONED_DIFF_MIN_ROWS = 0 if partitioned else 10**12
+        t = time.perf_counter()
+        lines = []
+        datadiff.DatasetDiff(*datasets, print=lines.append, verbose=True).summary()
+        duration = time.perf_counter() - t
+
+    print("\n".join(str(line) for line in lines))
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{'partitioned' if partitioned else 'full'} diff: {duration:.2f}s, max RSS {max_rss:.0f} MB")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,88 @@
+"""Benchmark adding region aggregates to a table with many countries, years and dimensions, region by region (with
+`add_region_aggregates`) vs. all regions at once (what `add_regions_to_table` does for sums and means).
+
+Usage:
+
+    python -m scripts.benchmarks.region_aggregates --regions 20 --dim-size 10
+"""
+
+import time
+
+import click
+import numpy as np
+import pandas as pd
+
+from etl.data_helpers import geo
+
+
+def _synthetic_table(countries: int, years: int, dim_size: int, columns: int) -> pd.DataFrame:
+    """Table with country, year and a dimension (e.g. age group), with some missing values."""
+    index = pd.MultiIndex.from_product(
+        [
+            [f"Country {i}" for i in range(countries)],
+            range(1950, 1950 + years),
+            [f"group {i}" for i in range(dim_size)],
+        ],
+        names=["country", "year", "age"],
+    )
+    df = pd.DataFrame(index=index).reset_index()
+    rng = np.random.default_rng(0)
+    for i in range(columns):
+        values = rng.exponential(1000, size=len(df))
+        values[rng.random(len(df)) < 0.1] = np.nan
+        df[f"col{i}"] = values
+    return df
+
+
+@click.command(help=__doc__)
+@click.option("--countries", default=250, help="Number of countries")
+@click.option("--years", default=70, help="Number of years")
+@click.option("--dim-size", default=10, help="Number of values of the extra dimension")
+@click.option("--columns", default=10, help="Number of indicators")
+@click.option("--regions", default=20, help="Number of regions, each with a random subset of countries")
+def cli(countries: int, years: int, dim_size: int, columns: int, regions: int) -> None:
+    df = _synthetic_table(countries, years, dim_size, columns)
+    rng = np.random.default_rng(1)
+    all_countries = df["country"].unique()
+    members = {
+        f"Region {i}": list(rng.choice(all_countries, size=countries // 5, replace=False)) for i in range(regions)
+    }
+    must_have = {region: list(region_countries[:2]) for region, region_countries in members.items()}
+    aggregations = {column: "sum" for column in df.columns if column.startswith("col")}
+    kwargs = dict(
+        aggregations=aggregations,
+        index_columns=["country", "year", "age"],
+        frac_allowed_nans_per_year=0.2,
+    )
+
+    t = time.perf_counter()
+    df_loop = df
+    for region, countries_in_region in members.items():
+        df_loop = geo.add_region_aggregates(
+            df=df_loop,
+            region=region,
+            countries_in_region=countries_in_region,
+            countries_that_must_have_data=must_have[region],
+            num_allowed_nans_per_year=None,
+            **kwargs,  # type: ignore
+        )
+    loop = time.perf_counter() - t
+
+    t = time.perf_counter()
+    df_once = geo._add_regions_aggregates_at_once(
+        df=df,
+        members=members,
+        countries_that_must_have_data=must_have,
+        frac_allowed_nans_per_year=0.2,
+        aggregations=aggregations,
+        index_columns=["country", "year", "age"],
+    )
+    once = time.perf_counter() - t
+
+    pd.testing.assert_frame_equal(df_loop, df_once, check_exact=False)
+    print(f"{len(df)} rows, {columns} columns, {regions} regions")
+    print(f"region by region: {loop:.2f}s, all at once: {once:.2f}s")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,82 @@
+"""Benchmark `repack_frame` that runs on every save of a table to feather or parquet.
+
+Pass paths to tables of a local catalog, or leave them out to use a synthetic wide table
+with a mix of integer, float, string and nullable columns.
+
+Usage:
+
+    python -m scripts.benchmarks.repack data/garden/un/2022-07-11/un_wpp/population.feather
+"""
+
+import time
+from typing import Callable, List, Tuple
+
+import click
+import numpy as np
+import pandas as pd
+from owid.catalog import Table
+from owid.repack import repack_frame
+
+
+def _synthetic_frame(rows: int, columns: int) -> pd.DataFrame:
+    """Wide table similar to garden tables, with country and year followed by many indicators."""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "country": rng.choice([f"Country {i}" for i in range(250)], size=rows).astype(object),
+            "year": rng.integers(1800, 2024, size=rows),
+        }
+    )
+    for i in range(columns):
+        kind = i % 5
+        if kind == 0:
+            # counts stored as floats because of missing values
+            values = np.round(rng.exponential(1e6, size=rows))
+        elif kind == 1:
+            # rates
+            values = rng.normal(size=rows) * 100
+        elif kind == 2:
+            # shares with limited precision
+            values = np.round(rng.random(size=rows) * 100, 2)
+        elif kind == 3:
+            # nullable integers
+            values = pd.array(rng.integers(0, 1000, size=rows), dtype="Int64")
+        else:
+            # categorical strings
+            values = rng.choice(["low", "medium", "high"], size=rows).astype(object)
+        s = pd.Series(values)
+        df[f"indicator_{i}"] = s.where(rng.random(rows) > 0.2)
+    return df
+
+
+def _timeit(f: Callable, repeat: int) -> Tuple[float, pd.DataFrame]:
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = f()
+        best = min(best, time.perf_counter() - t)
+    return best, out  # type: ignore
+
+
+@click.command(help=__doc__)
+@click.argument("paths", nargs=-1)
+@click.option("--rows", default=100_000, help="Number of rows of the synthetic table")
+@click.option("--columns", default=100, help="Number of indicators of the synthetic table")
+@click.option("--repeat", default=3, help="Take the best of this many runs")
+def cli(paths: List[str], rows: int, columns: int, repeat: int) -> None:
+    if paths:
+        frames = {path: pd.DataFrame(Table.read(path)).reset_index() for path in paths}
+    else:
+        frames = {f"synthetic {rows}x{columns}": _synthetic_frame(rows, columns)}
+
+    print(f"{'table':<50}{'1 thread [s]':>14}{'threads [s]':>14}")
+    for name, df in frames.items():
+        single, repacked = _timeit(lambda: repack_frame(df.copy(), max_workers=1), repeat)
+        threads, repacked_threads = _timeit(lambda: repack_frame(df.copy()), repeat)
+        assert repacked.dtypes.equals(repacked_threads.dtypes)
+        print(f"{name[-50:]:<50}{single:>14.3f}{threads:>14.3f}")
+
+
+if __name__ == "__main__":
+    cli()
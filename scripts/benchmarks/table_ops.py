@@ -0,0 +1,87 @@
+"""Benchmark overhead of metadata handling of common `Table` operations compared to plain pandas, with processing
+log disabled (the default) and enabled.
+
+Usage:
+
+    python -m scripts.benchmarks.table_ops --rows 10000 --columns 20
+"""
+
+import time
+from typing import Callable, Dict
+
+import click
+import numpy as np
+import pandas as pd
+from owid.catalog import Origin, Table, VariableMeta, tables
+from owid.catalog import processing_log as pl
+
+
+def _synthetic_frame(rows: int, columns: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    data = {
+        "country": rng.choice([f"Country {i}" for i in range(200)], size=rows),
+        "year": rng.integers(1950, 2024, size=rows),
+    }
+    for i in range(columns):
+        data[f"col{i}"] = rng.random(rows)
+    return pd.DataFrame(data)
+
+
+def _operations(df: pd.DataFrame, other: pd.DataFrame, concat: Callable) -> Dict[str, Callable]:
+    cols = [c for c in df.columns if c.startswith("col")]
+    return {
+        "col + col": lambda: df["col0"] + df["col1"],
+        "table + table": lambda: df[cols] + other[cols],
+        "merge": lambda: df.merge(other, on=["country", "year"], suffixes=("", "_other")),
+        "groupby().sum()": lambda: df.groupby(["country", "year"])[cols].sum(),
+        "concat": lambda: concat([df, other]),
+    }
+
+
+def _timeit(f: Callable, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+@click.command(help=__doc__)
+@click.option("--rows", default=10_000, help="Number of rows")
+@click.option("--columns", default=20, help="Number of indicators")
+@click.option("--origins", default=3, help="Number of origins of each indicator")
+@click.option("--repeat", default=20, help="Take the best of this many runs")
+def cli(rows: int, columns: int, origins: int, repeat: int) -> None:
+    df = _synthetic_frame(rows, columns)
+    other = df.sample(frac=1.0, random_state=1).reset_index(drop=True)
+
+    tb = Table(df, short_name="tb")
+    tb_other = Table(other, short_name="other")
+    for tab in (tb, tb_other):
+        for col in tab.columns:
+            tab[col].metadata = VariableMeta(
+                title=col,
+                unit="people",
+                description_short="A" * 100,
+                origins=[
+                    Origin(producer=f"Producer {i}", title=f"Data product {i}", description="D" * 1000)
+                    for i in range(origins)
+                ],
+            )
+
+    timings = {"pandas": {k: _timeit(f, repeat) for k, f in _operations(df, other, pd.concat).items()}}
+    timings["Table"] = {k: _timeit(f, repeat) for k, f in _operations(tb, tb_other, tables.concat).items()}
+    with pl.enable_processing_log():
+        timings["Table + log"] = {k: _timeit(f, repeat) for k, f in _operations(tb, tb_other, tables.concat).items()}
+
+    print(f"{rows} rows, {columns} columns, best of {repeat} runs [ms]")
+    print(f"{'operation':<20}" + "".join(f"{name:>14}" for name in timings) + f"{'overhead':>10}")
+    for op in timings["pandas"]:
+        row = [timings[name][op] for name in timings]
+        overhead = timings["Table"][op] / timings["pandas"][op]
+        print(f"{op:<20}" + "".join(f"{t * 1000:>14.2f}" for t in row) + f"{overhead:>9.1f}x")
+
+
+if __name__ == "__main__":
+    cli()
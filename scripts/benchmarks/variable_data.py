@@ -0,0 +1,88 @@
+"""Benchmark encoding and decoding of indicator data uploaded to R2, JSON vs. Arrow.
+
+Usage:
+
+    python -m scripts.benchmarks.variable_data --rows 1000000
+"""
+
+import gzip
+import io
+import json
+import time
+from typing import Callable, Tuple
+
+import click
+import numpy as np
+import pandas as pd
+
+from apps.backport.datasync import data_metadata as dm
+
+
+def _synthetic_data_df(rows: int, entities: int, numeric: bool) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    if numeric:
+        values = rng.normal(size=rows).round(3).astype(str)
+    else:
+        values = rng.choice(["low", "medium", "high"], size=rows)
+    # indicators are sorted by year and entity, see `upsert_table`
+    return pd.DataFrame(
+        {
+            "year": 1800 + np.arange(rows) // entities,
+            "entityId": 1 + np.arange(rows) % entities,
+            "value": values,
+        }
+    )
+
+
+def _timeit(f: Callable, repeat: int) -> Tuple[float, object]:
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = f()
+        best = min(best, time.perf_counter() - t)
+    return best, out
+
+
+def _encode_json(df: pd.DataFrame) -> bytes:
+    # same as `upsert_table` + `upload_gzip_string`
+    var_data_str = json.dumps(dm.variable_data(df), default=str)
+    dm.checksum_data_str(var_data_str)
+    return gzip.compress(var_data_str.encode())
+
+
+def _decode_json(b: bytes) -> pd.DataFrame:
+    # same as `_fetch_data_df_from_s3_json`
+    return pd.read_json(io.BytesIO(gzip.decompress(b)))
+
+
+def _encode_arrow(df: pd.DataFrame) -> bytes:
+    b = dm.variable_data_arrow(df)
+    dm.checksum_data_bytes(b)
+    return b
+
+
+@click.command(help=__doc__)
+@click.option("--rows", default=1_000_000, help="Number of rows of the indicator")
+@click.option("--entities", default=250, help="Number of distinct entities")
+@click.option("--repeat", default=3, help="Take the best of this many runs")
+def cli(rows: int, entities: int, repeat: int) -> None:
+    for numeric in (True, False):
+        df = _synthetic_data_df(rows, entities, numeric)
+
+        json_encode, json_bytes = _timeit(lambda: _encode_json(df), repeat)
+        json_decode, _ = _timeit(lambda: _decode_json(json_bytes), repeat)  # type: ignore
+        arrow_encode, arrow_bytes = _timeit(lambda: _encode_arrow(df), repeat)
+        arrow_decode, _ = _timeit(lambda: dm.variable_data_df_from_arrow(arrow_bytes), repeat)  # type: ignore
+
+        print(f"\n{'numeric' if numeric else 'categorical'} values, {rows} rows, {entities} entities")
+        print(f"{'format':<8}{'encode [s]':>12}{'decode [s]':>12}{'size [MB]':>12}")
+        for name, encode, decode, b in (
+            ("json.gz", json_encode, json_decode, json_bytes),
+            ("arrow", arrow_encode, arrow_decode, arrow_bytes),
+        ):
+            print(f"{name:<8}{encode:>12.3f}{decode:>12.3f}{len(b) / 2**20:>12.2f}")  # type: ignore
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,61 @@
+"""Benchmark splitting a table with dimensions into grapher variables with `_yield_wide_table`.
+
+Usage:
+
+    python -m scripts.benchmarks.yield_wide_table --dim-size 6
+"""
+
+import itertools
+import time
+
+import click
+import numpy as np
+import pandas as pd
+from owid.catalog import Table, VariableMeta, VariablePresentationMeta
+
+from etl import grapher_helpers as gh
+
+
+def _synthetic_table(dim_size: int, columns: int, entities: int, years: int) -> Table:
+    """Table with year, entity_id and 5 dimensions (e.g. GBD-style sex, age, cause, metric, measure)."""
+    dims = {f"dim{i}": [f"value {j}" for j in range(dim_size)] for i in range(5)}
+    rows = list(itertools.product(range(entities), range(2000, 2000 + years), *dims.values()))
+    df = pd.DataFrame(rows, columns=["entity_id", "year", *dims.keys()])
+
+    rng = np.random.default_rng(0)
+    for i in range(columns):
+        values = rng.normal(size=len(df))
+        # make some values missing
+        values[rng.random(len(df)) < 0.1] = np.nan
+        df[f"col{i}"] = values
+
+    tb = Table(df.set_index(["entity_id", "year", *dims.keys()]), short_name="synthetic")
+    for i in range(columns):
+        tb[f"col{i}"].metadata = VariableMeta(
+            title=f"Column {i}",
+            unit="people",
+            description_short="Number of people in << dim0 >> and << dim1 >>.",
+            description_key=["Some key point.", "Another key point for << dim2 >>."],
+            presentation=VariablePresentationMeta(title_public="Column << dim3 >>"),
+        )
+    return tb
+
+
+@click.command(help=__doc__)
+@click.option("--dim-size", default=6, help="Number of distinct values of each of 5 dimensions")
+@click.option("--columns", default=3, help="Number of value columns")
+@click.option("--entities", default=5, help="Number of entities")
+@click.option("--years", default=5, help="Number of years")
+def cli(dim_size: int, columns: int, entities: int, years: int) -> None:
+    tb = _synthetic_table(dim_size, columns, entities, years)
+
+    t = time.perf_counter()
+    n = sum(1 for _ in gh._yield_wide_table(tb, na_action="drop"))
+    duration = time.perf_counter() - t
+
+    print(f"{len(tb)} rows, {dim_size**5} dimension combinations, {columns} columns")
+    print(f"yielded {n} variables in {duration:.2f}s ({1e3 * duration / n:.3f} ms per variable)")
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,4 +1,5 @@
 import datetime as dt
+import io
 import json
 from unittest import mock
 
@@ -6,12 +7,17 @@ import pandas as pd
 import pytest
 from sqlalchemy.orm import Session
 
+from apps.backport.datasync import data_metadata
 from apps.backport.datasync.data_metadata import (
     _convert_strings_to_numeric,
     checksum_metadata,
     variable_data,
+    variable_data_arrow,
+    variable_data_df_from_arrow,
     variable_data_df_from_s3,
     variable_metadata,
+    variable_metadata_df_from_s3,
+    variables_metadata,
 )
 from etl.db import get_engine
 from etl.grapher_model import _infer_variable_type
@@ -200,6 +206,33 @@ def test_variable_metadata_ordinal():
     }
 
 
+def test_variables_metadata_same_as_variable_metadata():
+    variable_df = pd.DataFrame(
+        {
+            "value": ["0.008", "0.038"],
+            "year": [-10000, -10000],
+            "entityId": [273, 275],
+            "entityName": ["Africa", "Asia"],
+            "entityCode": [None, None],
+        }
+    )
+    origins_df = pd.DataFrame({"descriptionSnapshot": ["Origin A", "Origin B"]})
+    faqs = [{"gdocId": "1", "fragmentId": "test"}]
+
+    expected = _call_variable_metadata(525715, variable_df, _variable_meta())
+
+    with mock.patch("apps.backport.datasync.data_metadata._load_variables", return_value={525715: _variable_meta()}):
+        with mock.patch("apps.backport.datasync.data_metadata._load_origins_dfs", return_value={525715: origins_df}):
+            with mock.patch("apps.backport.datasync.data_metadata._load_faqs_by_variable", return_value={525715: faqs}):
+                with mock.patch(
+                    "apps.backport.datasync.data_metadata._load_topic_tags_by_variable",
+                    return_value={525715: ["Population"]},
+                ):
+                    metas = variables_metadata(mock.Mock(), {525715: variable_df})
+
+    assert metas == {525715: expected}
+
+
 def test_variable_data_df_from_s3():
     engine = mock.Mock()
     entities = pd.DataFrame(
@@ -212,8 +245,9 @@ def test_variable_data_df_from_s3():
     s3_data = pd.DataFrame({"entities": [1, 1], "values": ["a", 2], "years": [2000, 2001]})
 
     with mock.patch("apps.backport.datasync.data_metadata._fetch_entities", return_value=entities):
-        with mock.patch("pandas.read_json", return_value=s3_data):
-            df = variable_data_df_from_s3(engine, [123])
+        with mock.patch("owid.catalog.http_utils.get", return_value=mock.Mock(status_code=200, content=b"")):
+            with mock.patch("pandas.read_json", return_value=s3_data):
+                df = variable_data_df_from_s3(engine, [123])
 
     assert df.to_dict(orient="records") == [
         {"entityId": 1, "value": "a", "year": 2000, "variableId": 123, "entityName": "UK", "entityCode": "GBR"},
@@ -221,6 +255,89 @@ def test_variable_data_df_from_s3():
     ]
 
 
+def _mock_data_api(responses: dict):
+    """Mock data API responding with JSON documents by URL (404 if missing) and counting requests."""
+    requests = []
+
+    def get(url):
+        requests.append(url)
+        if url not in responses:
+            return mock.Mock(status_code=404)
+        return mock.Mock(status_code=200, content=json.dumps(responses[url]).encode())
+
+    return mock.patch("owid.catalog.http_utils.get", side_effect=get), requests
+
+
+def test_variable_data_df_from_s3_keeps_order_of_variables(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_metadata.config, "VARIABLE_DATA_ARROW", False)
+    monkeypatch.setattr(data_metadata, "VARIABLES_CACHE_DIR", tmp_path)
+    responses = {
+        data_metadata.config.variable_data_url(variable_id): {
+            "entities": [1, 2],
+            "values": [variable_id, variable_id + 0.5],
+            "years": [2000, 2001],
+        }
+        for variable_id in range(1, 50)
+    }
+    entities = pd.DataFrame({"entityId": [1, 2], "entityName": ["UK", "US"], "entityCode": ["GBR", "USA"]})
+    # variable 100 has no data
+    variable_ids = list(range(49, 0, -1)) + [100]
+    checksums = pd.DataFrame({"variableId": variable_ids, "checksum": [f"c{i}" for i in variable_ids]})
+
+    patch_get, requests = _mock_data_api(responses)
+    with mock.patch("apps.backport.datasync.data_metadata._fetch_entities", return_value=entities):
+        with mock.patch("apps.backport.datasync.data_metadata.read_sql", return_value=checksums):
+            with patch_get:
+                df = variable_data_df_from_s3(mock.Mock(), variable_ids, workers=4, cache=True)
+                assert len(requests) == 50
+
+                # second fetch is served from the cache
+                df_cached = variable_data_df_from_s3(mock.Mock(), variable_ids, workers=4, cache=True)
+                assert len(requests) == 51
+
+    assert df["variableId"].drop_duplicates().tolist() == variable_ids[:-1]
+    assert df[df.variableId == 3].to_dict(orient="records") == [
+        {"entityId": 1, "value": "3.0", "year": 2000, "variableId": 3, "entityName": "UK", "entityCode": "GBR"},
+        {"entityId": 2, "value": "3.5", "year": 2001, "variableId": 3, "entityName": "US", "entityCode": "USA"},
+    ]
+    assert df.dtypes["year"] == "int64"
+    pd.testing.assert_frame_equal(df, df_cached)
+
+
+def test_variable_metadata_df_from_s3():
+    responses = {data_metadata.config.variable_metadata_url(variable_id): {"id": variable_id} for variable_id in [1, 2]}
+
+    patch_get, _ = _mock_data_api(responses)
+    with patch_get:
+        assert variable_metadata_df_from_s3([2, 3, 1], workers=2) == [{"id": 2}, {}, {"id": 1}]
+        assert sorted(data_metadata.iter_variable_metadata_from_s3([2, 3, 1])) == [
+            (1, {"id": 1}),
+            (2, {"id": 2}),
+            (3, {}),
+        ]
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        ["1", "2", "3"],
+        ["1.5", "2", "-3"],
+        ["a", "NA", "a"],
+    ],
+)
+def test_variable_data_arrow(values):
+    df = pd.DataFrame({"value": values, "year": [2000, 2001, 2000], "entityId": [1, 1, 2]})
+
+    out = variable_data_df_from_arrow(variable_data_arrow(df))
+
+    # same as what we'd get from JSON
+    expected = pd.read_json(io.StringIO(json.dumps(variable_data(df)))).rename(
+        columns={"entities": "entityId", "values": "value", "years": "year"}
+    )
+    assert out.columns.tolist() == expected.columns.tolist()
+    assert out.astype(str).equals(expected.astype(str))
+
+
 def test_infer_variable_type():
     assert _infer_variable_type(pd.Series(["1", "2"])) == "int"
     assert _infer_variable_type(pd.Series(["1", "2.1"])) == "float"
@@ -3,13 +3,14 @@
 """
 
 import json
+import pickle
 import unittest
 import warnings
 from unittest.mock import mock_open, patch
 
 import numpy as np
 import pandas as pd
-from owid.catalog import Table
+from owid.catalog import Dataset, DatasetMeta, Table
 from owid.datautils import dataframes
 from pytest import warns
 from structlog.testing import capture_logs
@@ -1559,3 +1560,106 @@ class TestAddRegionsToTable(unittest.TestCase):
             .reset_index(drop=True)
         )
         assert tb_out.equals(tb_expected)
+
+    def test_aggregates_at_once_equal_aggregates_region_by_region(self):
+        rng = np.random.default_rng(0)
+        index = pd.MultiIndex.from_product(
+            [["Belarus", "France", "Italy", "Russia", "Spain", "USSR"], range(2000, 2005), ["f", "m"]],
+            names=["country", "year", "sex"],
+        )
+        df = pd.DataFrame(index=index).reset_index().sample(frac=0.8, random_state=0).reset_index(drop=True)
+        df["country"] = df["country"].astype("category")
+        df["a"] = np.where(rng.random(len(df)) < 0.2, np.nan, rng.normal(size=len(df)))
+        df["b"] = rng.integers(0, 100, size=len(df))
+        df["c"] = pd.array(np.where(rng.random(len(df)) < 0.2, None, rng.integers(0, 10, size=len(df))), dtype="Int64")
+        regions = {
+            "Europe": {},
+            "Europe (excl. France)": {"additional_regions": ["Europe"], "excluded_members": ["France"]},
+        }
+        kwargs = dict(
+            index_columns=["country", "year", "sex"],
+            aggregations={"a": "sum", "b": "mean", "c": "sum"},
+            countries_that_must_have_data={"Europe": ["Italy", "Spain"]},
+            num_allowed_nans_per_year=2,
+            frac_allowed_nans_per_year=0.3,
+            min_num_values_per_year=2,
+        )
+        tb_out = geo.add_regions_to_table(
+            tb=df, ds_regions=ds_regions, regions=regions, check_for_region_overlaps=False, **kwargs
+        )
+
+        # Aggregates added region by region, by the function that add_regions_to_table used before.
+        df_expected = df
+        for region, members in [
+            ("Europe", ["Belarus", "France", "Italy", "Russia", "Spain", "USSR"]),
+            ("Europe (excl. France)", ["Belarus", "Italy", "Russia", "Spain", "USSR"]),
+        ]:
+            df_expected = geo.add_region_aggregates(
+                df=df_expected,
+                region=region,
+                countries_in_region=members,
+                index_columns=kwargs["index_columns"],
+                aggregations=kwargs["aggregations"],
+                countries_that_must_have_data=kwargs["countries_that_must_have_data"].get(region, []),
+                num_allowed_nans_per_year=2,
+                frac_allowed_nans_per_year=0.3,
+                min_num_values_per_year=2,
+            )
+        pd.testing.assert_frame_equal(tb_out, df_expected)
+
+    def test_aggregates_with_custom_aggregation_function(self):
+        tb_in = Table.from_records(
+            [("France", 2020, 1), ("Italy", 2020, 3), ("Spain", 2021, 2)],
+            columns=["country", "year", "a"],
+        )
+        tb_out = geo.add_regions_to_table(
+            tb=tb_in,
+            ds_regions=ds_regions,
+            regions=["Europe"],
+            aggregations={"a": lambda x: x.max()},
+            check_for_region_overlaps=False,
+        )
+        assert tb_out[tb_out["country"] == "Europe"]["a"].tolist() == [3, 2]
+
+
+def test_region_resolver_is_cached_by_dataset_checksum(tmp_path):
+    ds = Dataset.create_empty(tmp_path / "regions", DatasetMeta(namespace="regions", short_name="regions"))
+    ds.add(ds_regions["regions"].update_metadata(short_name="regions"))
+    ds.save()
+
+    resolver = geo.RegionResolver.from_datasets(ds_regions=Dataset(ds.path))
+    assert geo.RegionResolver.from_datasets(ds_regions=Dataset(ds.path)) is resolver
+    assert resolver.members_of_region("Europe") == ["Belarus", "France", "Italy", "Russia", "Spain", "USSR"]
+    assert resolver.subregions("successors") == {"USSR": ["Belarus", "Russia"]}
+    assert resolver.subregion_pairs("successors").values.tolist() == [["USSR", "Belarus"], ["USSR", "Russia"]]
+
+    # resolver can be sent to worker processes
+    assert pickle.loads(pickle.dumps(resolver)).subregions() == resolver.subregions()
+
+    # a new version of the dataset gets a new resolver
+    tb = ds_regions["regions"].update_metadata(short_name="regions")
+    tb.loc["OWID_EUR", "members"] = '["FRA", "ITA"]'
+    ds.add(tb)
+    new_resolver = geo.RegionResolver.from_datasets(ds_regions=Dataset(ds.path))
+    assert new_resolver is not resolver
+    assert new_resolver.members_of_region("Europe") == ["France", "Italy"]
+
+
+def test_detect_overlapping_regions():
+    df = pd.DataFrame(
+        {
+            "country": ["USSR", "USSR", "USSR", "Russia", "Russia", "Russia", "Georgia", "Georgia"],
+            "year": [1989, 1990, 1991, 1989, 1990, 1991, 1990, 1991],
+            "a": [1.0, 1.0, np.nan, np.nan, 2.0, 2.0, 0.0, 3.0],
+            "b": [np.nan, 0.0, 1.0, 5.0, 4.0, np.nan, np.nan, np.nan],
+        }
+    )
+    regions_and_members = {"USSR": ["Russia", "Georgia", "Ukraine"], "Ukraine": ["USSR"]}
+
+    # Overlaps only count on the same year and the same variable, and zeros are ignored.
+    assert geo.detect_overlapping_regions(df, ["country", "year"], regions_and_members) == [{1990: {"USSR", "Russia"}}]
+    # Values are summed over other index columns.
+    df_dims = pd.concat([df.assign(age="young"), df.assign(age="old", a=np.nan, b=np.nan)], ignore_index=True)
+    assert geo.detect_overlapping_regions(df_dims, ["country", "year", "age"], regions_and_members) == [
+        {1990: {"USSR", "Russia"}}
+    ]
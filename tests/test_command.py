@@ -6,6 +6,7 @@
 Test components of the etl command-line tool.
 """
 
+import threading
 import time
 
 import pytest
@@ -70,3 +71,124 @@ def test_exec_graph_parallel():
 
     # Assert that all tasks have been completed
     assert all(task in done for task in exec_graph.keys())
+
+
+def test_critical_path_sort_key():
+    # long chain a -> b -> c and a short independent task d
+    exec_graph = {
+        "data://garden/a": set(),
+        "data://garden/b": {"data://garden/a"},
+        "data://garden/c": {"data://garden/b"},
+        "data://garden/d": set(),
+    }
+    execution_times = {"data://garden/a": 1.0, "data://garden/b": 10.0, "data://garden/c": 10.0, "data://garden/d": 5.0}
+
+    sort_key = cmd.critical_path_sort_key(exec_graph, execution_times)
+
+    # `a` is on the critical path even though it is the fastest task
+    assert sorted(["data://garden/d", "data://garden/a"], key=sort_key) == ["data://garden/a", "data://garden/d"]
+
+
+def test_estimate_durations_falls_back_to_channel_median():
+    exec_graph = {"data://garden/ns/2024-01-01/new": set(), "data://meadow/ns/2024-01-01/new": set()}
+    execution_times = {
+        "data://garden/ns/2023-01-01/x": 1.0,
+        "data://garden/ns/2023-01-01/y": 3.0,
+        "data://garden/ns/2023-01-01/z": 5.0,
+        "data://meadow/ns/2023-01-01/new": 7.0,
+    }
+    durations = cmd._estimate_durations(exec_graph, execution_times)
+
+    # median of the garden channel
+    assert durations["data://garden/ns/2024-01-01/new"] == 3.0
+    # previous version of the same step
+    assert durations["data://meadow/ns/2024-01-01/new"] == 7.0
+
+
+def test_predict_makespan():
+    a, b, c, d = (f"data://garden/ns/2024-01-01/{t}" for t in "abcd")
+    exec_graph = {a: set(), b: {a}, c: set(), d: set()}
+    execution_times = {a: 1.0, b: 2.0, c: 3.0, d: 3.0}
+
+    assert cmd.predict_makespan(exec_graph, workers=1, execution_times=execution_times) == 9.0
+    # a and c start first, d runs after a and b after c
+    assert cmd.predict_makespan(exec_graph, workers=2, execution_times=execution_times) == 5.0
+    assert cmd.predict_makespan(exec_graph, workers=4, execution_times=execution_times) == 3.0
+
+
+def test_exec_graph_parallel_sort_key():
+    executed = []
+    exec_graph = {"a": [], "b": [], "c": []}
+
+    cmd.exec_graph_parallel(exec_graph, executed.append, workers=1, use_threads=True, sort_key=lambda t: -ord(t))
+
+    assert executed == ["c", "b", "a"]
+
+
+def test_exec_graph_parallel_budgets():
+    lock = threading.Lock()
+    running = set()
+    concurrent_runs = []
+
+    exec_graph = {"big1": [], "big2": [], "small1": [], "small2": [], "huge": []}
+    resources = {
+        "big1": {"memory": 6},
+        "big2": {"memory": 6},
+        "small1": {"memory": 2},
+        "small2": {"memory": 2},
+        # doesn't fit into the budget even on its own
+        "huge": {"memory": 20},
+    }
+
+    def mock_func(task: str, **kwargs):
+        with lock:
+            running.add(task)
+            concurrent_runs.append(set(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(task)
+
+    cmd.exec_graph_parallel(
+        exec_graph, mock_func, workers=4, use_threads=True, resources=resources, budgets={"memory": 10}
+    )
+
+    for tasks in concurrent_runs:
+        if "huge" in tasks:
+            # huge task runs alone
+            assert tasks == {"huge"}
+        else:
+            assert sum(resources[t]["memory"] for t in tasks) <= 10
+
+    # all tasks ran
+    assert set().union(*concurrent_runs) == set(exec_graph)
+
+
+def test_default_db_connections_budget_runs_grapher_steps_concurrently(monkeypatch):
+    workers = 4
+    # grapher steps upsert with their own pool of threads, `etl run` divides them among workers
+    monkeypatch.setattr(cmd.config, "GRAPHER_UPSERT_BATCH_SIZE", 0)
+    monkeypatch.setattr(cmd.config, "GRAPHER_INSERT_WORKERS", cmd.config.DB_CONNECTIONS_BUDGET // workers)
+
+    lock = threading.Lock()
+    running = set()
+    concurrent_runs = []
+
+    def mock_func(task: str, **kwargs):
+        with lock:
+            running.add(task)
+            concurrent_runs.append(set(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(task)
+
+    exec_graph = {"grapher1": [], "grapher2": []}
+    cmd.exec_graph_parallel(
+        exec_graph,
+        mock_func,
+        workers=workers,
+        use_threads=True,
+        resources={task: {"db_connections": cmd._grapher_db_connections()} for task in exec_graph},
+        budgets={"db_connections": cmd.config.DB_CONNECTIONS_BUDGET},
+    )
+
+    assert {"grapher1", "grapher2"} in concurrent_runs
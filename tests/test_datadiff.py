@@ -1,6 +1,10 @@
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 from owid.catalog import Dataset, DatasetMeta, Table
 
+from etl import datadiff
 from etl.datadiff import DatasetDiff
 
 
@@ -64,3 +68,73 @@ def test_new_data(tmp_path):
         "\t\t[yellow]~ Column [b]a[/b] (new [u]data[/u], changed [u]data[/u])",
         "\t\t\t\t[violet]+ New values: 1 / 3 (33.33%)\n\t\t\t\t[violet]  country  a\n\t\t\t\t[violet]       FR  3\n\t\t\t\t[violet]~ Changed values: 1 / 3 (33.33%)\n\t\t\t\t[violet]  country  a -  a +\n\t\t\t\t[violet]       US  3.0    2",
     ]
+
+
+def test_partitioned_diff(tmp_path, monkeypatch):
+    ds_a, ds_b = _create_datasets(tmp_path)
+
+    tab_a = Table({"country": ["UK", "US", "DE", "IT"], "year": 2000, "a": [1, 3, 4, 5]}, short_name="tab")
+    tab_b = Table({"country": ["UK", "US", "FR", "IT"], "year": 2000, "a": [1, 2, 3, 5]}, short_name="tab")
+
+    ds_a.add(tab_a.set_index(["country", "year"]))
+    ds_b.add(tab_b.set_index(["country", "year"]))
+
+    out = []
+    DatasetDiff(ds_a, ds_b, print=lambda x: out.append(x), verbose=True).summary()
+
+    # compare only partitions (of one row on average) with differences
+    monkeypatch.setattr(datadiff, "PARTITIONED_DIFF_MIN_ROWS", 0)
+    monkeypatch.setattr(datadiff, "DIFF_PARTITION_ROWS", 1)
+    out_partitioned = []
+    DatasetDiff(ds_a, ds_b, print=lambda x: out_partitioned.append(x), verbose=True).summary()
+
+    assert out_partitioned == out
+    assert "\t\t[yellow]~ Column [b]a[/b] (new [u]data[/u], changed [u]data[/u])" in out
+    assert "[violet]~ Changed values: 1 / 4 (25.00%)" in out[-1]
+
+
+def test_differing_partitions(monkeypatch):
+    monkeypatch.setattr(datadiff, "DIFF_PARTITION_ROWS", 1)
+    tab_a = Table({"country": ["UK", "US", "DE"], "a": [1.0, 2.0, 3.0]}).set_index("country")
+    tab_b = Table({"country": ["DE", "US", "UK"], "a": [3.0, 2.5, 1.0]}).set_index("country")
+
+    # order of rows doesn't matter, only partitions with different values are kept
+    diff_a, diff_b = datadiff._differing_partitions(tab_a, tab_b, ["a"])
+    assert "US" in diff_a.index and "US" in diff_b.index
+    assert len(diff_a) < 3
+
+    # no differences
+    diff_a, diff_b = datadiff._differing_partitions(tab_a, tab_a.iloc[::-1], ["a"])
+    assert diff_a.empty and diff_b.empty
+
+
+def test_remote_tables_are_prefetched_to_cache(tmp_path, monkeypatch):
+    ds_a, ds_b = _create_datasets(tmp_path)
+    ds_a.add(Table({"country": ["UK", "US"], "a": [1, 3]}, short_name="tab").set_index("country"))
+    ds_b.add(Table({"country": ["UK", "US"], "a": [1, 2]}, short_name="tab").set_index("country"))
+
+    # serve dataset A as if it was in the remote catalog
+    downloads = []
+
+    def _download_file(url, path):
+        downloads.append(url)
+        shutil.copy(tmp_path / "catalog_a" / url.removeprefix(datadiff.OWID_CATALOG_URI), path)
+
+    monkeypatch.setattr(datadiff, "_download_file", _download_file)
+    monkeypatch.setattr(datadiff, "REMOTE_CACHE_DIR", tmp_path / "cache")
+    remote_ds = datadiff.RemoteDataset(ds_a.metadata, ["tab"], {"tab": "ds/tab.feather"}, checksum=ds_a.checksum())
+
+    datadiff.prefetch_remote_tables([remote_ds, ds_b, None])
+    assert sorted(downloads) == [
+        datadiff.OWID_CATALOG_URI + "ds/tab.feather",
+        datadiff.OWID_CATALOG_URI + "ds/tab.meta.json",
+    ]
+
+    # tables are loaded from cache, also in other processes
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        lines = executor.submit(datadiff._diff_lines, remote_ds, ds_b, verbose=True).result()
+    assert "\t\t[yellow]~ Column [b]a[/b] (changed [u]data[/u])" in lines
+    assert remote_ds["tab"].equals(ds_a["tab"])
+
+    datadiff.prefetch_remote_tables([remote_ds])
+    assert len(downloads) == 2
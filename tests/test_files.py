@@ -1,3 +1,7 @@
+import os
+import sqlite3
+from unittest import mock
+
 import numpy as np
 import pandas as pd
 
@@ -84,3 +88,46 @@ def test_checksum_dict():
 def test_checksum_df():
     df = pd.DataFrame({"a": [1, 2, 3], "b": ["x", "x", "y"]})
     assert files.checksum_df(df) == "34c7a3a435e4a0703b37904f09f967f1"
+
+
+def test_persistent_checksum_cache(tmp_path):
+    cache = files.PersistentChecksumCache(tmp_path / "checksums.sqlite")
+    f = tmp_path / "a.txt"
+    f.write_text("a")
+    # pretend the file was modified long ago, recently modified files are not cached
+    os.utime(f, ns=(0, 0))
+
+    assert cache.get(f.as_posix(), f.stat()) is None
+    cache.set(f.as_posix(), f.stat(), "abc")
+    assert cache.get(f.as_posix(), f.stat()) == "abc"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # cache is persisted
+    assert files.PersistentChecksumCache(tmp_path / "checksums.sqlite").get(f.as_posix(), f.stat()) == "abc"
+
+    # modified file invalidates the checksum
+    f.write_text("ab")
+    os.utime(f, ns=(0, 0))
+    assert cache.get(f.as_posix(), f.stat()) is None
+
+
+def test_persistent_checksum_cache_skips_recent_files(tmp_path):
+    cache = files.PersistentChecksumCache(tmp_path / "checksums.sqlite")
+    f = tmp_path / "a.txt"
+    f.write_text("a")
+
+    cache.set(f.as_posix(), f.stat(), "abc")
+    assert cache.get(f.as_posix(), f.stat()) is None
+
+
+def test_persistent_checksum_cache_locked_database(tmp_path):
+    cache = files.PersistentChecksumCache(tmp_path / "checksums.sqlite")
+    f = tmp_path / "a.txt"
+    f.write_text("a")
+    os.utime(f, ns=(0, 0))
+
+    # database locked by another process, checksum is not cached
+    conn = mock.Mock(execute=mock.Mock(side_effect=sqlite3.OperationalError("database is locked")))
+    with mock.patch.object(cache, "_connect", return_value=conn):
+        cache.set(f.as_posix(), f.stat(), "abc")
+        assert cache.get(f.as_posix(), f.stat()) is None
@@ -75,6 +75,59 @@ def test_yield_wide_table_with_dimensions():
     assert t[t.columns[0]].metadata.title == "Deaths"
 
 
+def test_yield_wide_table_with_multiple_dimensions():
+    df = pd.DataFrame(
+        {
+            "year": [2019, 2020, 2019, 2020, 2019, 2020],
+            "entity_id": [1, 1, 2, 2, 1, 1],
+            "sex": ["male", "male", "female", "male", "female", np.nan],
+            "age": ["10-18", "10-18", "10-18", "10-18", "19-25", "19-25"],
+            "deaths": [1.0, 2.0, 3.0, np.nan, 5.0, 6.0],
+            "cases": [np.nan, np.nan, 30.0, 40.0, 50.0, 60.0],
+        }
+    )
+    table = Table(df.set_index(["entity_id", "year", "sex", "age"]))
+    for col in ("deaths", "cases"):
+        table[col].metadata.unit = "people"
+        table[col].metadata.title = f"{col} of << sex|default('all') >> aged << age >>"
+        table[col].metadata.description_short = f"Number of {col} for << age >>."
+    grapher_tables = list(gh._yield_wide_table(table, na_action="drop"))
+
+    assert [t.columns[0] for t in grapher_tables] == [
+        "deaths__sex_female__age_10_18",
+        "cases__sex_female__age_10_18",
+        "deaths__sex_female__age_19_25",
+        "cases__sex_female__age_19_25",
+        "deaths__sex_male__age_10_18",
+        "cases__sex_male__age_10_18",
+        "deaths__age_19_25",
+        "cases__age_19_25",
+    ]
+
+    # rows with missing values are dropped, order of rows is preserved
+    t = grapher_tables[4]
+    assert t.index.names == ["entity_id", "year"]
+    assert list(t.index) == [(1, 2019), (1, 2020)]
+    assert list(t.iloc[:, 0]) == [1.0, 2.0]
+    assert list(grapher_tables[5].index) == [(2, 2020)]
+
+    meta = grapher_tables[5][grapher_tables[5].columns[0]].metadata
+    assert meta.title == "cases of male aged 10-18"
+    assert meta.description_short == "Number of cases for 10-18."
+    assert meta.additional_info["dimensions"]["filters"] == [
+        {"name": "sex", "value": "male"},
+        {"name": "age", "value": "10-18"},
+    ]
+
+    # dimension with missing value is left out
+    meta = grapher_tables[6][grapher_tables[6].columns[0]].metadata
+    assert meta.title == "deaths of all aged 19-25"
+    assert meta.additional_info["dimensions"]["filters"] == [{"name": "age", "value": "19-25"}]
+
+    # metadata of the original table is untouched
+    assert table.deaths.metadata.title == "deaths of << sex|default('all') >> aged << age >>"
+
+
 def test_long_to_wide_tables():
     deaths_meta = VariableMeta(title="Deaths", unit="people")
     births_meta = VariableMeta(title="Births", unit="people")
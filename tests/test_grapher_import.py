@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pandas as pd
+
+from etl import grapher_import
+from etl import grapher_model as gm
+
+
+def _variable() -> gm.Variable:
+    v = gm.Variable(
+        shortName="a", name="a", description=None, datasetId=1, unit="", coverage="", timespan="", display={}
+    )
+    v.id = 1
+    return v
+
+
+def test_upload_data_if_changed_deletes_stale_arrow(monkeypatch):
+    df = pd.DataFrame({"year": [2000], "entityId": [1], "value": ["1"]})
+    variable = _variable()
+    monkeypatch.setattr(grapher_import.config, "VARIABLE_DATA_ARROW", False)
+
+    with mock.patch.object(grapher_import, "upload_gzip_string") as upload_json, mock.patch.object(
+        grapher_import, "delete_object"
+    ) as delete, ThreadPoolExecutor() as executor:
+        # only JSON is uploaded by default
+        [f.result() for f in grapher_import._upload_data_if_changed(executor, variable, df)]
+        upload_json.assert_called_once()
+        delete.assert_not_called()
+
+        # Arrow from earlier uploads is deleted after turning it off
+        monkeypatch.setattr(grapher_import.config, "VARIABLE_DATA_ARROW_CLEANUP", True)
+        variable.dataChecksum = None
+        [f.result() for f in grapher_import._upload_data_if_changed(executor, variable, df)]
+        delete.assert_called_once_with(variable.s3_data_arrow_path())
+
+        # nothing is uploaded or deleted if data didn't change
+        assert grapher_import._upload_data_if_changed(executor, variable, df) == []
@@ -1,3 +1,7 @@
+import datetime as dt
+
+from owid import catalog
+
 from etl import grapher_model as gm
 
 
@@ -8,3 +12,49 @@ def test_source_description():
     s = gm.Source(**d)  # type: ignore
     assert "link" in s.description
     assert s.description["link"] == "ABC"
+
+
+def _variable(short_name: str, name: str) -> gm.Variable:
+    return gm.Variable(
+        shortName=short_name, name=name, description=None, datasetId=1, unit="", coverage="", timespan="", display={}
+    )
+
+
+def test_match_variables():
+    existing = [
+        _variable("a", "A"),
+        _variable("b_c", "B"),
+        _variable("d", "D"),
+        _variable("e", "E"),
+    ]
+    variables = [
+        # match on shortName
+        _variable("a", "A new"),
+        # match on shortName with double underscore
+        _variable("b__c", "B"),
+        # match on name
+        _variable("x", "D"),
+        # new variable taking name of an existing variable
+        _variable("e_new", "E new"),
+        _variable("f", "E"),
+    ]
+    matches, conflicts = gm._match_variables(variables, existing)
+    assert [m.shortName if m else None for m in matches] == ["a", "b_c", "d", None, "e"]
+    assert conflicts == []
+
+
+def test_match_variables_swapped_names():
+    existing = [_variable("a", "A"), _variable("b", "B")]
+    variables = [_variable("a", "B"), _variable("b", "A")]
+    matches, conflicts = gm._match_variables(variables, existing)
+    assert matches == existing
+    assert {c.shortName for c in conflicts} == {"a", "b"}
+
+
+def test_origin_upsert_key():
+    origin = gm.Origin.from_origin(
+        catalog.Origin(producer="Producer", title="Title", date_accessed="2023-01-01")  # type: ignore
+    )
+    db_origin = gm.Origin.from_origin(catalog.Origin(producer="Producer", title="Title"))  # type: ignore
+    db_origin.dateAccessed = dt.date(2023, 1, 1)
+    assert origin._upsert_key == db_origin._upsert_key
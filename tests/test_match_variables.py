@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from etl import match_variables as mv
+
+
+def test_rank_mapping_suggestions():
+    old_names = ["GDP per capita", "Population", "Life expectancy"]
+    new_names = ["Life expectancy at birth", "GDP", "Population", "GDP per capita (PPP)", "Total population"]
+
+    indices, scores = mv.rank_mapping_suggestions(old_names, new_names, similarity_name="ratio")
+    assert indices.shape == scores.shape == (3, 5)
+    # identical names come first
+    assert indices[1, 0] == 2
+    assert scores[1, 0] == 100
+    # scores are sorted and match the scorer
+    assert (np.diff(scores, axis=1) <= 0).all()
+    assert np.allclose(scores[0], [mv.fuzz.ratio(old_names[0], new_names[j]) for j in indices[0]])
+
+    # top-k is the beginning of the full ranking
+    top_indices, top_scores = mv.rank_mapping_suggestions(
+        old_names, new_names, similarity_name="ratio", max_suggestions=2
+    )
+    assert top_indices.shape == (3, 2)
+    assert (top_indices == indices[:, :2]).all()
+    assert (top_scores == scores[:, :2]).all()
+
+
+def test_rank_mapping_suggestions_in_chunks(monkeypatch):
+    old_names = [f"indicator {i}" for i in range(7)]
+    new_names = [f"indicator {i}" for i in range(10)][::-1]
+
+    indices, _ = mv.rank_mapping_suggestions(old_names, new_names, max_suggestions=3)
+    monkeypatch.setattr(mv, "SCORES_CHUNK_SIZE", 3)
+    chunked_indices, _ = mv.rank_mapping_suggestions(old_names, new_names, max_suggestions=3)
+
+    assert (indices == chunked_indices).all()
+    assert [new_names[j] for j in indices[:, 0]] == old_names
+
+
+def test_find_mapping_suggestions():
+    missing_old = pd.DataFrame({"id_old": [1, 2], "name_old": ["Population", "Deaths"]})
+    missing_new = pd.DataFrame({"id_new": [10, 20, 30], "name_new": ["Deaths (total)", "Population", "Births"]})
+
+    suggestions = mv.find_mapping_suggestions(missing_old, missing_new, similarity_name="ratio", max_suggestions=2)
+
+    assert [s["old"]["id_old"] for s in suggestions] == [1, 2]
+    assert list(suggestions[0]["new"]["id_new"]) == [20, 10]
+    assert list(suggestions[0]["new"].index) == [1, 0]
+    assert suggestions[0]["new"]["similarity"].iloc[0] == 100
+    assert suggestions[1]["new"]["id_new"].iloc[0] == 10
+    # input is not modified
+    assert list(missing_new.columns) == ["id_new", "name_new"]
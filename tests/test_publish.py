@@ -0,0 +1,121 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict
+
+from botocore.client import ClientError
+
+from etl import publish
+
+
+class FakeS3:
+    """In-memory S3 client that counts requests."""
+
+    def __init__(self) -> None:
+        self.objects: Dict[str, bytes] = {}
+        self.requests = 0
+
+    def get_object(self, Bucket: str, Key: str) -> Dict[str, Any]:
+        self.requests += 1
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"Body": _Body(self.objects[Key])}
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, **kwargs: Any) -> None:
+        self.requests += 1
+        self.objects[Key] = Body
+
+    def upload_file(self, filename: str, bucket: str, key: str, ExtraArgs: Dict[str, Any]) -> None:
+        self.requests += 1
+        self.objects[key] = Path(filename).read_bytes()
+
+    def list_objects(self, Bucket: str, Prefix: str, **kwargs: Any) -> Dict[str, Any]:
+        self.requests += 1
+        contents = [
+            {"Key": k, "ETag": f'"{hashlib.md5(v).hexdigest()}"', "Size": len(v)}
+            for k, v in sorted(self.objects.items())
+            if k.startswith(Prefix)
+        ]
+        return {"Contents": contents, "IsTruncated": False}
+
+    def delete_objects(self, Bucket: str, Delete: Dict[str, Any]) -> None:
+        self.requests += 1
+        for o in Delete["Objects"]:
+            del self.objects[o["Key"]]
+
+
+class _Body:
+    def __init__(self, b: bytes) -> None:
+        self.b = b
+
+    def read(self) -> bytes:
+        return self.b
+
+
+def test_sync_folder(tmp_path: Path) -> None:
+    folder = tmp_path / "garden/ns/2024/ds"
+    folder.mkdir(parents=True)
+    (folder / "index.json").write_text("{}")
+    (folder / "a.feather").write_bytes(b"aaa")
+    (folder / "b.feather").write_bytes(b"bbb")
+
+    s3 = FakeS3()
+    # folder published before manifests, `a.feather` is already there
+    s3.objects["garden/ns/2024/ds/a.feather"] = b"aaa"
+    s3.objects["garden/ns/2024/ds/old.feather"] = b"old"
+
+    # dry run doesn't change anything
+    plan = publish.sync_folder(s3, "bucket", folder, "garden/ns/2024/ds", dry_run=True)
+    assert sorted(plan.upload) == ["b.feather", "index.json"]
+    assert plan.delete == ["old.feather"]
+    assert plan.upload_bytes == 5
+    # get manifest + list objects
+    assert plan.read_requests == 2
+    # two files, one delete and manifest
+    assert plan.write_requests == 4
+    assert s3.requests == 2
+    assert "garden/ns/2024/ds/.manifest.json" not in s3.objects
+
+    s3.requests = 0
+    publish.sync_folder(s3, "bucket", folder, "garden/ns/2024/ds")
+    assert s3.requests == 2 + 4
+    assert sorted(s3.objects) == [
+        "garden/ns/2024/ds/.manifest.json",
+        "garden/ns/2024/ds/a.feather",
+        "garden/ns/2024/ds/b.feather",
+        "garden/ns/2024/ds/index.json",
+    ]
+    manifest = json.loads(s3.objects["garden/ns/2024/ds/.manifest.json"])
+    assert manifest["b.feather"] == {"md5": hashlib.md5(b"bbb").hexdigest(), "size": 3}
+
+    # nothing changed, only manifest is read
+    s3.requests = 0
+    plan = publish.sync_folder(s3, "bucket", folder, "garden/ns/2024/ds")
+    assert not plan.upload and not plan.delete and not plan.write_manifest
+    assert s3.requests == 1
+
+    # only the changed file is uploaded, manifest is updated
+    (folder / "b.feather").write_bytes(b"bbbb")
+    (folder / "a.feather").unlink()
+    s3.requests = 0
+    plan = publish.sync_folder(s3, "bucket", folder, "garden/ns/2024/ds")
+    assert plan.upload == ["b.feather"]
+    assert plan.delete == ["a.feather"]
+    assert s3.requests == 1 + 3
+    assert s3.objects["garden/ns/2024/ds/b.feather"] == b"bbbb"
+    assert "garden/ns/2024/ds/a.feather" not in s3.objects
+    assert json.loads(s3.objects["garden/ns/2024/ds/.manifest.json"]) == publish.local_manifest(folder)
+
+
+def test_upload_requests() -> None:
+    assert publish._upload_requests(0) == 1
+    assert publish._upload_requests(publish.TRANSFER_CONFIG.multipart_threshold) == 3
+    assert publish._upload_requests(3 * publish.TRANSFER_CONFIG.multipart_chunksize + 1) == 6
+
+
+def test_local_manifest_skips_local_files(tmp_path: Path) -> None:
+    (tmp_path / "index.json").write_text("{}")
+    (tmp_path / publish.MANIFEST_FILENAME).write_text("{}")
+    (tmp_path / publish.CHECKSUMS_FILE).write_text("{}")
+
+    assert list(publish.local_manifest(tmp_path)) == ["index.json"]
@@ -1,9 +1,17 @@
+import hashlib
+import io
+import os
+import tarfile
+import zipfile
 from pathlib import Path
+from unittest import mock
 
+import pandas as pd
 import pytest
-from owid.catalog import Origin
+from owid.catalog import Origin, http_utils
 
-from etl.snapshot import SnapshotMeta, _parse_snapshot_path
+from etl import files, paths, snapshot
+from etl.snapshot import Snapshot, SnapshotMeta, _parse_snapshot_path, prefetch_snapshots
 
 
 def test_parse_snapshot_path():
@@ -37,3 +45,184 @@ def test_snapshot_to_yaml():
         "version": "2023-04-18",
         "origin": {"title": "Aviation Statistics by Period", "producer": "Producer"},
     }
+
+
+def _snapshot(tmp_path, monkeypatch, file_extension: str, short_name: str = "archive", outs=None) -> Snapshot:
+    monkeypatch.setattr(paths, "DATA_DIR", tmp_path / "data")
+    monkeypatch.setattr(paths, "CACHE_DIR", tmp_path / "cache")
+    snap = Snapshot.__new__(Snapshot)
+    snap.uri = f"ns/2024-01-01/{short_name}.{file_extension}"
+    snap.metadata = SnapshotMeta(
+        namespace="ns",
+        version="2024-01-01",
+        short_name=short_name,
+        file_extension=file_extension,
+        origin=Origin(producer="Producer", title="Archive"),
+        outs=outs or [{"md5": "abc"}],
+    )
+    snap.path.parent.mkdir(parents=True, exist_ok=True)
+    return snap
+
+
+@pytest.mark.parametrize("file_extension", ["zip", "tar.gz"])
+def test_read_in_archive(tmp_path, monkeypatch, file_extension):
+    snap = _snapshot(tmp_path, monkeypatch, file_extension)
+    members = {
+        "readme.txt": b"Not data",
+        "data/population.csv": b"country,population\nFrance,68\nSpain,48\n",
+        "data/population.parquet": pd.DataFrame({"country": ["France"], "population": [68]}).to_parquet(),
+    }
+    if file_extension == "zip":
+        with zipfile.ZipFile(snap.path, "w") as zip_file:
+            for name, content in members.items():
+                zip_file.writestr(name, content)
+    else:
+        with tarfile.open(snap.path, "w:gz") as tar_file:
+            for name, content in members.items():
+                info = tarfile.TarInfo(f"./{name}")
+                info.size = len(content)
+                tar_file.addfile(info, io.BytesIO(content))
+
+    assert sorted(snap.archive_members()) == sorted(members)
+
+    tb = snap.read_in_archive("data/population.csv", usecols=["country"])
+    assert tb.to_dict(orient="list") == {"country": ["France", "Spain"]}
+    assert tb["country"].metadata.origins == [snap.metadata.origin]
+
+    tb = snap.read_in_archive("data/population.parquet")
+    assert tb.to_dict(orient="list") == {"country": ["France"], "population": [68]}
+
+    # extracted file is cached by md5 of the snapshot
+    tb = snap.read_in_archive("data/population.csv", cache=True)
+    assert (tmp_path / "cache/snapshots/abc/data/population.csv").read_bytes() == members["data/population.csv"]
+    assert tb.to_dict(orient="list") == {"country": ["France", "Spain"], "population": [68, 48]}
+
+    with pytest.raises(FileNotFoundError):
+        snap.read_in_archive("data/missing.csv")
+
+    # archive with more files can't be read directly
+    with pytest.raises(ValueError, match="contains 3 files"):
+        snap.read()
+
+
+def test_read_archive_with_single_file(tmp_path, monkeypatch):
+    snap = _snapshot(tmp_path, monkeypatch, "zip")
+    with zipfile.ZipFile(snap.path, "w") as zip_file:
+        zip_file.writestr("population.csv", "country,population\nFrance,68\n")
+
+    assert snap.read().to_dict(orient="list") == {"country": ["France"], "population": [68]}
+
+
+class _MockR2:
+    """Public R2 bucket with snapshot files by md5 that supports range requests."""
+
+    def __init__(self, files: dict):
+        self.files = files
+        self.requests = []
+
+    def get(self, url, stream=False, headers={}):
+        content = self.files[url.split("/", 3)[-1].replace("/", "")]
+        self.requests.append(headers.get("Range"))
+        status = 200
+        if "Range" in headers:
+            content = content[int(headers["Range"].removeprefix("bytes=").rstrip("-")) :]
+            status = 206
+        return mock.Mock(status_code=status, iter_content=lambda chunk_size: [content[:3], content[3:]])
+
+
+def test_pull_resumes_download_and_verifies_md5(tmp_path, monkeypatch):
+    content = b"country,population\nFrance,68\n"
+    md5 = hashlib.md5(content).hexdigest()
+    r2 = _MockR2({md5: content})
+    monkeypatch.setattr(http_utils, "get", r2.get)
+    snap = _snapshot(tmp_path, monkeypatch, "csv", outs=[{"md5": md5, "size": len(content)}])
+
+    # interrupted download
+    blob = tmp_path / "cache/snapshot_blobs" / md5[:2] / md5[2:]
+    blob.parent.mkdir(parents=True)
+    blob.with_name(blob.name + ".part").write_bytes(content[:10])
+
+    snap.pull()
+    assert r2.requests == ["bytes=10-"]
+    assert snap.path.read_bytes() == blob.read_bytes() == content
+    assert not snap.is_dirty()
+
+    # corrupted partial file is downloaded again
+    blob.rename(blob.with_name(blob.name + ".part"))
+    blob.with_name(blob.name + ".part").write_bytes(b"x" * 10)
+    snap.pull()
+    assert r2.requests[1:] == ["bytes=10-", None]
+    assert snap.path.read_bytes() == content
+
+    # corrupted download fails
+    r2.files[md5] = b"corrupted"
+    blob.unlink()
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        snap.pull()
+    assert not blob.exists()
+
+
+def test_prefetch_snapshots_downloads_same_file_once(tmp_path, monkeypatch):
+    content = b"country,population\nFrance,68\n"
+    md5 = hashlib.md5(content).hexdigest()
+    r2 = _MockR2({md5: content})
+    monkeypatch.setattr(http_utils, "get", r2.get)
+    outs = [{"md5": md5, "size": len(content)}]
+    snaps = [_snapshot(tmp_path, monkeypatch, "csv", short_name=name, outs=outs) for name in ["a", "b"]]
+
+    prefetch_snapshots(snaps)
+    assert r2.requests == [None]
+
+    for snap in snaps:
+        snap.pull()
+        assert snap.path.read_bytes() == content
+    assert r2.requests == [None]
+
+
+def test_pull_caches_checksum_of_downloaded_file(tmp_path, monkeypatch):
+    content = b"country,population\nFrance,68\n"
+    md5 = hashlib.md5(content).hexdigest()
+    monkeypatch.setattr(snapshot, "CHECKSUM_CACHE", files.PersistentChecksumCache(tmp_path / "checksums.sqlite"))
+    snap = _snapshot(tmp_path, monkeypatch, "csv", outs=[{"md5": md5, "size": len(content)}])
+
+    # blob downloaded a while ago
+    blob = tmp_path / "cache/snapshot_blobs" / md5[:2] / md5[2:]
+    blob.parent.mkdir(parents=True)
+    blob.write_bytes(content)
+    os.utime(blob, ns=(0, 0))
+
+    snap.pull()
+    assert snapshot.CHECKSUM_CACHE.get(str(snap.path), snap.path.stat()) == md5
+
+
+def test_pulled_file_is_independent_of_blob(tmp_path, monkeypatch):
+    content = b"country,population\nFrance,68\n"
+    md5 = hashlib.md5(content).hexdigest()
+    monkeypatch.setattr(http_utils, "get", _MockR2({md5: content}).get)
+    snap = _snapshot(tmp_path, monkeypatch, "csv", outs=[{"md5": md5, "size": len(content)}])
+
+    snap.pull()
+    # snapshot scripts overwrite files in place
+    with open(snap.path, "wb") as f:
+        f.write(b"x" * len(content))
+    assert snapshot._blob_path(md5).read_bytes() == content
+
+
+def test_evict_blobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(paths, "CACHE_DIR", tmp_path / "cache")
+    blobs = []
+    for i, md5 in enumerate(["aa1", "bb2", "cc3", "dd4"]):
+        blob = snapshot._blob_path(md5)
+        blob.parent.mkdir(parents=True)
+        blob.write_bytes(b"x" * 10)
+        # accessed in this order
+        os.utime(blob, ns=(i * 10**9, 0))
+        blobs.append(blob)
+    # partial downloads are not evicted
+    part = blobs[-1].with_name("d5.part")
+    part.write_bytes(b"x" * 10)
+
+    # least recently used blobs are deleted, except for the one we need
+    snapshot._evict_blobs(keep=blobs[0], max_size=25)
+    assert [b.exists() for b in blobs] == [True, False, False, True]
+    assert part.exists()
@@ -0,0 +1,88 @@
+#
+#  test_step_workers.py
+#
+
+import json
+
+import pytest
+
+from etl import paths, step_workers
+
+from .test_steps import temporary_step
+
+
+def _create_env_dumping_step(step_name: str) -> None:
+    """Step that writes its environment and the time its module was imported to dest_dir."""
+    py_file = paths.STEP_DIR / "data" / f"{step_name}.py"
+    with open(str(py_file), "w") as ostream:
+        print(
+            """
+import json
+import os
+import time
+from pathlib import Path
+
+IMPORTED_AT = time.time_ns()
+
+def run(dest_dir):
+    Path(dest_dir).mkdir(parents=True, exist_ok=True)
+    with open(Path(dest_dir) / "out.json", "w") as f:
+        json.dump({"env": os.environ.get("STEP_WORKER_TEST"), "imported_at": IMPORTED_AT}, f)
+    os.environ["LEAKED"] = "1"
+            """,
+            file=ostream,
+        )
+
+
+def _read_output(step_name: str) -> dict:
+    with open(paths.DATA_DIR / step_name / "out.json") as f:
+        return json.load(f)
+
+
+def test_step_worker_isolates_steps():
+    worker = step_workers.StepWorker(max_steps=10)
+    try:
+        with temporary_step() as step_name:
+            _create_env_dumping_step(step_name)
+            dest_dir = (paths.DATA_DIR / step_name).as_posix()
+
+            worker.run(f"data://{step_name}", dest_dir, env={"STEP_WORKER_TEST": "a"})
+            out_a = _read_output(step_name)
+            assert out_a["env"] == "a"
+
+            # module is imported again and environment doesn't leak between steps
+            worker.run(f"data://{step_name}", dest_dir, env={"STEP_WORKER_TEST": "b"})
+            out_b = _read_output(step_name)
+            assert out_b["env"] == "b"
+            assert out_b["imported_at"] != out_a["imported_at"]
+
+            assert worker.steps_run == 2
+            assert worker.rss > 0
+    finally:
+        worker.close()
+
+
+def test_step_worker_failing_step():
+    worker = step_workers.StepWorker()
+    try:
+        with temporary_step() as step_name:
+            with open(paths.STEP_DIR / "data" / f"{step_name}.py", "w") as f:
+                f.write("def run(dest_dir):\n    raise ValueError('boom')\n")
+
+            with pytest.raises(step_workers.StepWorkerError):
+                worker.run(f"data://{step_name}", (paths.DATA_DIR / step_name).as_posix())
+
+            # worker survives a failing step
+            assert worker.is_alive()
+    finally:
+        worker.close()
+
+
+def test_step_worker_recycle():
+    worker = step_workers.StepWorker(max_steps=1)
+    try:
+        assert not worker.should_recycle()
+        worker.steps_run = 1
+        assert worker.should_recycle()
+    finally:
+        worker.close()
@@ -55,6 +55,14 @@ def test_data_step():
         Dataset((paths.DATA_DIR / step_name).as_posix())
 
 
+def test_data_step_isolated():
+    # --debug runs the step in the current process
+    with temporary_step() as step_name, patch("etl.config.DEBUG", True):
+        _create_mock_py_file(step_name)
+        DataStep(step_name, []).run()
+        Dataset((paths.DATA_DIR / step_name).as_posix())
+
+
 def test_data_step_becomes_dirty_when_pandas_version_changes():
     pandas_version = pd.__version__
     try:
@@ -197,3 +205,45 @@ def test_SnapshotStep_checksum_output(tmp_path):
             json.dump(meta, f)
 
         assert step.checksum_output() == "a43b0c67d958884a0bc6487dcf5f4bca"
+
+
+def test_select_dirty_steps_with_dirty_index(tmp_path):
+    with temporary_step() as step_name, patch("etl.paths.DIRTY_INDEX_FILE", new=tmp_path / "dirty_index.json"):
+        _create_mock_py_file(step_name)
+
+        # create output of the step as if it had been run
+        step = DataStep(step_name, [])
+        ds = Dataset.create_empty(step._dest_dir)
+        ds.metadata.short_name = "test"
+        ds.metadata.source_checksum = step.checksum_input()
+        ds.save()
+
+        assert select_dirty_steps([DataStep(step_name, [])]) == []
+
+        # step is known to be clean and is not checked again
+        with patch.object(DataStep, "checksum_input", side_effect=AssertionError("should not be called")):
+            assert select_dirty_steps([DataStep(step_name, [])]) == []
+
+        # changing the step file makes it dirty
+        with open(paths.STEP_DIR / "data" / f"{step_name}.py", "a") as f:
+            f.write("\n# change\n")
+        assert [str(s) for s in select_dirty_steps([DataStep(step_name, [])])] == [f"data://{step_name}"]
+
+
+def test_dirty_index_detects_new_dependency(tmp_path):
+    with temporary_step() as step_name, temporary_step() as dep_name, patch(
+        "etl.paths.DIRTY_INDEX_FILE", new=tmp_path / "dirty_index.json"
+    ):
+        for name in (step_name, dep_name):
+            _create_mock_py_file(name)
+            step = DataStep(name, [])
+            ds = Dataset.create_empty(step._dest_dir)
+            ds.metadata.short_name = "test"
+            ds.metadata.source_checksum = step.checksum_input()
+            ds.save()
+
+        assert select_dirty_steps([DataStep(step_name, []), DataStep(dep_name, [])]) == []
+
+        # adding an edge to the DAG changes checksum of the step even though no file changed
+        dirty = select_dirty_steps([DataStep(step_name, [DataStep(dep_name, [])])])
+        assert [str(s) for s in dirty] == [f"data://{step_name}"]